@@ -0,0 +1,193 @@
+# Runs the kernels in sample_codes/ through the SSA interpreter
+# (ssa_interp.py), once on the IR as converted and once after
+# ssa_passes.optimize, and compares the two.
+#
+# For every kernel and size it records the static instruction count of the
+# kernel's unit, the instructions executed per call and the best-of-r wall
+# time per call, next to the plain Python function and the Python code
+# generated from the optimized IR (ssa_codegen.py), without and with its
+# loops vectorized (ssa_vectorize.py). Every result is checked against the
+# plain function.
+#
+#   python benchmarks/bench_interp.py --sizes 8 16 32
+#   python benchmarks/bench_interp.py --kernels dense_mv csr_mv --output out.json
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = os.path.join(ROOT, "sample_codes")
+sys.path[:0] = [ROOT, SAMPLES]
+
+import numpy as np
+
+import matrix_codes
+import sparse_codes
+from project2 import MODULE_UNIT, SSA_CONSTRUCTION_MODES, ControlFlowGraph, build_units
+from ssa_codegen import compile_module
+from ssa_interp import Interpreter
+from ssa_passes import optimize
+from ssa_vectorize import vectorize_loops
+
+NNZ_PER_ROW = 4
+
+
+def dense_args(size, rng):
+    return rng.random((size, size)), rng.random(size)
+
+
+def matmul_args(size, rng):
+    return rng.random((size, size)), rng.random((size, size))
+
+
+def csr_args(size, rng):
+    density = min(1.0, NNZ_PER_ROW / size)
+    return sparse_codes.random_csr(size, size, density, seed=int(rng.integers(1 << 31))) + (rng.random(size),)
+
+
+def coo_args(size, rng):
+    density = min(1.0, NNZ_PER_ROW / size)
+    return sparse_codes.random_coo(size, size, density, seed=int(rng.integers(1 << 31))) + (rng.random(size), size)
+
+
+# name -> (module, argument factory)
+KERNELS = {
+    "dense_mv": (matrix_codes, dense_args),
+    "matmul": (matrix_codes, matmul_args),
+    "csr_mv": (sparse_codes, csr_args),
+    "coo_mv": (sparse_codes, coo_args),
+}
+
+
+def load_units(module, mode, optimized, vectorized=False):
+    with open(module.__file__, encoding="utf-8") as f:
+        units = build_units(f.read(), mode)
+    if optimized:
+        units = {name: optimize(ControlFlowGraph.from_blocks(blocks)).blocks for name, blocks in units.items()}
+    if vectorized:
+        for name, blocks in units.items():
+            if name != MODULE_UNIT:
+                cfg = ControlFlowGraph.from_blocks(blocks)
+                vectorize_loops(cfg)
+                units[name] = cfg.blocks
+    return units
+
+
+def load_module(module, mode, optimized):
+    interpreter = Interpreter(load_units(module, mode, optimized))
+    interpreter.run()
+    return interpreter
+
+
+def best_time(func, args, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+
+def run_kernel(name, mode, sizes, repeat, seed):
+    module, make_args = KERNELS[name]
+    native = getattr(module, name)
+    interpreters = {
+        "unoptimized": load_module(module, mode, optimized=False),
+        "optimized": load_module(module, mode, optimized=True),
+    }
+    generated = {}
+    for label, vectorized in (("generated", False), ("vectorized", True)):
+        try:
+            generated[label] = compile_module(load_units(module, mode, True, vectorized))[name]
+        except ValueError as e:  # another unit of the module has IR codegen rejects
+            print(f"{name:9} {mode:7} no {label} code: {e}", file=sys.stderr)
+    rng = np.random.default_rng(seed)
+    points = []
+    for size in sizes:
+        args = make_args(size, rng)
+        expected = native(*args)
+        point = {"size": size, "python_time": best_time(native, args, repeat)}
+        for label, function in generated.items():
+            point[label] = {
+                "time": best_time(function, args, repeat),
+                "correct": bool(np.allclose(function(*args), expected)),
+            }
+        for label, interpreter in interpreters.items():
+            function = interpreter.globals[name]
+            before = interpreter.instructions_executed
+            result = function(*args)
+            point[label] = {
+                "static_instructions": interpreter.compile(name).static_count,
+                "instructions": interpreter.instructions_executed - before,
+                "time": best_time(function, args, repeat),
+                "correct": bool(np.allclose(result, expected)),
+            }
+        points.append(point)
+        unopt, opt = point["unoptimized"], point["optimized"]
+        print(
+            f"{name:9} {mode:7} {size:5d}  instructions {unopt['instructions']:10d} -> {opt['instructions']:10d}"
+            f"  time {unopt['time'] * 1e3:9.2f} -> {opt['time'] * 1e3:9.2f} ms  ("
+            + "".join(f"{label} {point[label]['time'] * 1e3:.2f} ms, " for label in generated)
+            + f"python {point['python_time'] * 1e3:.2f} ms)"
+            + ("" if all(point[label]["correct"] for label in ("unoptimized", "optimized", *generated))
+               else "  WRONG RESULT"),
+            flush=True,
+        )
+    return {"kernel": name, "mode": mode, "points": points}
+
+
+def metadata():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare interpreted unoptimized and optimized SSA IR.")
+    parser.add_argument("--kernels", nargs="+", choices=sorted(KERNELS), default=list(KERNELS))
+    parser.add_argument("--modes", nargs="+", choices=sorted(SSA_CONSTRUCTION_MODES), default=list(SSA_CONSTRUCTION_MODES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    failures = 0
+    for name in args.kernels:
+        for mode in args.modes:
+            try:
+                results.append(run_kernel(name, mode, args.sizes, args.repeat, args.seed))
+            except ValueError as e:  # IR the interpreter rejects
+                print(f"{name:9} {mode:7} not executable: {e}", file=sys.stderr)
+                failures += 1
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    wrong = sum(
+        not point[label]["correct"]
+        for entry in results
+        for point in entry["points"]
+        for label in ("unoptimized", "optimized", "generated", "vectorized")
+        if label in point
+    )
+    return 1 if wrong or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# Benchmarks the numeric kernels in sample_codes/ across execution modes:
+#
+#   python     the plain Python function (skipped above --python-max-work)
+#   njit       numba's default nopython pipeline
+#   mycompiler @njit(pipeline_class=MyCompiler)
+#   parallel   @njit(parallel=True, pipeline_class=MyParallelCompiler)
+#   numpy      a vectorized NumPy reference
+#
+# Compile time is measured separately by compiling the exact signature up
+# front, so the timed runs only see steady-state code. Every result is
+# checked against the NumPy reference.
+#
+#   python benchmarks/bench_kernels.py --sizes 64 128 256 --output out.json
+#   python benchmarks/bench_kernels.py --compare out.json
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "sample_codes")]
+
+import numba
+import numpy as np
+from numba import njit
+
+from matrix_codes import dense_mv, matmul
+from numba_pass import MyCompiler, MyParallelCompiler
+from sparse_codes import coo_mv, csr_mv, random_coo, random_csr
+
+MODES = ("python", "njit", "mycompiler", "parallel", "numpy")
+NNZ_PER_ROW = 16
+
+
+def csr_reference(indptr, indices, data, x):
+    rows = np.repeat(np.arange(indptr.shape[0] - 1), np.diff(indptr))
+    return np.bincount(rows, weights=data * x[indices], minlength=indptr.shape[0] - 1)
+
+
+def coo_reference(rows, cols, values, x, n_rows):
+    return np.bincount(rows, weights=values * x[cols], minlength=n_rows)
+
+
+def dense_args(size, rng):
+    return rng.random((size, size)), rng.random(size)
+
+
+def matmul_args(size, rng):
+    return rng.random((size, size)), rng.random((size, size))
+
+
+def csr_args(size, rng):
+    density = min(1.0, NNZ_PER_ROW / size)
+    return random_csr(size, size, density, seed=rng.integers(1 << 31)) + (rng.random(size),)
+
+
+def coo_args(size, rng):
+    density = min(1.0, NNZ_PER_ROW / size)
+    return random_coo(size, size, density, seed=rng.integers(1 << 31)) + (rng.random(size), size)
+
+
+# name -> (kernel, argument factory, NumPy reference, work estimate)
+KERNELS = {
+    "dense_mv": (dense_mv, dense_args, lambda A, x: A @ x, lambda n: n * n),
+    "matmul": (matmul, matmul_args, lambda A, B: A @ B, lambda n: n ** 3),
+    "csr_mv": (csr_mv, csr_args, csr_reference, lambda n: n * NNZ_PER_ROW),
+    "coo_mv": (coo_mv, coo_args, coo_reference, lambda n: n * NNZ_PER_ROW),
+}
+
+
+def make_runner(kernel, mode, reference):
+    if mode == "python":
+        return kernel
+    if mode == "numpy":
+        return reference
+    if mode == "njit":
+        return njit(kernel)
+    if mode == "mycompiler":
+        return njit(pipeline_class=MyCompiler)(kernel)
+    return njit(parallel=True, pipeline_class=MyParallelCompiler)(kernel)
+
+
+def compile_time(runner, args):
+    if not hasattr(runner, "compile"):
+        return 0.0
+    start = time.perf_counter()
+    runner.compile(tuple(numba.typeof(arg) for arg in args))
+    return time.perf_counter() - start
+
+
+def measure(runner, args, warmup, repeat, min_time):
+    # like timeit.autorange: each repetition loops enough calls to last at
+    # least min_time, the per-call time of every repetition is recorded
+    for _ in range(warmup):
+        runner(*args)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            runner(*args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed * 10 >= min_time else 10
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            runner(*args)
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def summarize(times):
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def run(kernels, modes, sizes, warmup, repeat, min_time, python_max_work, seed):
+    results = []
+    for name in kernels:
+        kernel, make_args, reference, work = KERNELS[name]
+        runners = {mode: make_runner(kernel, mode, reference) for mode in modes}
+        compiled = set()
+        for size in sizes:
+            args = make_args(size, np.random.default_rng(seed))
+            expected = reference(*args)
+            for mode in modes:
+                if mode == "python" and work(size) > python_max_work:
+                    continue
+                runner = runners[mode]
+                entry = {"kernel": name, "mode": mode, "size": size, "compile_time": None}
+                if mode not in compiled:
+                    entry["compile_time"] = compile_time(runner, args)
+                    compiled.add(mode)
+                entry["correct"] = bool(np.allclose(runner(*args), expected))
+                times, number = measure(runner, args, warmup, repeat, min_time)
+                entry.update(summarize(times), calls_per_repeat=number, times=times)
+                results.append(entry)
+                print(
+                    f"{name:10} {mode:10} {size:7d}  median {entry['median'] * 1e3:10.4f} ms"
+                    f"  stdev {entry['stdev'] * 1e3:8.4f} ms"
+                    + (f"  compile {entry['compile_time']:.3f} s" if entry["compile_time"] else "")
+                    + ("" if entry["correct"] else "  WRONG RESULT"),
+                    flush=True,
+                )
+    return results
+
+
+def metadata():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "threads": numba.get_num_threads(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    # reports entries whose median got slower than baseline by more than
+    # threshold (0.1 = 10%) and returns how many did
+    with open(baseline_path) as f:
+        baseline = {
+            (entry["kernel"], entry["mode"], entry["size"]): entry for entry in json.load(f)["results"]
+        }
+    regressions = 0
+    for entry in results:
+        old = baseline.get((entry["kernel"], entry["mode"], entry["size"]))
+        if old is None:
+            continue
+        ratio = entry["median"] / old["median"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{entry['kernel']:10} {entry['mode']:10} {entry['size']:7d}  {ratio:6.2f}x baseline{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sample kernels across execution modes.")
+    parser.add_argument("--kernels", nargs="+", choices=sorted(KERNELS), default=list(KERNELS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[64, 128, 256, 512])
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.02, help="seconds per repetition")
+    parser.add_argument("--python-max-work", type=float, default=2e6,
+                        help="skip pure Python runs estimated to do more inner iterations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier run to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = run(args.kernels, args.modes, args.sizes, args.warmup, args.repeat,
+                  args.min_time, args.python_max_work, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    failures = sum(not entry["correct"] for entry in results)
+    if args.compare:
+        failures += compare(results, args.compare, args.threshold)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
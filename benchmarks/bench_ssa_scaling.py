@@ -0,0 +1,147 @@
+# Measures how SSA construction in project2.py scales with program size.
+#
+# Every generator in synthetic_programs.py is run at doubling sizes through
+# both construction modes (braun and cytron). For each point the best-of-r
+# conversion time and the tracemalloc peak (from a separate, untimed run)
+# are recorded, and the slope of log(time) and log(memory) against log(n)
+# is fitted as the empirical complexity: ~1 is linear, ~2 quadratic.
+#
+#   python benchmarks/bench_ssa_scaling.py --sizes 250 500 1000 2000 4000
+#   python benchmarks/bench_ssa_scaling.py --max-slope 1.3 --output out.json
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+
+from project2 import SSA_CONSTRUCTION_MODES, build_ssa
+from synthetic_programs import GENERATORS
+
+
+def convert_time(source, mode, repeat):
+    # like timeit, the cyclic collector is off while timing: its full
+    # collections rescan every live object and would add their own n^2
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            build_ssa(source, mode)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+
+def convert_peak_memory(source, mode):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        build_ssa(source, mode)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def loglog_slope(sizes, values):
+    # least squares slope of log(value) over log(size)
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-12)) for value in values]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    den = sum((x - mean_x) ** 2 for x in xs)
+    if not den:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / den
+
+
+def run(generators, modes, sizes, repeat, memory):
+    results = []
+    for name in generators:
+        for mode in modes:
+            points = []
+            for size in sizes:
+                source = GENERATORS[name](size)
+                point = {"size": size, "time": convert_time(source, mode, repeat), "peak_memory": None}
+                if memory:
+                    point["peak_memory"] = convert_peak_memory(source, mode)
+                points.append(point)
+                print(
+                    f"{name:18} {mode:7} {size:7d}  {point['time'] * 1e3:10.2f} ms"
+                    + (f"  {point['peak_memory'] / 2 ** 20:8.2f} MiB" if memory else ""),
+                    flush=True,
+                )
+            entry = {
+                "generator": name,
+                "mode": mode,
+                "points": points,
+                "time_slope": loglog_slope(sizes, [p["time"] for p in points]),
+                "memory_slope": None,
+            }
+            if memory:
+                entry["memory_slope"] = loglog_slope(sizes, [p["peak_memory"] for p in points])
+            results.append(entry)
+    return results
+
+
+def report(results, max_slope):
+    # prints the fitted slopes and returns how many exceed max_slope
+    failures = 0
+    for entry in results:
+        slopes = [entry["time_slope"]]
+        line = f"{entry['generator']:18} {entry['mode']:7}  time ~ n^{entry['time_slope']:.2f}"
+        if entry["memory_slope"] is not None:
+            slopes.append(entry["memory_slope"])
+            line += f"  memory ~ n^{entry['memory_slope']:.2f}"
+        if max_slope is not None and max(slopes) > max_slope:
+            line += "  SUPERLINEAR"
+            failures += 1
+        print(line)
+    return failures
+
+
+def metadata():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how SSA construction scales with program size.")
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--modes", nargs="+", choices=sorted(SSA_CONSTRUCTION_MODES),
+                        default=list(SSA_CONSTRUCTION_MODES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[250, 500, 1000, 2000, 4000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the tracemalloc runs")
+    parser.add_argument("--max-slope", type=float,
+                        help="exit with status 1 if any fitted slope is larger")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    # Braun's readVariable recurses once per predecessor on the way back to
+    # a definition, so deep nests need more than the default limit
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * max(args.sizes) + 1000))
+
+    results = run(args.generators, args.modes, sorted(args.sizes), args.repeat, args.memory)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    return 1 if report(results, args.max_slope) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# Generators of synthetic source programs for stressing SSA construction.
+# Every generator takes a size n (roughly the number of statements) and
+# returns Python source using only the constructs both SSA converters in
+# project2.py support. The programs are deterministic for a given n.
+
+
+def straight_line(n, width=8):
+    # n assignments cycling through `width` variables, each reading two
+    # earlier ones
+    lines = [f"v{i} = {i}" for i in range(width)]
+    for i in range(n):
+        lines.append(f"v{i % width} = v{(i + 1) % width} + v{(i + 3) % width}")
+    return "\n".join(lines) + "\n"
+
+
+def nested_ifs(n):
+    # if/elif chain n long, which is an If nested n deep in the else arm;
+    # every arm assigns, so each of the n joins needs phis. Written as elif
+    # because the parser refuses more than 100 levels of indentation.
+    lines = ["x = 0", "y = 1"]
+    for level in range(n):
+        lines.append(f"{'if' if level == 0 else 'elif'} x < {level}:")
+        lines.append("    x = x + y")
+        lines.append(f"    y = y + {level}")
+    lines.append("else:")
+    lines.append("    x = x - y")
+    return "\n".join(lines) + "\n"
+
+
+def sequential_loops(n, width=4):
+    # n loops one after another, alternating for and while, each updating
+    # a few of the `width` variables live across all of them
+    lines = [f"v{i} = {i}" for i in range(width)]
+    for i in range(n):
+        a, b = f"v{i % width}", f"v{(i + 1) % width}"
+        if i % 2:
+            lines.append(f"k{i} = 0")
+            lines.append(f"while k{i} < 3:")
+            lines.append(f"    {a} = {a} + {b}")
+            lines.append(f"    k{i} = k{i} + 1")
+        else:
+            lines.append(f"for j{i} in range(3):")
+            lines.append(f"    {a} = {a} + j{i}")
+    return "\n".join(lines) + "\n"
+
+
+def wide_variables(n, loops=8):
+    # n distinct variables that are all live across a few loops, so every
+    # loop header has to consider all of them
+    lines = [f"w{i} = {i}" for i in range(n)]
+    loops = min(loops, n)
+    for loop in range(loops):
+        lines.append(f"for i{loop} in range(2):")
+        for i in range(loop, n, loops):
+            lines.append(f"    w{i} = w{i} + w{(i + 1) % n}")
+    return "\n".join(lines) + "\n"
+
+
+GENERATORS = {
+    "straight_line": straight_line,
+    "nested_ifs": nested_ifs,
+    "sequential_loops": sequential_loops,
+    "wide_variables": wide_variables,
+}
@@ -1,15 +1,21 @@
 import ast
+import importlib.util
+import inspect
 import operator
+import textwrap
 import warnings
 
 from numba import njit, prange
-from numba.core import ir, ir_utils, config, errors
-from numba.core.compiler import CompilerBase, DefaultPassBuilder
+from numba.core import ir, ir_utils, config, errors, types
+from numba.core.compiler import CompilerBase, DefaultPassBuilder, run_frontend
 from numba.core.compiler_machinery import FunctionPass, register_pass
+from numba.core.analysis import compute_cfg_from_blocks
 from numba.core.untyped_passes import IRProcessing, ReconstructSSA
+from numba.extending import overload
 from numba.core.ir_utils import *
 from numbers import Number
 import numba
+import numpy as np
 
 
 # Register this pass with the compiler framework, declare that it will not
@@ -47,81 +53,1403 @@ class ConstsAddOne(FunctionPass):
         return mutated  # return True if the IR was mutated, False if not.
 
 
+# Expressions that only compute a value: if the result is never used the
+# assignment can go. Calls, inplace_binop (may mutate its lhs), iterator
+# stepping and pair_first (parfor lowering looks for it) are always kept,
+# and so is indexing, which may raise KeyError or IndexError. The pass runs
+# before typing, so it cannot tell arrays from dicts and lists.
+PURE_EXPR_OPS = {
+    "binop", "unary", "getattr", "build_tuple", "build_list", "build_set",
+    "build_map", "cast", "phi", "pair_second", "getiter", "make_function",
+    "null", "undefined",
+}
+# Binary operators that may raise (ZeroDivisionError) keep their binop live.
+RAISING_BINOPS = {operator.truediv, operator.floordiv, operator.mod, operator.pow}
+
+
 def get_rhs_vars(stmt):
-    var_list = []
+    # names read by a statement (ir.Del only ends a lifetime, it is not a use)
+    if isinstance(stmt, ir.Del):
+        return set()
     if isinstance(stmt, ir.Assign):
-        if not isinstance(stmt.value, ir.Const):
-            if isinstance(stmt.value, ir.Expr):
-                # get list of vars from the Expr
-                expr_vars = ir.Expr.list_vars(stmt.value)
-                for var in expr_vars:
-                    var_list.append(var.name)
-            else:
-                var_list.append(stmt.value.name)
-    elif isinstance(stmt, ir.Return):
-        var_list.append(stmt.value.name)
-    elif isinstance(stmt, ir.Expr):
-        var_list.append(ir.Expr.list_vars(stmt))
-    else:
-        raise ValueError("Unexpected statement type: {}".format(type(stmt)))
-    return var_list
+        value = stmt.value
+        if isinstance(value, ir.Var):
+            return {value.name}
+        if isinstance(value, ir.Expr):
+            return {var.name for var in value.list_vars()}
+        return set()
+    return {var.name for var in stmt.list_vars()}
 
 
 def get_lhs_vars(stmt):
+    # names defined by a statement; only assignments define anything
     if isinstance(stmt, ir.Assign):
-        return stmt.target
-    elif isinstance(stmt, ir.Return):
-        return stmt.value
-    elif isinstance(stmt, ir.Expr):
-        return stmt
+        return {stmt.target.name}
+    return set()
+
+
+def is_removable(stmt):
+    if not isinstance(stmt, ir.Assign):
+        return False
+    value = stmt.value
+    if isinstance(value, ir.Expr):
+        if value.op == "binop" and value.fn in RAISING_BINOPS:
+            return False
+        return value.op in PURE_EXPR_OPS
+    return isinstance(value, (ir.Var, ir.Const, ir.Global, ir.FreeVar, ir.Arg))
+
+
+@register_pass(mutates_CFG=False, analysis_only=False)
+class DeadCodeElimination(FunctionPass):
+    _name = "dead_code_elimination"
+
+    def __init__(self):
+        FunctionPass.__init__(self)
+
+    def run_pass(self, state):
+        # Strong (faint-variable) liveness: an assignment only makes its
+        # operands live if its own target is live or it has side effects, so
+        # chains of dead assignments across blocks go away in one solve.
+        func_ir = state.func_ir
+        blocks = func_ir.blocks
+        cfg = compute_cfg_from_blocks(blocks)
+
+        def transfer(block, live):
+            live = set(live)
+            for stmt in reversed(block.body):
+                if is_removable(stmt) and stmt.target.name not in live:
+                    continue
+                live -= get_lhs_vars(stmt)
+                live |= get_rhs_vars(stmt)
+            return live
+
+        live_in = {label: set() for label in blocks}
+        worklist = list(blocks)
+        queued = set(worklist)
+        while worklist:
+            label = worklist.pop()
+            queued.discard(label)
+            live_out = set()
+            for succ, _ in cfg.successors(label):
+                live_out |= live_in[succ]
+            new_live_in = transfer(blocks[label], live_out)
+            if new_live_in != live_in[label]:
+                live_in[label] = new_live_in
+                for pred, _ in cfg.predecessors(label):
+                    if pred not in queued:
+                        queued.add(pred)
+                        worklist.append(pred)
+
+        removed = set()
+        for label, block in blocks.items():
+            live = set()
+            for succ, _ in cfg.successors(label):
+                live |= live_in[succ]
+            new_body = []
+            for stmt in reversed(block.body):
+                if is_removable(stmt) and stmt.target.name not in live:
+                    removed.add(stmt.target.name)
+                    continue
+                live -= get_lhs_vars(stmt)
+                live |= get_rhs_vars(stmt)
+                new_body.append(stmt)
+            new_body.reverse()
+            block.body = new_body
+
+        if not removed:
+            return False
+        # drop ir.Del of variables that no longer have any definition
+        defined = {name for block in blocks.values() for stmt in block.body for name in get_lhs_vars(stmt)}
+        for block in blocks.values():
+            block.body = [
+                stmt for stmt in block.body
+                if not (isinstance(stmt, ir.Del) and stmt.value in removed and stmt.value not in defined)
+            ]
+        func_ir._definitions = build_definitions(blocks)
+        return True
+
+
+# Attributes whose value cannot change while the object is alive (array
+# metadata), so reading them inside a loop is always loop-invariant.
+INVARIANT_ATTRS = {"shape", "ndim", "size", "dtype", "strides", "itemsize", "nbytes", "T"}
+# Binary operators that cannot raise on scalars; division and power are
+# left in place so hoisting never introduces a ZeroDivisionError.
+SAFE_BINOPS = {
+    operator.add, operator.sub, operator.mul, operator.lt, operator.le,
+    operator.gt, operator.ge, operator.eq, operator.ne,
+}
+
+
+def ensure_preheader(blocks, cfg, loop):
+    # Returns the label of a block that only jumps to the loop header and is
+    # its only predecessor from outside the loop, creating one if needed.
+    entries = [label for label, _ in cfg.predecessors(loop.header) if label not in loop.body]
+    if len(entries) != 1:
+        return None
+    entry = entries[0]
+    terminator = blocks[entry].terminator
+    if isinstance(terminator, ir.Jump) and len(list(cfg.successors(entry))) == 1:
+        return entry
+    header = blocks[loop.header]
+    label = max(blocks) + 1
+    preheader = ir.Block(scope=header.scope, loc=header.loc)
+    preheader.append(ir.Jump(loop.header, header.loc))
+    blocks[label] = preheader
+    if isinstance(terminator, ir.Branch):
+        if terminator.truebr == loop.header:
+            terminator.truebr = label
+        if terminator.falsebr == loop.header:
+            terminator.falsebr = label
     else:
-        raise ValueError("Unexpected statement type: {}".format(type(stmt)))
+        terminator.target = label
+    for stmt in header.body:
+        if isinstance(stmt, ir.Assign) and isinstance(stmt.value, ir.Expr) and stmt.value.op == "phi":
+            stmt.value.incoming_blocks = [
+                label if incoming == entry else incoming for incoming in stmt.value.incoming_blocks
+            ]
+    return label
+
+
+@register_pass(mutates_CFG=True, analysis_only=False)
+class LoopInvariantCodeMotion(FunctionPass):
+    _name = "loop_invariant_code_motion"
+
+    def __init__(self):
+        FunctionPass.__init__(self)
+
+    def run_pass(self, state):
+        # Hoists pure, loop-invariant assignments into loop preheaders,
+        # innermost loops first so that code hoisted out of an inner loop
+        # can keep moving out of the enclosing ones. Only expressions that
+        # cannot fault are speculated: constants, globals, copies, array
+        # metadata getattrs, tuple building, indexing into shape and strides
+        # tuples and safe arithmetic on those. Other getitems stay: the
+        # preheader runs even when the loop runs zero times, and a dict,
+        # list or tuple lookup may raise (the pass runs before typing).
+        func_ir = state.func_ir
+        blocks = func_ir.blocks
+        cfg = compute_cfg_from_blocks(blocks)
+        loops = list(cfg.loops().values())
+        if not loops:
+            return False
+        preheaders = {loop.header: ensure_preheader(blocks, cfg, loop) for loop in loops}
+        cfg = compute_cfg_from_blocks(blocks)
+        loops = sorted(cfg.loops().values(), key=lambda loop: len(loop.body))
+
+        def_counts = {}
+        for block in blocks.values():
+            for stmt in block.find_insts(ir.Assign):
+                def_counts[stmt.target.name] = def_counts.get(stmt.target.name, 0) + 1
+        # tuples of array metadata and scalars derived from them
+        metadata_tuples = set()
+        scalars = set()
+        for block in blocks.values():
+            for stmt in block.find_insts(ir.Assign):
+                value = stmt.value
+                if isinstance(value, ir.Const) and isinstance(value.value, Number):
+                    scalars.add(stmt.target.name)
+                elif isinstance(value, ir.Expr) and value.op == "getattr" and value.attr in ("shape", "strides"):
+                    metadata_tuples.add(stmt.target.name)
+
+        mutated = False
+        for loop in loops:
+            preheader = preheaders.get(loop.header)
+            if preheader is None or preheader in loop.body:
+                continue
+            defined_in_loop = set()
+            for label in loop.body:
+                for stmt in blocks[label].body:
+                    defined_in_loop |= get_lhs_vars(stmt)
+
+            def invariant(var):
+                return var.name not in defined_in_loop
+
+            def hoistable(stmt):
+                if not isinstance(stmt, ir.Assign) or def_counts.get(stmt.target.name) != 1:
+                    return False
+                value = stmt.value
+                if isinstance(value, (ir.Const, ir.Global, ir.FreeVar)):
+                    return True
+                if isinstance(value, ir.Var):
+                    return invariant(value)
+                if not isinstance(value, ir.Expr) or not all(invariant(var) for var in value.list_vars()):
+                    return False
+                if value.op == "getattr":
+                    return value.attr in INVARIANT_ATTRS or value.value.name not in def_counts
+                if value.op == "build_tuple":
+                    return True
+                if value.op in ("static_getitem", "getitem"):
+                    return value.value.name in metadata_tuples
+                if value.op == "binop":
+                    return value.fn in SAFE_BINOPS and value.lhs.name in scalars and value.rhs.name in scalars
+                return False
+
+            hoisted = []
+            changed = True
+            while changed:
+                changed = False
+                for label in sorted(loop.body):
+                    if label == loop.header:
+                        continue
+                    block = blocks[label]
+                    kept = []
+                    for stmt in block.body:
+                        if hoistable(stmt):
+                            hoisted.append(stmt)
+                            defined_in_loop.discard(stmt.target.name)
+                            value = stmt.value
+                            if isinstance(value, ir.Expr) and value.op in ("static_getitem", "getitem") \
+                                    and value.value.name in metadata_tuples:
+                                scalars.add(stmt.target.name)
+                            elif isinstance(value, ir.Expr) and value.op == "binop":
+                                scalars.add(stmt.target.name)
+                            changed = True
+                        else:
+                            kept.append(stmt)
+                    block.body = kept
+            if hoisted:
+                names = {stmt.target.name for stmt in hoisted}
+                for label in loop.body:
+                    blocks[label].body = [
+                        stmt for stmt in blocks[label].body
+                        if not (isinstance(stmt, ir.Del) and stmt.value in names)
+                    ]
+                target = blocks[preheader]
+                target.body = target.body[:-1] + hoisted + target.body[-1:]
+                mutated = True
+
+        if mutated:
+            func_ir._definitions = build_definitions(blocks)
+        return mutated
+
+
+# Calls with no side effects on their arguments. Allocating numpy calls are
+# listed separately because writes into their result cannot alias anything
+# that existed before the call.
+ALLOCATING_CALLS = {
+    ("zeros", "numpy"), ("ones", "numpy"), ("empty", "numpy"), ("full", "numpy"),
+    ("zeros_like", "numpy"), ("ones_like", "numpy"), ("empty_like", "numpy"),
+    ("full_like", "numpy"), ("copy", "numpy"), ("array", "numpy"),
+}
+PURE_CALLS = {
+    ("range", "builtins"), ("len", "builtins"), ("min", "builtins"), ("max", "builtins"),
+    ("abs", "builtins"), ("int", "builtins"), ("float", "builtins"), ("bool", "builtins"),
+    ("round", "builtins"), ("pow", "builtins"),
+} | {
+    (name, module)
+    for module in ("numpy", "math")
+    for name in (
+        "sqrt", "exp", "log", "log2", "log10", "sin", "cos", "tan", "tanh", "arctan2",
+        "atan2", "abs", "fabs", "floor", "ceil", "hypot", "minimum", "maximum", "dot",
+        "sum", "prod",
+    )
+}
+# Expression kinds allowed inside a loop that is run in parallel.
+PARALLEL_SAFE_OPS = {
+    "binop", "unary", "inplace_binop", "getattr", "getitem", "static_getitem",
+    "typed_getitem", "build_tuple", "call", "getiter", "iternext", "pair_first",
+    "pair_second", "cast", "phi",
+}
+# Operator families a loop-carried scalar may be combined with to count as a
+# reduction (sub only with the accumulator on the left).
+REDUCTION_FNS = {
+    operator.add: "+", operator.iadd: "+", operator.sub: "+", operator.isub: "+",
+    operator.mul: "*", operator.imul: "*",
+}
+REDUCTION_CALLS = {("min", "builtins"): "min", ("max", "builtins"): "max"}
+
+
+def range_loop_call(func_ir, blocks, loop):
+    # For a `for ... in range(...)` loop returns the range call expression and
+    # the name the header binds each iteration's index to.
+    for stmt in blocks[loop.header].find_insts(ir.Assign):
+        value = stmt.value
+        if not isinstance(value, ir.Expr) or value.op != "iternext":
+            continue
+        iterator = guard(get_definition, func_ir, value.value)
+        if not isinstance(iterator, ir.Expr) or iterator.op != "getiter":
+            return None, None
+        call = guard(get_definition, func_ir, iterator.value)
+        if not isinstance(call, ir.Expr) or call.op != "call":
+            return None, None
+        if guard(find_callname, func_ir, call) != ("range", "builtins"):
+            return None, None
+        for other in blocks[loop.header].find_insts(ir.Assign):
+            if isinstance(other.value, ir.Expr) and other.value.op == "pair_first" \
+                    and other.value.value.name == stmt.target.name:
+                return call, other.target.name
+    return None, None
+
+
+def copies_of(assigns, name):
+    # name plus every variable that is a (transitive) copy of it
+    names = {name}
+    changed = True
+    while changed:
+        changed = False
+        for stmt in assigns:
+            if isinstance(stmt.value, ir.Var) and stmt.value.name in names \
+                    and stmt.target.name not in names:
+                names.add(stmt.target.name)
+                changed = True
+    return names
+
+
+def reduction_chain(func_ir, loop_assigns, phi_name):
+    # Names holding partial values of the accumulator started by phi_name, or
+    # None when it is combined with anything but a single reduction operator.
+    chain = {phi_name}
+    families = set()
+    changed = True
+    while changed:
+        changed = False
+        for stmt in loop_assigns:
+            target, value = stmt.target.name, stmt.value
+            if target in chain:
+                continue
+            if isinstance(value, ir.Var):
+                joined = value.name in chain
+            elif value.op == "phi":
+                joined = any(var.name in chain for var in value.incoming_values)
+            elif value.op in ("binop", "inplace_binop") and value.fn in REDUCTION_FNS:
+                lhs, rhs = value.lhs.name in chain, value.rhs.name in chain
+                joined = lhs != rhs and (lhs or value.fn not in (operator.sub, operator.isub))
+                if joined:
+                    families.add(REDUCTION_FNS[value.fn])
+            elif value.op == "call" and guard(find_callname, func_ir, value) in REDUCTION_CALLS:
+                joined = sum(var.name in chain for var in value.args) == 1 and not value.kws
+                if joined:
+                    families.add(REDUCTION_CALLS[guard(find_callname, func_ir, value)])
+            else:
+                joined = False
+            if joined:
+                chain.add(target)
+                changed = True
+    if len(families) > 1:
+        return None
+    # every value flowing around a back edge must come from the reduction
+    defined = {stmt.target.name for stmt in loop_assigns}
+    for stmt in loop_assigns:
+        if stmt.target.name in chain and isinstance(stmt.value, ir.Expr) and stmt.value.op == "phi":
+            if any(var.name in defined and var.name not in chain for var in stmt.value.incoming_values):
+                return None
+    # partial values may only feed the reduction itself
+    for stmt in loop_assigns:
+        if stmt.target.name not in chain and get_rhs_vars(stmt) & chain:
+            return None
+    # and each path applies the operator once: the parfor lowering rejects
+    # s = s + x + 1, which combines a partial value again
+    updates = [
+        stmt for stmt in loop_assigns
+        if stmt.target.name in chain and isinstance(stmt.value, ir.Expr)
+        and stmt.value.op in ("binop", "inplace_binop", "call")
+    ]
+    stepped = {stmt.target.name for stmt in updates}
+    changed = True
+    while changed:
+        changed = False
+        for stmt in loop_assigns:
+            if stmt.target.name in stepped or stmt.target.name == phi_name or stmt.target.name not in chain:
+                continue
+            if get_rhs_vars(stmt) & stepped:
+                stepped.add(stmt.target.name)
+                changed = True
+    if any(get_rhs_vars(stmt) & stepped for stmt in updates):
+        return None
+    return chain
+
+
+def index_axes(func_ir, index, induction):
+    # Axes at which an array index is exactly the loop induction variable.
+    if index.name in induction:
+        return {0}
+    items = guard(get_definition, func_ir, index)
+    if isinstance(items, ir.Expr) and items.op == "build_tuple":
+        return {axis for axis, item in enumerate(items.items) if item.name in induction}
+    return set()
+
+
+def is_metadata_tuple(func_ir, var):
+    source = guard(get_definition, func_ir, var)
+    return isinstance(source, ir.Expr) and source.op == "getattr" and source.attr in ("shape", "strides")
+
+
+def is_parallel_loop(func_ir, blocks, cfg, loop):
+    # True if no iteration of `loop` reads or writes anything another
+    # iteration writes, apart from scalar reductions the parfor lowering
+    # knows how to combine. Arrays written in the loop must be fresh numpy
+    # allocations that are only ever indexed at the induction variable along
+    # one fixed axis, so distinct iterations touch disjoint elements.
+    call, index_name = range_loop_call(func_ir, blocks, loop)
+    if call is None or len(loop.exits) != 1:
+        return False
+    loop_stmts = [stmt for label in loop.body for stmt in blocks[label].body]
+    loop_assigns = [stmt for stmt in loop_stmts if isinstance(stmt, ir.Assign)]
+    defined = {stmt.target.name for stmt in loop_assigns}
+
+    induction = copies_of(loop_assigns, index_name)
+
+    # scalar loop-carried values show up as phis in the header after SSA
+    header_phis = set()
+    for stmt in blocks[loop.header].find_insts(ir.Assign):
+        if isinstance(stmt.value, ir.Expr) and stmt.value.op == "phi":
+            if reduction_chain(func_ir, loop_assigns, stmt.target.name) is None:
+                return False
+            header_phis.add(stmt.target.name)
+    # only the final value of a reduction may be read after the loop
+    for label, block in blocks.items():
+        if label in loop.body:
+            continue
+        for stmt in block.body:
+            if (get_rhs_vars(stmt) & defined) - header_phis:
+                return False
+
+    written = set()
+    for stmt in loop_stmts:
+        if isinstance(stmt, ir.SetItem):
+            written.add(stmt.target.name)
+        elif isinstance(stmt, ir.Assign):
+            value = stmt.value
+            if isinstance(value, ir.Expr):
+                if value.op not in PARALLEL_SAFE_OPS:
+                    return False
+                if value.op == "call":
+                    callname = guard(find_callname, func_ir, value)
+                    if callname not in PURE_CALLS and callname not in ALLOCATING_CALLS:
+                        return False
+                if value.op == "inplace_binop" and value.lhs.name not in defined:
+                    return False
+                if value.op in ("getitem", "static_getitem", "typed_getitem") \
+                        and not {var.name for var in value.list_vars()} & defined \
+                        and not is_metadata_tuple(func_ir, value.value):
+                    # the parfor lowering hoists invariant lookups, which
+                    # then run (and may raise) even when the loop does not
+                    return False
+        elif not isinstance(stmt, (ir.Del, ir.Jump, ir.Branch)):
+            return False
+
+    for name in written:
+        root = guard(get_definition, func_ir, name, lhs_only=True)
+        allocation = guard(get_definition, func_ir, name)
+        if root is None or not isinstance(allocation, ir.Expr) or allocation.op != "call" \
+                or guard(find_callname, func_ir, allocation) not in ALLOCATING_CALLS:
+            return False
+        root = root.name if isinstance(root, ir.Var) else root
+        if root in defined:
+            continue  # allocated per iteration, private to it
+        aliases = {root}
+        changed = True
+        while changed:
+            changed = False
+            for block in blocks.values():
+                for stmt in block.find_insts(ir.Assign):
+                    if isinstance(stmt.value, ir.Var) and stmt.value.name in aliases \
+                            and stmt.target.name not in aliases:
+                        aliases.add(stmt.target.name)
+                        changed = True
+        axes = None
+        for stmt in loop_stmts:
+            if not get_rhs_vars(stmt) & aliases and not (
+                    isinstance(stmt, ir.SetItem) and stmt.target.name in aliases):
+                continue
+            if isinstance(stmt, ir.SetItem) and stmt.target.name in aliases \
+                    and stmt.value.name not in aliases and stmt.index.name not in aliases:
+                access = index_axes(func_ir, stmt.index, induction)
+            elif isinstance(stmt, ir.Assign) and isinstance(stmt.value, ir.Var):
+                continue
+            elif isinstance(stmt, ir.Assign) and stmt.value.op == "getattr" \
+                    and stmt.value.attr in INVARIANT_ATTRS:
+                continue
+            elif isinstance(stmt, ir.Assign) and stmt.value.op == "getitem" \
+                    and stmt.value.value.name in aliases and stmt.value.index.name not in aliases:
+                access = index_axes(func_ir, stmt.value.index, induction)
+            else:
+                return False
+            axes = access if axes is None else axes & access
+            if not axes:
+                return False
+        # views or other values derived from the array before the loop
+        for stmt in loop_stmts:
+            for used in get_rhs_vars(stmt) - defined - aliases:
+                source = guard(get_definition, func_ir, used)
+                if isinstance(source, ir.Expr) and {var.name for var in source.list_vars()} & aliases \
+                        and not (source.op == "getattr" and source.attr in INVARIANT_ATTRS):
+                    return False
+    return True
 
 
 @register_pass(mutates_CFG=False, analysis_only=False)
-class PrintAssignments(FunctionPass):
-    _name = "dead_code_elimination1"
+class AutoParallelizeLoops(FunctionPass):
+    _name = "auto_parallelize_loops"
 
     def __init__(self):
         FunctionPass.__init__(self)
 
     def run_pass(self, state):
-        # state contains the FunctionIR to be mutated,
-        mutate = True
-        new_len, cur_len = 0, 0
+        # Rewrites the range() of provably independent loops to prange so the
+        # parfor pass runs them in parallel. Outer loops are tried first; the
+        # loops nested in one that was converted are left serial.
+        if not state.flags.auto_parallel.enabled:
+            return False
         func_ir = state.func_ir
-        vars = ir_utils.get_name_var_table(func_ir.blocks)
+        blocks = func_ir.blocks
+        cfg = compute_cfg_from_blocks(blocks)
+        loops = sorted(cfg.loops().values(), key=lambda loop: len(loop.body), reverse=True)
+        parallel_bodies = []
+        mutated = False
+        for loop in loops:
+            if any(loop.header in body for body in parallel_bodies):
+                continue
+            if not is_parallel_loop(func_ir, blocks, cfg, loop):
+                continue
+            call, _ = range_loop_call(func_ir, blocks, loop)
+            for block in blocks.values():
+                for position, stmt in enumerate(block.body):
+                    if isinstance(stmt, ir.Assign) and stmt.value is call:
+                        break
+                else:
+                    continue
+                prange_var = ir.Var(block.scope, mk_unique_var("$prange"), call.loc)
+                block.body.insert(position, ir.Assign(ir.Global("prange", prange, call.loc), prange_var, call.loc))
+                call.func = prange_var
+                break
+            parallel_bodies.append(loop.body)
+            mutated = True
+        if mutated:
+            func_ir._definitions = build_definitions(blocks)
+        return mutated
+
+
+def gemm_accumulate(C, A, B, m, n, k):
+    # C[:m, :n] += A[:m, :k] @ B[:k, :n], exactly as the loop nest it replaces
+    for i in range(m):
+        for j in range(n):
+            for p in range(k):
+                C[i, j] += A[i, p] * B[p, j]
+
+
+def gemv_accumulate(y, A, x, m, k):
+    # y[:m] += A[:m, :k] @ x[:k]
+    for i in range(m):
+        for p in range(k):
+            y[i] += A[i, p] * x[p]
+
+
+gemm_loops = njit(gemm_accumulate)
+gemv_loops = njit(gemv_accumulate)
+BLAS_DTYPES = (types.float32, types.float64, types.complex64, types.complex128)
+
+
+def blas_available():
+    return importlib.util.find_spec("scipy.linalg.cython_blas") is not None
+
+
+def blas_compatible(*arrays):
+    # np.dot only goes through BLAS for matching float/complex dtypes
+    return (
+        all(isinstance(array, types.Array) for array in arrays)
+        and arrays[0].dtype in BLAS_DTYPES
+        and all(array.dtype == arrays[0].dtype for array in arrays)
+        and blas_available()
+    )
+
+
+@njit
+def memory_span(a):
+    # [start, end) range of addresses the elements of a live in
+    start = end = a.ctypes.data
+    if a.size == 0:
+        return start, end
+    for axis in range(a.ndim):
+        offset = (a.shape[axis] - 1) * a.strides[axis]
+        if offset < 0:
+            start += offset
+        else:
+            end += offset
+    return start, end + a.itemsize
+
+
+@njit
+def may_overlap(a, b):
+    a_start, a_end = memory_span(a)
+    b_start, b_end = memory_span(b)
+    return a_start < b_end and b_start < a_end
+
+
+@overload(gemm_accumulate)
+def ol_gemm_accumulate(C, A, B, m, n, k):
+    if not (blas_compatible(C, A, B) and C.ndim == A.ndim == B.ndim == 2):
+        return lambda C, A, B, m, n, k: gemm_loops(C, A, B, m, n, k)
+
+    def impl(C, A, B, m, n, k):
+        # a negative bound is an empty range for the loops but counts from
+        # the end in a slice
+        in_bounds = 0 <= m <= C.shape[0] and m <= A.shape[0] and 0 <= n <= C.shape[1] \
+            and n <= B.shape[1] and 0 <= k <= A.shape[1] and k <= B.shape[0]
+        if not in_bounds or may_overlap(C, A) or may_overlap(C, B):
+            gemm_loops(C, A, B, m, n, k)
+        elif m == C.shape[0] == A.shape[0] and n == C.shape[1] == B.shape[1] and k == A.shape[1]:
+            C += np.dot(A, B)
+        else:
+            C[:m, :n] += np.dot(np.ascontiguousarray(A[:m, :k]), np.ascontiguousarray(B[:k, :n]))
+    return impl
+
+
+@overload(gemv_accumulate)
+def ol_gemv_accumulate(y, A, x, m, k):
+    if not (blas_compatible(y, A, x) and y.ndim == x.ndim == 1 and A.ndim == 2):
+        return lambda y, A, x, m, k: gemv_loops(y, A, x, m, k)
+
+    def impl(y, A, x, m, k):
+        in_bounds = 0 <= m <= y.shape[0] and m <= A.shape[0] and 0 <= k <= A.shape[1] and k <= x.shape[0]
+        if not in_bounds or may_overlap(y, A) or may_overlap(y, x):
+            gemv_loops(y, A, x, m, k)
+        elif m == y.shape[0] == A.shape[0] and k == A.shape[1] == x.shape[0]:
+            y += np.dot(A, x)
+        else:
+            y[:m] += np.dot(np.ascontiguousarray(A[:m, :k]), np.ascontiguousarray(x[:k]))
+    return impl
+
+
+def perfect_loop_nest(loops, outer):
+    # [outer, child, grandchild, ...] while every loop holds exactly one
+    # directly nested loop
+    nest = [outer]
+    while True:
+        current = nest[-1]
+        inner = [
+            loop for loop in loops
+            if loop.header in current.body and loop.header != current.header
+        ]
+        if not inner:
+            return nest
+        child = max(inner, key=lambda loop: len(loop.body))
+        if any(loop.header not in child.body for loop in inner):
+            return nest
+        nest.append(child)
+
+
+def range_bound(func_ir, call):
+    # n for range(n) and range(0, n), None for any other range
+    if call.kws or call.vararg:
+        return None
+    if len(call.args) == 1:
+        return call.args[0]
+    if len(call.args) == 2:
+        start = guard(get_definition, func_ir, call.args[0])
+        if isinstance(start, ir.Const) and start.value == 0:
+            return call.args[1]
+    return None
+
+
+# Statements allowed in a nest besides the accumulation being matched: loop
+# control and pure bound/index computations.
+NEST_SAFE_OPS = {
+    "getattr", "static_getitem", "getitem", "build_tuple", "binop", "unary",
+    "getiter", "iternext", "pair_first", "pair_second", "cast",
+}
+
+
+def match_accumulation(func_ir, store, inductions):
+    # Matches `out[idx] += lhs[...] * rhs[...]` (or `out[idx] = out[idx] + ...`)
+    # and returns (out, out_roles, [(array, roles), (array, roles)]) where
+    # roles are the loop depths of the induction variables indexing each axis.
+    def roles_of(index):
+        for depth, names in enumerate(inductions):
+            if index.name in names:
+                return (depth,)
+        items = guard(get_definition, func_ir, index)
+        if isinstance(items, ir.Expr) and items.op == "build_tuple":
+            roles = []
+            for item in items.items:
+                depth = [d for d, names in enumerate(inductions) if item.name in names]
+                if not depth:
+                    return None
+                roles.append(depth[0])
+            return tuple(roles)
+        return None
+
+    def load(var):
+        value = guard(get_definition, func_ir, var)
+        if isinstance(value, ir.Expr) and value.op == "getitem":
+            return value.value, roles_of(value.index), value.index
+        return None, None, None
+
+    out_roles = roles_of(store.index)
+    total = guard(get_definition, func_ir, store.value)
+    if out_roles is None or not isinstance(total, ir.Expr) \
+            or total.op not in ("binop", "inplace_binop") or total.fn not in (operator.add, operator.iadd):
+        return None
+    for acc, product in ((total.lhs, total.rhs), (total.rhs, total.lhs)):
+        array, roles, index = load(acc)
+        if array is None or roles != out_roles or guard(get_definition, func_ir, array, lhs_only=True) \
+                != guard(get_definition, func_ir, store.target, lhs_only=True):
+            continue
+        mul = guard(get_definition, func_ir, product)
+        if not isinstance(mul, ir.Expr) or mul.op != "binop" or mul.fn != operator.mul:
+            continue
+        factors = [load(mul.lhs), load(mul.rhs)]
+        if any(factor[0] is None or factor[1] is None for factor in factors):
+            continue
+        return store.target, out_roles, [(factor[0], factor[1]) for factor in factors]
+    return None
+
+
+def match_linear_algebra(out_roles, factors, depth):
+    # Orders the factors as (matrix, other) and returns the helper plus the
+    # loop depths of its m, n, k bounds, or None when the index pattern is
+    # not C[i, j] += A[i, k] * B[k, j] or y[i] += A[i, k] * x[k].
+    for (a, a_roles), (b, b_roles) in (factors, factors[::-1]):
+        if depth == 3 and len(out_roles) == 2:
+            i, j = out_roles
+            k = ({0, 1, 2} - {i, j}).pop() if i != j else None
+            if k is not None and a_roles == (i, k) and b_roles == (k, j):
+                return gemm_accumulate, (a, b), (i, j, k)
+        if depth == 2 and len(out_roles) == 1:
+            (i,) = out_roles
+            k = 1 - i
+            if a_roles == (i, k) and b_roles == (k,):
+                return gemv_accumulate, (a, b), (i, k)
+    return None
 
-        for blk in func_ir.blocks.values():
-            cur_len = len(blk.body)
-            while cur_len != new_len:
-                used_vars = []
-                cur_len = len(blk.body)
-                for stmt in blk.body:
-                    print(stmt)
-                    used_vars.append(get_rhs_vars(stmt))
-                used_vars = [item for sublist in used_vars for item in sublist]
-
-                new_body = []
-                # iterate over each statement in the block
-                for stmt in blk.body:
-                    target_var = get_lhs_vars(stmt)
-                    if target_var.name not in used_vars:
-                        mutate = True  # the pass will mutate the IR
-                        continue  # skip this statement
-                    new_body.append(stmt)  # keep this statement
-                    print(stmt)
-                blk.body = new_body  # update the block with new statements
-                new_len = len(blk.body)
-        return mutate  # the pass has not mutated the IR
+
+def nest_side_effects_free(func_ir, blocks, body, store):
+    # Names defined in the loop nest `body` if, apart from `store` and the
+    # value it stores, it only runs loop control and pure index arithmetic,
+    # and none of its values are used after it; None otherwise.
+    defined = set()
+    for label in body:
+        for stmt in blocks[label].body:
+            if isinstance(stmt, (ir.Jump, ir.Branch, ir.Del)) or stmt is store:
+                continue
+            if not isinstance(stmt, ir.Assign):
+                return None
+            defined.add(stmt.target.name)
+            value = stmt.value
+            if stmt.target.name == store.value.name or isinstance(value, (ir.Const, ir.Global, ir.FreeVar, ir.Var)):
+                continue
+            if not isinstance(value, ir.Expr):
+                return None
+            if value.op == "call":
+                if guard(find_callname, func_ir, value) != ("range", "builtins"):
+                    return None
+            elif value.op not in NEST_SAFE_OPS:
+                return None
+    for label, block in blocks.items():
+        if label not in body and any(get_rhs_vars(stmt) & defined for stmt in block.body):
+            return None
+    return defined
+
+
+def replace_nest_with_call(func_ir, blocks, cfg, outer, helper, args):
+    # Replaces the loop nest `outer` with `helper(*args)` run in its
+    # preheader. Arguments computed inside the nest (the bounds of inner
+    # loops) are hoisted along with everything they depend on.
+    body = outer.body
+    assigns = {stmt.target.name: stmt for label in body for stmt in blocks[label].find_insts(ir.Assign)}
+    moved, moved_names = [], set()
+
+    def hoist(name):
+        if name not in assigns or name in moved_names:
+            return True
+        stmt = assigns[name]
+        value = stmt.value
+        if isinstance(value, ir.Expr):
+            if value.op not in ("getattr", "static_getitem", "binop", "unary", "cast"):
+                return False
+            if value.op == "binop" and value.fn not in SAFE_BINOPS:
+                return False
+        elif not isinstance(value, (ir.Const, ir.Global, ir.FreeVar, ir.Var)):
+            return False
+        if not all(hoist(used) for used in get_rhs_vars(stmt)):
+            return False
+        moved.append(stmt)
+        moved_names.add(name)
+        return True
+
+    if len(outer.exits) != 1 or not all(hoist(arg.name) for arg in args):
+        return False
+    preheader = ensure_preheader(blocks, cfg, outer)
+    if preheader is None:
+        return False
+    (exit_label,) = outer.exits
+    block = blocks[preheader]
+    loc = block.terminator.loc
+    helper_var = ir.Var(block.scope, mk_unique_var("$" + helper.__name__), loc)
+    result_var = ir.Var(block.scope, mk_unique_var("$idiom_result"), loc)
+    block.body = block.body[:-1] + moved + [
+        ir.Assign(ir.Global(helper.__name__, helper, loc), helper_var, loc),
+        ir.Assign(ir.Expr.call(helper_var, args, (), loc), result_var, loc),
+        ir.Jump(exit_label, loc),
+    ]
+    for label in body:
+        del blocks[label]
+    for stmt in blocks[exit_label].find_insts(ir.Assign):
+        if isinstance(stmt.value, ir.Expr) and stmt.value.op == "phi":
+            stmt.value.incoming_blocks = [
+                preheader if incoming in body else incoming for incoming in stmt.value.incoming_blocks
+            ]
+    return True
+
+
+@register_pass(mutates_CFG=True, analysis_only=False)
+class LinearAlgebraIdioms(FunctionPass):
+    _name = "linear_algebra_idioms"
+
+    def __init__(self):
+        FunctionPass.__init__(self)
+
+    def run_pass(self, state):
+        # Replaces perfectly nested GEMM/GEMV accumulation loops with a call
+        # to gemm_accumulate/gemv_accumulate. Those use np.dot when BLAS can
+        # take the dtypes and the output does not overlap the inputs, and
+        # run the original loops otherwise.
+        func_ir = state.func_ir
+        blocks = func_ir.blocks
+        mutated = False
+        while True:
+            cfg = compute_cfg_from_blocks(blocks)
+            loops = sorted(cfg.loops().values(), key=lambda loop: len(loop.body), reverse=True)
+            for outer in loops:
+                if self.replace_nest(func_ir, blocks, cfg, loops, outer):
+                    mutated = True
+                    func_ir._definitions = build_definitions(blocks)
+                    break
+            else:
+                break
+        return mutated
+
+    def replace_nest(self, func_ir, blocks, cfg, loops, outer):
+        nest = perfect_loop_nest(loops, outer)
+        if len(nest) not in (2, 3) or len(outer.exits) != 1:
+            return False
+        body = outer.body
+        assigns = [stmt for label in body for stmt in blocks[label].find_insts(ir.Assign)]
+        inductions, bounds = [], []
+        for loop in nest:
+            call, index_name = range_loop_call(func_ir, blocks, loop)
+            bound = range_bound(func_ir, call) if call is not None else None
+            if bound is None:
+                return False
+            inductions.append(copies_of(assigns, index_name))
+            bounds.append(bound)
+
+        stores = [stmt for label in body for stmt in blocks[label].body if isinstance(stmt, ir.SetItem)]
+        if len(stores) != 1 or not any(stores[0] in blocks[label].body for label in nest[-1].body):
+            return False
+        matched = match_accumulation(func_ir, stores[0], inductions)
+        if matched is None:
+            return False
+        out, out_roles, factors = matched
+        found = match_linear_algebra(out_roles, factors, len(nest))
+        if found is None:
+            return False
+        helper, (a, b), roles = found
+
+        defined = nest_side_effects_free(func_ir, blocks, body, stores[0])
+        if defined is None or {out.name, a.name, b.name} & defined:
+            return False
+        args = [out, a, b] + [bounds[depth] for depth in roles]
+        return replace_nest_with_call(func_ir, blocks, cfg, outer, helper, args)
+
+
+def csr_spmv_accumulate(y, indptr, indices, data, x, n):
+    # y[:n] += A[:n] @ x for the CSR matrix (indptr, indices, data)
+    for i in range(n):
+        for p in range(indptr[i], indptr[i + 1]):
+            y[i] += data[p] * x[indices[p]]
+
+
+csr_spmv_loops = njit(csr_spmv_accumulate)
+
+
+@njit(parallel=True)
+def csr_spmv_balanced(y, indptr, indices, data, x, n):
+    # One contiguous block of rows per thread, with the block boundaries
+    # placed so every block holds about the same number of nonzeros rather
+    # than the same number of rows. Each row is still summed in order, so
+    # the result is the same as the serial loop's. A row is summed in a
+    # local of y's dtype, so y, data and x must share one dtype: the loop
+    # casts y[i] back to its dtype after every +=, the local would not.
+    parts = max(min(numba.get_num_threads(), n), 1)
+    first, last = indptr[0], indptr[n]
+    bounds = np.empty(parts + 1, dtype=np.int64)
+    for t in range(parts + 1):
+        bounds[t] = np.searchsorted(indptr[:n + 1], first + (last - first) * t // parts)
+    bounds[0] = 0
+    bounds[parts] = n
+    for t in prange(parts):
+        for i in range(bounds[t], bounds[t + 1]):
+            total = y[i]
+            for p in range(indptr[i], indptr[i + 1]):
+                total += data[p] * x[indices[p]]
+            y[i] = total
+
+
+def same_dtype(*arrays):
+    return all(isinstance(array, types.Array) for array in arrays) \
+        and all(array.dtype == arrays[0].dtype for array in arrays)
+
+
+@overload(csr_spmv_accumulate)
+def ol_csr_spmv_accumulate(y, indptr, indices, data, x, n):
+    if not same_dtype(y, data, x):
+        return lambda y, indptr, indices, data, x, n: csr_spmv_loops(y, indptr, indices, data, x, n)
+
+    def impl(y, indptr, indices, data, x, n):
+        if may_overlap(y, x) or may_overlap(y, data) or may_overlap(y, indptr) or may_overlap(y, indices):
+            csr_spmv_loops(y, indptr, indices, data, x, n)
+        else:
+            csr_spmv_balanced(y, indptr, indices, data, x, n)
+    return impl
+
+
+def match_csr_spmv(func_ir, blocks, nest):
+    # Matches `for i in range(n): for p in range(P[i], P[i + 1]):
+    # y[i] += D[p] * x[J[p]]` (in either factor order) and returns the
+    # store and the helper arguments [y, P, J, D, x, n].
+    (call, index_name), (inner_call, inner_name) = [range_loop_call(func_ir, blocks, loop) for loop in nest]
+    if call is None or inner_call is None or inner_call.kws or len(inner_call.args) != 2:
+        return None
+    n = range_bound(func_ir, call)
+    assigns = [stmt for label in nest[0].body for stmt in blocks[label].find_insts(ir.Assign)]
+    rows, entries = copies_of(assigns, index_name), copies_of(assigns, inner_name)
+
+    def load(var, indexed_by):
+        value = guard(get_definition, func_ir, var)
+        if isinstance(value, ir.Expr) and value.op == "getitem" and value.index.name in indexed_by:
+            return value.value
+        return None
+
+    def same_array(a, b):
+        return guard(get_definition, func_ir, a, lhs_only=True) == guard(get_definition, func_ir, b, lhs_only=True)
+
+    start, stop = inner_call.args
+    indptr = load(start, rows)
+    next_row = guard(get_definition, func_ir, stop)
+    if n is None or indptr is None or not isinstance(next_row, ir.Expr) or next_row.op != "getitem" \
+            or not same_array(next_row.value, indptr):
+        return None
+    step = guard(get_definition, func_ir, next_row.index)
+    if not isinstance(step, ir.Expr) or step.op != "binop" or step.fn != operator.add:
+        return None
+    operands = {step.lhs.name, step.rhs.name}
+    if not operands & rows or not any(
+            isinstance(guard(get_definition, func_ir, name), ir.Const)
+            and guard(get_definition, func_ir, name).value == 1 for name in operands - rows):
+        return None
+
+    stores = [stmt for label in nest[0].body for stmt in blocks[label].body if isinstance(stmt, ir.SetItem)]
+    if len(stores) != 1 or stores[0].index.name not in rows:
+        return None
+    store = stores[0]
+    total = guard(get_definition, func_ir, store.value)
+    if not isinstance(total, ir.Expr) or total.op not in ("binop", "inplace_binop") \
+            or total.fn not in (operator.add, operator.iadd):
+        return None
+    for acc, product in ((total.lhs, total.rhs), (total.rhs, total.lhs)):
+        y = load(acc, rows)
+        mul = guard(get_definition, func_ir, product)
+        if y is None or not same_array(y, store.target) or not isinstance(mul, ir.Expr) \
+                or mul.op != "binop" or mul.fn != operator.mul:
+            continue
+        for value, gathered in ((mul.lhs, mul.rhs), (mul.rhs, mul.lhs)):
+            data = load(value, entries)
+            gather = guard(get_definition, func_ir, gathered)
+            if data is None or not isinstance(gather, ir.Expr) or gather.op != "getitem":
+                continue
+            indices = load(gather.index, entries)
+            if indices is not None:
+                return store, [store.target, indptr, indices, data, gather.value, n]
+    return None
+
+
+@register_pass(mutates_CFG=True, analysis_only=False)
+class BalancedSpMV(FunctionPass):
+    _name = "balanced_spmv"
+
+    def __init__(self):
+        FunctionPass.__init__(self)
+
+    def run_pass(self, state):
+        # Replaces CSR sparse matrix-vector loops with csr_spmv_accumulate,
+        # which runs rows in parallel in nnz-balanced blocks. Enabled by
+        # the compiler's `balance_spmv` attribute and parallel=True.
+        if not state.flags.auto_parallel.enabled or not getattr(state.pipeline, "balance_spmv", False):
+            return False
+        func_ir = state.func_ir
+        blocks = func_ir.blocks
+        mutated = False
+        while True:
+            cfg = compute_cfg_from_blocks(blocks)
+            loops = sorted(cfg.loops().values(), key=lambda loop: len(loop.body), reverse=True)
+            for outer in loops:
+                nest = perfect_loop_nest(loops, outer)
+                matched = match_csr_spmv(func_ir, blocks, nest) if len(nest) == 2 else None
+                if matched is None:
+                    continue
+                store, args = matched
+                defined = nest_side_effects_free(func_ir, blocks, outer.body, store)
+                if defined is None or {arg.name for arg in args[:5]} & defined:
+                    continue
+                if replace_nest_with_call(func_ir, blocks, cfg, outer, csr_spmv_accumulate, args):
+                    mutated = True
+                    func_ir._definitions = build_definitions(blocks)
+                    break
+            else:
+                break
+        return mutated
+
+
+DEFAULT_TILE_SIZE = 64
+ALLOCATORS = {name for name, module in ALLOCATING_CALLS}
+PURE_FUNCTION_NAMES = {name for name, module in PURE_CALLS}
+
+
+def range_bounds(loop):
+    # (start, stop) of `for v in range(...)` with unit step, else None
+    call = loop.iter
+    if not isinstance(loop.target, ast.Name) or loop.orelse or not isinstance(call, ast.Call) \
+            or not isinstance(call.func, ast.Name) or call.func.id != "range" or call.keywords:
+        return None
+    if len(call.args) == 1:
+        return ast.Constant(0), call.args[0]
+    if len(call.args) == 2:
+        return call.args[0], call.args[1]
+    if len(call.args) == 3 and isinstance(call.args[2], ast.Constant) and call.args[2].value == 1:
+        return call.args[0], call.args[1]
+    return None
+
+
+def ast_loop_nest(loop):
+    # the perfectly nested `for ... in range(...)` loops starting at loop
+    nest = [loop]
+    while len(nest[-1].body) == 1 and isinstance(nest[-1].body[0], ast.For) \
+            and range_bounds(nest[-1].body[0]) is not None:
+        nest.append(nest[-1].body[0])
+    return nest
+
+
+def names_in(node):
+    return {sub.id for sub in ast.walk(node) if isinstance(sub, ast.Name)}
+
+
+def subscript_items(node):
+    return node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+
+
+def is_pure_expression(node):
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Call):
+            func = sub.func
+            if isinstance(func, ast.Name):
+                if func.id not in PURE_FUNCTION_NAMES:
+                    return False
+            elif not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                      and func.attr in PURE_FUNCTION_NAMES):
+                return False
+        elif isinstance(sub, ast.Attribute):
+            if not isinstance(sub.ctx, ast.Load) or (sub.attr not in INVARIANT_ATTRS - {"T"}
+                                                     and sub.attr not in PURE_FUNCTION_NAMES):
+                return False
+        elif isinstance(sub, (ast.Lambda, ast.NamedExpr, ast.Yield, ast.YieldFrom, ast.Await,
+                              ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.Starred)):
+            return False
+    return True
+
+
+def is_permutable(function, nest):
+    # True when the loops of `nest` can be reordered and tiled without
+    # changing the result. The body may only assign to iteration-private
+    # temporaries and to locally allocated arrays, and every access to a
+    # written array must use the same index made of loop variables, missing
+    # at most one of them: dependences then only run along that one loop,
+    # in increasing order whatever the nesting (so even floating point
+    # accumulations produce bit-identical results).
+    loop_vars = [loop.target.id for loop in nest]
+    if len(set(loop_vars)) != len(loop_vars):
+        return False
+    body = nest[-1].body
+    assigned = set()
+    for stmt in body:
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+            target = stmt.targets[0]
+        elif isinstance(stmt, ast.AugAssign):
+            target = stmt.target
+        else:
+            return False
+        if isinstance(target, ast.Name):
+            assigned.add(target.id)
+        elif not (isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name)):
+            return False
+        if not is_pure_expression(stmt):
+            return False
+    if assigned & set(loop_vars):
+        return False
+    for loop in nest:
+        start, stop = range_bounds(loop)
+        if (names_in(start) | names_in(stop)) & (set(loop_vars) | assigned) \
+                or not is_pure_expression(start) or not is_pure_expression(stop):
+            return False
+
+    # temporaries and loop variables must not be visible outside the nest
+    inside = {id(node) for node in ast.walk(nest[0])}
+    for node in ast.walk(function):
+        if id(node) not in inside and isinstance(node, ast.Name) and node.id in assigned | set(loop_vars):
+            return False
+    # and temporaries are written before they are read in each iteration
+    written = set()
+    for stmt in body:
+        value = stmt.value
+        reads = names_in(value)
+        if isinstance(stmt, ast.AugAssign):
+            reads |= names_in(stmt.target)
+        elif isinstance(stmt.targets[0], ast.Subscript):
+            reads |= names_in(stmt.targets[0])
+        if (reads & assigned) - written:
+            return False
+        if isinstance(stmt, ast.AugAssign) or isinstance(stmt.targets[0], ast.Subscript):
+            continue
+        written.add(stmt.targets[0].id)
+
+    arrays = {
+        (stmt.target if isinstance(stmt, ast.AugAssign) else stmt.targets[0]).value.id
+        for stmt in body
+        if isinstance(stmt.target if isinstance(stmt, ast.AugAssign) else stmt.targets[0], ast.Subscript)
+    }
+    parents = {}
+    for node in ast.walk(function):
+        for child in ast.iter_child_nodes(node):
+            parents[id(child)] = node
+    for array in arrays:
+        index = None
+        for node in ast.walk(ast.Module(body=body, type_ignores=[])):
+            if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == array:
+                dumped = ast.dump(node.slice)
+                if index is None:
+                    index = dumped
+                    items = subscript_items(node)
+                    if not all(isinstance(item, ast.Name) and item.id in loop_vars for item in items) \
+                            or len(set(loop_vars) - {item.id for item in items}) > 1:
+                        return False
+                elif dumped != index:
+                    return False
+        # the array must be a fresh local allocation that is never aliased
+        allocations = 0
+        for node in ast.walk(function):
+            if not isinstance(node, ast.Name) or node.id != array:
+                continue
+            parent = parents.get(id(node))
+            if isinstance(node.ctx, ast.Store):
+                value = parent.value if isinstance(parent, ast.Assign) else None
+                if not (isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute)
+                        and value.func.attr in ALLOCATORS and len(parent.targets) == 1):
+                    return False
+                allocations += 1
+            elif isinstance(parent, ast.Subscript) and parent.value is node:
+                continue
+            elif isinstance(parent, ast.Attribute) and parent.attr in INVARIANT_ATTRS - {"T"}:
+                continue
+            elif not isinstance(parent, ast.Return):
+                return False
+        if allocations != 1:
+            return False
+    return True
+
+
+def is_linear_algebra_nest(nest):
+    # the nests LinearAlgebraIdioms replaces with np.dot are left alone
+    body = nest[-1].body
+    loop_vars = [loop.target.id for loop in nest]
+    if len(body) != 1:
+        return False
+    stmt = body[0]
+    if isinstance(stmt, ast.AugAssign) and isinstance(stmt.op, ast.Add):
+        target, product = stmt.target, stmt.value
+    elif isinstance(stmt, ast.Assign) and isinstance(stmt.value, ast.BinOp) and isinstance(stmt.value.op, ast.Add):
+        target, product = stmt.targets[0], stmt.value.right
+    else:
+        return False
+    if not isinstance(product, ast.BinOp) or not isinstance(product.op, ast.Mult):
+        return False
+
+    def roles(node):
+        if not isinstance(node, ast.Subscript):
+            return None
+        items = subscript_items(node)
+        if not all(isinstance(item, ast.Name) and item.id in loop_vars for item in items):
+            return None
+        return tuple(loop_vars.index(item.id) for item in items)
+
+    out_roles = roles(target)
+    factors = [(product.left, roles(product.left)), (product.right, roles(product.right))]
+    if out_roles is None or any(factor_roles is None for _, factor_roles in factors):
+        return False
+    return match_linear_algebra(out_roles, factors, len(nest)) is not None
+
+
+def access_cost(body, loop_vars):
+    # How badly each loop variable strides through memory when its loop is
+    # innermost: for C-ordered arrays indexing an earlier axis costs more
+    # than the last one, which is contiguous.
+    cost = dict.fromkeys(loop_vars, 0)
+    for node in ast.walk(ast.Module(body=body, type_ignores=[])):
+        if isinstance(node, ast.Subscript):
+            items = subscript_items(node)
+            for axis, item in enumerate(items):
+                if isinstance(item, ast.Name) and item.id in cost:
+                    cost[item.id] += len(items) - 1 - axis
+    return cost
+
+
+def needs_tiling(body, innermost):
+    # an access that still strides along the innermost loop after reordering
+    for node in ast.walk(ast.Module(body=body, type_ignores=[])):
+        if isinstance(node, ast.Subscript):
+            items = subscript_items(node)
+            if any(isinstance(item, ast.Name) and item.id == innermost for item in items[:-1]):
+                return True
+    return False
+
+
+class LoopNestTransformer(ast.NodeTransformer):
+    # Reorders (and if needed tiles) every permutable perfect loop nest of a
+    # function definition.
+
+    def __init__(self, function, tile_sizes):
+        self.function = function
+        self.tile_sizes = tile_sizes
+        self.used_names = names_in(function) | {arg.arg for arg in ast.walk(function) if isinstance(arg, ast.arg)}
+        self.changed = False
+
+    def fresh_name(self, base):
+        name = base
+        while name in self.used_names:
+            name += "_"
+        self.used_names.add(name)
+        return name
+
+    def visit_For(self, node):
+        nest = ast_loop_nest(node)
+        if range_bounds(node) is None or len(nest) < 2 or is_linear_algebra_nest(nest) \
+                or not is_permutable(self.function, nest):
+            self.generic_visit(node)
+            return node
+        body = nest[-1].body
+        loop_vars = [loop.target.id for loop in nest]
+        cost = access_cost(body, loop_vars)
+        order = sorted(nest, key=lambda loop: cost[loop.target.id], reverse=True)
+        tile = self.tile_sizes is not None and needs_tiling(body, order[-1].target.id)
+        if order == nest and not tile:
+            return node
+        self.changed = True
+        if not tile:
+            for loop in reversed(order):
+                body = [ast.For(target=loop.target, iter=loop.iter, body=body, orelse=[])]
+            return body
+
+        # strip-mine every loop and move all the tile loops outside
+        setup, tile_loops, point_loops = [], [], []
+        for depth, loop in enumerate(order):
+            var = loop.target.id
+            start, stop = range_bounds(loop)
+            size = self.tile_sizes[min(depth, len(self.tile_sizes) - 1)]
+            stop_name, tile_name = self.fresh_name(var + "_stop"), self.fresh_name(var + "_tile")
+            setup.append(ast.Assign(targets=[ast.Name(stop_name, ast.Store())], value=stop))
+            tile_loops.append(ast.For(
+                target=ast.Name(tile_name, ast.Store()),
+                iter=ast.Call(ast.Name("range", ast.Load()), [start, ast.Name(stop_name, ast.Load()), ast.Constant(size)], []),
+                body=[], orelse=[],
+            ))
+            end = ast.Call(ast.Name("min", ast.Load()), [
+                ast.BinOp(ast.Name(tile_name, ast.Load()), ast.Add(), ast.Constant(size)),
+                ast.Name(stop_name, ast.Load()),
+            ], [])
+            point_loops.append(ast.For(
+                target=loop.target,
+                iter=ast.Call(ast.Name("range", ast.Load()), [ast.Name(tile_name, ast.Load()), end], []),
+                body=[], orelse=[],
+            ))
+        for loop in reversed(tile_loops + point_loops):
+            loop.body = body
+            body = [loop]
+        return setup + body
+
+
+def tile_function(func, tile_sizes):
+    # Returns a copy of func with its loop nests reordered and tiled, or None
+    # when nothing changed or the source is not available.
+    if func.__closure__:
+        return None
+    try:
+        source = textwrap.dedent(inspect.getsource(func))
+    except (OSError, TypeError):
+        return None
+    tree = ast.parse(source)
+    function = tree.body[0]
+    if not isinstance(function, ast.FunctionDef):
+        return None
+    function.decorator_list = []
+    transformer = LoopNestTransformer(function, tile_sizes)
+    function.body = [transformer.visit(stmt) for stmt in function.body]
+    function.body = [stmt for item in function.body for stmt in (item if isinstance(item, list) else [item])]
+    if not transformer.changed:
+        return None
+    ast.fix_missing_locations(tree)
+    ast.increment_lineno(tree, func.__code__.co_firstlineno - 1)
+    namespace = {}
+    exec(compile(tree, func.__code__.co_filename, "exec"), func.__globals__, namespace)
+    return namespace[function.name]
+
+
+@register_pass(mutates_CFG=True, analysis_only=False)
+class LoopTiling(FunctionPass):
+    _name = "loop_tiling"
+
+    def __init__(self):
+        FunctionPass.__init__(self)
+
+    def run_pass(self, state):
+        # Source level: interchanges the loops of permutable nests so the
+        # innermost loop walks the last axis of as many accesses as possible,
+        # and when some access still strides through memory also tiles the
+        # nest. The tile size is read from the compiler class (`tile_size`,
+        # an int or one size per loop, outermost first; None disables
+        # tiling). The rewritten function replaces the IR wholesale.
+        tile_sizes = getattr(state.pipeline, "tile_size", DEFAULT_TILE_SIZE)
+        if isinstance(tile_sizes, int):
+            tile_sizes = (tile_sizes,)
+        func = tile_function(state.func_id.func, tile_sizes)
+        if func is None:
+            return False
+        state.func_ir = run_frontend(func)
+        return True
 
 
 class MyCompiler(CompilerBase):  # custom compiler extends from CompilerBase
+    tile_size = DEFAULT_TILE_SIZE  # subclass to change, None to only interchange
+
+    def define_pipelines(self):
+        pm = DefaultPassBuilder.define_nopython_pipeline(self.state)
+        pm.add_pass_after(LoopTiling, IRProcessing)
+        pm.add_pass_after(LinearAlgebraIdioms, ReconstructSSA)
+        pm.add_pass_after(LoopInvariantCodeMotion, LinearAlgebraIdioms)
+        pm.add_pass_after(DeadCodeElimination, LoopInvariantCodeMotion)
+        pm.finalize()
+        return [pm]
+
+
+class MyParallelCompiler(CompilerBase):
+    # use with @njit(parallel=True, pipeline_class=MyParallelCompiler)
+    balance_spmv = True  # CSR SpMV loops run in nnz-balanced row blocks
 
     def define_pipelines(self):
         pm = DefaultPassBuilder.define_nopython_pipeline(self.state)
-        #pm.add_pass_after(PrintAssignments, IRProcessing)
-        pm.add_pass_after(PrintAssignments, ReconstructSSA)
+        pm.add_pass_after(LinearAlgebraIdioms, ReconstructSSA)
+        pm.add_pass_after(BalancedSpMV, LinearAlgebraIdioms)
+        pm.add_pass_after(LoopInvariantCodeMotion, BalancedSpMV)
+        pm.add_pass_after(AutoParallelizeLoops, LoopInvariantCodeMotion)
+        pm.add_pass_after(DeadCodeElimination, AutoParallelizeLoops)
         pm.finalize()
         return [pm]
 
@@ -137,11 +1465,12 @@ def dce_test():
     return c
 
 
-# test SpMV csr
-# generate a random sparse matrix CSR format
-print(numba.__version__)
-c = dce_test()
-print(c)
+if __name__ == "__main__":
+    # test SpMV csr
+    # generate a random sparse matrix CSR format
+    print(numba.__version__)
+    c = dce_test()
+    print(c)
 
 
 
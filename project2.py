@@ -1,11 +1,134 @@
+import argparse
 import ast
-from collections import OrderedDict
+import hashlib
+import json
+import marshal
+import operator
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BINARY_OPERATORS = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mult": operator.mul,
+    "div": operator.truediv,
+    "floordiv": operator.floordiv,
+    "mod": operator.mod,
+    "pow": operator.pow,
+    "lshift": operator.lshift,
+    "rshift": operator.rshift,
+    "bitor": operator.or_,
+    "bitxor": operator.xor,
+    "bitand": operator.and_,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "eq": operator.eq,
+    "noteq": operator.ne,
+}
+
+UNARY_OPERATORS = {
+    "usub": operator.neg,
+    "uadd": operator.pos,
+    "not": operator.not_,
+    "invert": operator.invert,
+}
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Opcodes are interned into small integers; OPCODE_NAMES maps them back.
+OPCODES = {}
+OPCODE_NAMES = []
+
+
+def intern_opcode(name):
+    code = OPCODES.get(name)
+    if code is None:
+        code = OPCODES[name] = len(OPCODE_NAMES)
+        OPCODE_NAMES.append(sys.intern(name))
+    return code
+
+
+for _name in ("assign", "phi", "branch", "jump", "add", "sub", "mult", "div", "mod",
+              "lt", "lte", "gt", "gte", "eq", "noteq", "length", "get_element", "store_element"):
+    intern_opcode(_name)
+del _name
+
+
+class SSAValue:
+    # An SSA name. Values are identified by an integer id (their slot in the
+    # owning ValueTable) and compare/hash by identity; the printable name
+    # "base_version" is only built when the value is printed.
+    __slots__ = ("id", "base", "version")
+
+    def __init__(self, id, base, version):
+        self.id = id
+        self.base = base
+        self.version = version
+
+    def __hash__(self):
+        return self.id
+
+    def __repr__(self):
+        return f"{self.base}_{self.version}"
+
+
+class ValueTable:
+    def __init__(self):
+        self.values = []
+        self.counters = {}
+
+    def new_value(self, base):
+        version = self.counters.get(base, 0) + 1
+        self.counters[base] = version
+        value = SSAValue(len(self.values), sys.intern(base), version)
+        self.values.append(value)
+        return value
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, value_id):
+        return self.values[value_id]
+
+
+class OperandPool:
+    # Interns literal operands (numbers, quoted strings, list literals) so that
+    # repeated constants share a single object across the whole IR.
+    def __init__(self):
+        self.literals = {}
+
+    def intern(self, operand):
+        if isinstance(operand, SSAValue) or operand is None:
+            return operand
+        try:
+            return self.literals.setdefault((type(operand), operand), operand)
+        except TypeError:
+            return operand
+
 
 class SSAInstruction:
+    __slots__ = ("opcode", "args", "result", "block")
+
     def __init__(self, op, args, result):
-        self.op = op  # "add", "phi"
+        self.opcode = op if isinstance(op, int) else intern_opcode(op)
         self.args = args
         self.result = result
+        self.block = None  # set while the instruction is in an indexed block
+
+    @property
+    def op(self):
+        return OPCODE_NAMES[self.opcode]  # "add", "phi"
+
+    @op.setter
+    def op(self, name):
+        self.opcode = intern_opcode(name)
 
     def __repr__(self):
         if self.result:
@@ -16,10 +139,12 @@ class SSAInstruction:
     def __eq__(self, other):
         if not isinstance(other, SSAInstruction):
             return False
-        return self.op == other.op and self.args == other.args and self.result == other.result
+        return self.opcode == other.opcode and self.args == other.args and self.result == other.result
 
 
 class SSABlock:
+    __slots__ = ("name", "instructions", "successors", "preds")
+
     def __init__(self, name):
         self.name = name
         self.instructions = []
@@ -34,101 +159,500 @@ class SSABlock:
         instructions = "\n".join(map(str, self.instructions))
         return block_info + instructions
 
+
+class ControlFlowGraph:
+    # Owns the ordered block list plus a name index and the edges stored on
+    # SSABlock.successors/preds. Dominator information is computed on demand
+    # and cached until the graph changes.
+    def __init__(self, blocks=()):
+        self.blocks = []
+        self.block_map = {}
+        self._analysis = None
+        for block in blocks:
+            self.add_block(block)
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        # Rebuild edges from the branch/jump instructions of existing blocks.
+        # Phi operands follow the order of block.preds, so a block whose
+        # predecessors did not change keeps its old order.
+        cfg = cls(blocks)
+        old_preds = {}
+        for block in cfg.blocks:
+            old_preds[block.name] = [pred.name for pred in block.preds]
+            block.successors = []
+            block.preds = []
+        for block in cfg.blocks:
+            for instr in block.instructions:
+                for target in branch_targets(instr):
+                    cfg.add_edge(block, cfg.block_map[target])
+        for block in cfg.blocks:
+            names = old_preds[block.name]
+            if names != [pred.name for pred in block.preds] and sorted(names) == sorted(pred.name for pred in block.preds):
+                block.preds = [cfg.block_map[name] for name in names]
+        return cfg
+
+    @property
+    def entry(self):
+        return self.blocks[0] if self.blocks else None
+
+    def get_block(self, name):
+        return self.block_map[name]
+
+    def add_block(self, block):
+        self.blocks.append(block)
+        self.block_map[block.name] = block
+        self.invalidate()
+        return block
+
+    def remove_block(self, block):
+        for succ in list(block.successors):
+            self.remove_edge(block, succ)
+        for pred in list(block.preds):
+            self.remove_edge(pred, block)
+        self.blocks.remove(block)
+        del self.block_map[block.name]
+        self.invalidate()
+
+    def add_edge(self, src, dst):
+        src.successors.append(dst)
+        dst.preds.append(src)
+        self.invalidate()
+
+    def remove_edge(self, src, dst):
+        src.successors.remove(dst)
+        dst.preds.remove(src)
+        self.invalidate()
+
+    def invalidate(self):
+        self._analysis = None
+
+    def reverse_postorder(self):
+        return self._get_analysis()["rpo"]
+
+    def reachable(self, block):
+        return block in self._get_analysis()["order"]
+
+    def idom(self, block):
+        return self._get_analysis()["idom"].get(block)
+
+    def dom_children(self, block):
+        return self._get_analysis()["children"].get(block, [])
+
+    def dominates(self, a, b):
+        # a dominates b iff b's dominator tree interval lies inside a's
+        analysis = self._get_analysis()
+        interval = analysis["interval"]
+        if a not in interval or b not in interval:
+            return False
+        return interval[a][0] <= interval[b][0] and interval[b][1] <= interval[a][1]
+
+    def dominance_frontier(self, block):
+        return self._get_analysis()["frontier"].get(block, [])
+
+    def iterated_dominance_frontier(self, blocks):
+        frontier = self._get_analysis()["frontier"]
+        result = {}
+        worklist = list(blocks)
+        while worklist:
+            block = worklist.pop()
+            for df_block in frontier.get(block, ()):
+                if df_block not in result:
+                    result[df_block] = None
+                    worklist.append(df_block)
+        return list(result)
+
+    def dominator_tree_preorder(self):
+        analysis = self._get_analysis()
+        return sorted(analysis["interval"], key=lambda block: analysis["interval"][block][0])
+
+    def _get_analysis(self):
+        if self._analysis is None:
+            self._analysis = self._compute_analysis()
+        return self._analysis
+
+    def _compute_analysis(self):
+        entry = self.entry
+        postorder = []
+        if entry is not None:
+            # iterative DFS so deep graphs do not hit the recursion limit
+            visited = {entry}
+            stack = [(entry, iter(entry.successors))]
+            while stack:
+                block, succs = stack[-1]
+                for succ in succs:
+                    if succ not in visited:
+                        visited.add(succ)
+                        stack.append((succ, iter(succ.successors)))
+                        break
+                else:
+                    stack.pop()
+                    postorder.append(block)
+        rpo = postorder[::-1]
+        order = {block: i for i, block in enumerate(rpo)}
+
+        # Cooper, Harvey & Kennedy, "A Simple, Fast Dominance Algorithm"
+        idom = {}
+        if entry is not None:
+            idom[entry] = entry
+        changed = True
+        while changed:
+            changed = False
+            for block in rpo[1:]:
+                new_idom = None
+                for pred in block.preds:
+                    if pred not in idom:
+                        continue
+                    if new_idom is None:
+                        new_idom = pred
+                        continue
+                    finger1, finger2 = pred, new_idom
+                    while finger1 is not finger2:
+                        while order[finger1] > order[finger2]:
+                            finger1 = idom[finger1]
+                        while order[finger2] > order[finger1]:
+                            finger2 = idom[finger2]
+                    new_idom = finger1
+                if idom.get(block) is not new_idom:
+                    idom[block] = new_idom
+                    changed = True
+        if entry is not None:
+            idom[entry] = None
+
+        children = {}
+        for block in self.blocks:
+            if idom.get(block) is not None:
+                children.setdefault(idom[block], []).append(block)
+
+        interval = {}
+        if entry is not None:
+            counter = 0
+            stack = [(entry, False)]
+            while stack:
+                block, done = stack.pop()
+                if done:
+                    interval[block] = (interval[block], counter)
+                    continue
+                interval[block] = counter
+                counter += 1
+                stack.append((block, True))
+                for child in reversed(children.get(block, [])):
+                    stack.append((child, False))
+
+        frontier = {}
+        for block in rpo:
+            for pred in block.preds:
+                if pred not in order:
+                    continue
+                runner = pred
+                while runner is not idom[block]:
+                    runner_frontier = frontier.setdefault(runner, [])
+                    if block not in runner_frontier:
+                        runner_frontier.append(block)
+                    runner = idom[runner]
+
+        return {
+            "rpo": rpo,
+            "order": order,
+            "idom": idom,
+            "children": children,
+            "interval": interval,
+            "frontier": frontier,
+        }
+
+
+def branch_targets(instr):
+    if instr.op == "branch":
+        return instr.args[1:]
+    if instr.op == "jump":
+        return instr.args[:1]
+    return []
+
+
+class DefUseIndex:
+    # result -> defining instruction and value -> instructions that use it.
+    # The containing block is recorded on the instruction itself, and user
+    # lists are plain lists (an instruction appears once per value) to keep
+    # the per-value overhead small.
+    def __init__(self):
+        self.defs = {}
+        self.users = {}
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        index = cls()
+        for block in blocks:
+            for instr in block.instructions:
+                index.add(instr, block)
+        return index
+
+    def add(self, instr, block):
+        instr.block = block
+        if instr.result is not None:
+            self.defs.setdefault(instr.result, instr)
+        self._add_uses(instr)
+
+    def remove(self, instr):
+        if instr.block is None:
+            return
+        instr.block = None
+        self._remove_uses(instr)
+        if self.defs.get(instr.result) is instr:
+            del self.defs[instr.result]
+
+    def replace(self, old, new):
+        block = old.block
+        if block is None:
+            return None
+        instructions = block.instructions
+        # Replacements are almost always of recently appended phis, so search
+        # from the end of the block.
+        for i in range(len(instructions) - 1, -1, -1):
+            if instructions[i] is old:
+                instructions[i] = new
+                break
+        self.remove(old)
+        self.add(new, block)
+        return block
+
+    def set_args(self, instr, args):
+        tracked = instr.block is not None
+        if tracked:
+            self._remove_uses(instr)
+        instr.args = args
+        if tracked:
+            self._add_uses(instr)
+
+    def get_definition(self, value):
+        return self.defs.get(value)
+
+    def get_block(self, value):
+        definition = self.defs.get(value)
+        return definition.block if definition is not None else None
+
+    def get_users(self, value):
+        return list(self.users.get(value, ()))
+
+    def _add_uses(self, instr):
+        users_map = self.users
+        for arg in instr.args:
+            if isinstance(arg, SSAValue):
+                users = users_map.get(arg)
+                if users is None:
+                    users_map[arg] = [instr]
+                elif users[-1] is not instr:
+                    users.append(instr)
+
+    def _remove_uses(self, instr):
+        for arg in instr.args:
+            if isinstance(arg, SSAValue):
+                users = self.users.get(arg)
+                if users is not None:
+                    users[:] = [user for user in users if user is not instr]
+                    if not users:
+                        del self.users[arg]
+
+
+def is_literal(node):
+    try:
+        ast.literal_eval(node)
+    except ValueError:
+        return False
+    return True
+
+
+def copy_as_load(node):
+    # the target of an augmented assignment, re-read as an expression
+    if isinstance(node, ast.Name):
+        load = ast.Name(id=node.id, ctx=ast.Load())
+    elif isinstance(node, ast.Subscript):
+        load = ast.Subscript(value=node.value, slice=node.slice, ctx=ast.Load())
+    elif isinstance(node, ast.Attribute):
+        load = ast.Attribute(value=node.value, attr=node.attr, ctx=ast.Load())
+    else:
+        raise NotImplementedError(f"Unsupported target type: {type(node).__name__}")
+    return ast.copy_location(load, node)
+
+
+def check_signature(node):
+    args = node.args
+    unsupported = (
+        args.vararg or args.kwarg or args.kwonlyargs
+        or getattr(args, "posonlyargs", None) or node.decorator_list
+    )
+    if unsupported:
+        raise NotImplementedError(f"Unsupported signature: {node.name} (only positional parameters)")
+
+
+def parameter_names(node):
+    return [arg.arg for arg in node.args.args]
+
+
+def local_names(node):
+    # parameters plus every name the function body assigns; global and
+    # nonlocal declarations are not supported
+    names = set(parameter_names(node))
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Global, ast.Nonlocal)):
+            raise NotImplementedError(f"Unsupported declaration in {node.name}")
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+            names.add(child.id)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            names.update(name for name, _, _ in import_bindings(child))
+    return names
+
+
+def module_names(tree):
+    # every name the module's top-level code binds; a def binds its name,
+    # its body belongs to the function's own unit
+    names = set()
+    work = list(tree.body)
+    while work:
+        node = work.pop()
+        if isinstance(node, ast.FunctionDef):
+            names.add(node.name)
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update(name for name, _, _ in import_bindings(node))
+        work.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def check_unpack(target):
+    if any(isinstance(elt, ast.Starred) for elt in target.elts):
+        raise NotImplementedError("Unsupported target type: Starred")
+    return target.elts
+
+
+def check_call(node):
+    if any(isinstance(arg, ast.Starred) for arg in node.args) or any(k.arg is None for k in node.keywords):
+        raise NotImplementedError("Unsupported call arguments: * or ** unpacking")
+
+
+def import_bindings(node):
+    # (bound name, op, args) for every alias of an import statement
+    bindings = []
+    for alias in node.names:
+        if alias.name == "*":
+            raise NotImplementedError("Unsupported import: *")
+        if isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            bindings.append((alias.asname or alias.name, "import_from", [module, alias.name]))
+        elif alias.asname:
+            bindings.append((alias.asname, "import", [alias.name]))
+        else:
+            # import a.b binds a
+            top = alias.name.split(".")[0]
+            bindings.append((top, "import", [top]))
+    return bindings
+
+
+def function_unit_names(stmts):
+    # unit name of every top-level def, keyed by node identity; a name that
+    # is defined again gets a #k suffix so every def has its own unit
+    names = {}
+    seen = {}
+    for stmt in stmts:
+        if isinstance(stmt, ast.FunctionDef):
+            count = seen.get(stmt.name, 0)
+            seen[stmt.name] = count + 1
+            names[id(stmt)] = stmt.name if not count else f"{stmt.name}#{count}"
+    return names
+
+
 class SSAConverter(ast.NodeVisitor):
     def __init__(self):
-        self.blocks = []
+        self.cfg = ControlFlowGraph()
+        self.blocks = self.cfg.blocks
         self.current_block = None 
-        self.var_map = {}  
-        self.var_counters = {}  
+        self.values = ValueTable()
+        self.operands = OperandPool()
         self.block_counter = 0 
+        # block name -> {variable: value}, for the block's own writes and
+        # for every value found by reading through it
         self.current_def = {} 
         self.incomplete_phis = {}
-        self.memoized_expressions = OrderedDict()
-        self.cache_size = 100
-        self.phi_witnesses = {}
+        self.def_use = DefUseIndex()
+        # trivial phi result -> the value that replaced it. The phi itself
+        # stays in its block until remove_replaced_phis, so that removing
+        # many phis from a loop header does not shift its list each time.
+        self.replaced = {}
+        self.phi_counts = {}
+        self.stale_blocks = set()
+        # loop headers whose back edge has not been added yet (unsealed)
+        self.open_loop_headers = set()
+        # hidden variables for the counters of for loops
+        self.loop_counters = 0
+        # set while converting a function: the names it binds (everything
+        # else is a global) and whether the current path has returned
+        self.local_names = None
+        self.returned = False
+        # set while converting a module: the names its top-level code binds
+        self.module_names = None
+        self.unit_names = {}
 
     def new_block(self):
         block = SSABlock(f"block_{self.block_counter}")
         self.block_counter += 1
-        self.blocks.append(block)
+        self.cfg.add_block(block)
         return block
 
     def set_current_block(self, block):
         self.current_block = block
 
     def add_instruction(self, op, args, result=None):
-        instruction = SSAInstruction(op, args, result)
-        self.current_block.add_instruction(instruction)
-        if op == 'branch':
-            # args = [cond, then_name, else_name]
-            _, then_name, else_name = args
-
-            then_block = None
-            else_block = None
-            for block in self.blocks:
-                if block.name == then_name:
-                    then_block = block
-                    break
-
-            for block in self.blocks:
-                if block.name == else_name:
-                    else_block = block
-                    break
-            then_block.preds.append(self.current_block)
-            else_block.preds.append(self.current_block)
-        
-        elif op == 'jump':
-            # args = [target_name]
-            target_name = args[0]
-
-            target_block = None
-            for block in self.blocks:
-                if block.name == target_name:
-                    target_block = block
-                    break
-            target_block.preds.append(self.current_block)
-
-    def write_variable(self, variable, value):
-        if self.current_block.name not in self.current_def:
-            self.current_def[self.current_block.name] = {}
-        
-        self.current_def[self.current_block.name][variable] = value
-
-        self.var_map[variable] = value
+        instruction = SSAInstruction(op, [self.operands.intern(arg) for arg in args], result)
+        self.append_instruction(instruction)
+        # branch args = [cond, then_name, else_name], jump args = [target_name]
+        for target_name in branch_targets(instruction):
+            self.cfg.add_edge(self.current_block, self.cfg.get_block(target_name))
 
-        for block in self.blocks:
-            for instr in block.instructions:
-                if instr.op == "phi" and instr.result == value:
-                    definitions = self.current_def[self.current_block.name].values()
-                    self.phi_witnesses[value] = tuple(definitions)[:2]
-                    break 
+    def append_instruction(self, instruction, block=None):
+        block = block or self.current_block
+        block.add_instruction(instruction)
+        self.def_use.add(instruction, block)
 
+    def write_variable(self, variable, value, block=None):
+        block = block or self.current_block
+        self.current_def.setdefault(block.name, {})[variable] = value
 
     def readVariable(self, var_name, block=None):
-        if block:
-            block_defs = self.current_def.get(block.name, {})
-            if var_name in block_defs:
-                return block_defs[var_name]
-        
-        if block:
-            return self.readVariableRecursive(var_name, block)
-        
-        return None
+        if block is None:
+            return None
+        block_defs = self.current_def.get(block.name, {})
+        if var_name in block_defs:
+            return self.resolve(block_defs[var_name])
+        return self.readVariableRecursive(var_name, block)
+
+    def resolve(self, value):
+        # the value a removed trivial phi stands for
+        while isinstance(value, SSAValue) and value in self.replaced:
+            value = self.replaced[value]
+        return value
 
     def get_new_var(self, var_name):
-        if var_name not in self.var_counters:
-            self.var_counters[var_name] = 0
-        self.var_counters[var_name] += 1
-        return f"{var_name}_{self.var_counters[var_name]}"
+        return self.values.new_value(var_name)
 
     def visit_List(self, node):
+        if not is_literal(node):
+            return self.build_sequence("build_list", node)
         elements = [str(self.visit(element)) for element in node.elts]
         return f"[{', '.join(elements)}]"
 
     def visit_Tuple(self, node):
+        if not is_literal(node):
+            return self.build_sequence("build_tuple", node)
         elements = [str(self.visit(element)) for element in node.elts]
         return f"({', '.join(elements)})"
 
+    def build_sequence(self, op, node):
+        elements = [self.visit(element) for element in node.elts]
+        result = self.get_new_var("tmp")
+        self.add_instruction(op, elements, result)
+        return result
+
     def visit_Set(self, node):
         elements = [str(self.visit(element)) for element in node.elts]
         return f"{{{', '.join(elements)}}}"
@@ -141,7 +665,9 @@ class SSAConverter(ast.NodeVisitor):
 
     def visit_Constant(self, node):
         if isinstance(node.value, str):
-            return f'"{node.value}"'
+            # a double-quoted literal with quotes, backslashes and control
+            # characters escaped, which ast.literal_eval reads back
+            return json.dumps(node.value, ensure_ascii=False)
         elif isinstance(node.value, bool):
             return 'True' if node.value else 'False'
         elif node.value is None:
@@ -163,8 +689,52 @@ class SSAConverter(ast.NodeVisitor):
 
 
     def visit_Name(self, node):
+        if self.is_global(node.id):
+            return self.load_global(node.id)
         return self.readVariable(node.id, self.current_block)
 
+    def is_global(self, name):
+        # a name the function (or the module's top-level code) never binds,
+        # such as a builtin
+        names = self.local_names if self.local_names is not None else self.module_names
+        return names is not None and name not in names
+
+    def load_global(self, name):
+        result = self.get_new_var(name)
+        self.add_instruction("global", [name], result)
+        return result
+
+    def visit_Attribute(self, node):
+        obj = self.visit(node.value)
+        result = self.get_new_var("tmp")
+        self.add_instruction("getattr", [obj, node.attr], result)
+        return result
+
+    def visit_Subscript(self, node):
+        obj = self.visit(node.value)
+        index = self.visit(node.slice)
+        result = self.get_new_var("tmp")
+        self.add_instruction("get_element", [obj, index], result)
+        return result
+
+    def visit_Slice(self, node):
+        return self.emit_slice(node, self.visit)
+
+    def emit_slice(self, node, lower):
+        bounds = [None if bound is None else lower(bound) for bound in (node.lower, node.upper, node.step)]
+        result = self.get_new_var("tmp")
+        self.add_instruction("build_slice", bounds, result)
+        return result
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        op = type(node.op).__name__.lower()
+        if is_number(operand) and op in UNARY_OPERATORS:
+            return UNARY_OPERATORS[op](operand)
+        result = self.get_new_var("tmp")
+        self.add_instruction(op, [operand], result)
+        return result
+
     def visit_Compare(self, node):
         left = self.visit(node.left)
         result = None
@@ -189,8 +759,10 @@ class SSAConverter(ast.NodeVisitor):
 
     def visit_Assign(self, node):
         value = self.visit(node.value) 
-        target = node.targets[0]
+        for target in node.targets:
+            self.store_target(target, value)
 
+    def store_target(self, target, value):
         if isinstance(target, ast.Name):
             target_name = target.id
             ssa_var = self.get_new_var(target_name)
@@ -202,79 +774,79 @@ class SSAConverter(ast.NodeVisitor):
             target_index = self.visit(target.slice) 
             self.add_instruction("store_element", [target_obj, target_index, value])
 
-        elif isinstance(target, ast.Tuple) or isinstance(target, ast.List):
-            elements = target.elts
-            if isinstance(value, list):
-                if len(elements) != len(value):
-                    raise ValueError("Unpacking length mismatch")
+        elif isinstance(target, ast.Attribute):
+            target_obj = self.visit(target.value)
+            self.add_instruction("setattr", [target_obj, target.attr, value])
 
-                for i, elt in enumerate(elements):
-                    if isinstance(elt, ast.Name):
-                        ssa_var = self.get_new_var(elt.id)
-                        self.add_instruction("assign", [value[i]], ssa_var)
-                        self.write_variable(elt.id, ssa_var)
+        elif isinstance(target, ast.Tuple) or isinstance(target, ast.List):
+            # a, b = value reads value[0] and value[1]
+            for i, elt in enumerate(check_unpack(target)):
+                element = self.get_new_var("tmp")
+                self.add_instruction("get_element", [value, i], element)
+                self.store_target(elt, element)
 
         else:
             raise NotImplementedError(f"Unsupported target type: {type(target).__name__}")
 
+    def visit_AugAssign(self, node):
+        # x op= y is converted as x = x op y
+        load = copy_as_load(node.target)
+        value = ast.BinOp(left=load, op=node.op, right=node.value)
+        self.visit_Assign(ast.Assign(targets=[node.target], value=value))
+
+    def visit_Return(self, node):
+        value = self.visit(node.value) if node.value is not None else None
+        self.add_instruction("return", [value])
+        self.returned = True
+
+    def visit_FunctionDef(self, node):
+        # a def binds the name to the function's own compilation unit, whose
+        # body is converted separately (see convert_unit)
+        if id(node) not in self.unit_names:
+            raise NotImplementedError(f"Unsupported nested function: {node.name}")
+        # default values are evaluated here, when the def runs
+        defaults = [self.visit(default) for default in node.args.defaults]
+        result = self.get_new_var(node.name)
+        self.add_instruction("function", [self.unit_names[id(node)], *defaults], result)
+        self.write_variable(node.name, result)
+
+    def visit_Import(self, node):
+        for name, op, args in import_bindings(node):
+            result = self.get_new_var(name)
+            self.add_instruction(op, args, result)
+            self.write_variable(name, result)
+
+    def visit_function(self, node):
+        check_signature(node)
+        self.local_names = local_names(node)
+        self.set_current_block(self.new_block())
+        for index, name in enumerate(parameter_names(node)):
+            value = self.get_new_var(name)
+            self.add_instruction("param", [index], value)
+            self.write_variable(name, value)
+        self.visit_compound_statement(node.body)
+        if not self.returned:
+            self.add_instruction("return", [None])
+        self.remove_replaced_phis()
+
 
     def visit_BinOp(self, node):
+        # Identities such as x - x == 0 depend on the operand types; they
+        # are applied by ssa_types.simplify_arithmetic once those are known.
         left = self.visit(node.left)
         right = self.visit(node.right)
-
-        if isinstance(node.op, ast.Add):
-            if left == 0:
-                return right
-            if right == 0:
-                return left
-
-        if isinstance(node.op, ast.Mult):
-            if left == 0 or right == 0:
-                return 0
-            if left == 1:
-                return right
-            if right == 1:
-                return left
-
-        if isinstance(node.op, ast.Sub):
-            if left == right:
-                return 0
-
-        if isinstance(node.op, ast.Div):
-            if right == 1:
-                return left
-            if left == right:
-                return 1
-
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            if isinstance(node.op, ast.Add):
-                result_value = left + right
-            elif isinstance(node.op, ast.Sub):
-                result_value = left - right
-            elif isinstance(node.op, ast.Mult):
-                result_value = left * right
-            elif isinstance(node.op, ast.Div):
-                result_value = left / right
-            elif isinstance(node.op, ast.Mod):
-                result_value = left % right
-            else:
-                raise NotImplementedError(f"Unsupported binary operator: {type(node.op).__name__}")
-
-            return result_value
-
-        expr = (left, type(node.op).__name__.lower(), right)
-
-        if expr in self.memoized_expressions:
-            self.memoized_expressions.move_to_end(expr)
-            return self.memoized_expressions[expr]
-
-        op = type(node.op).__name__.lower()
+        return self.lower_binary(type(node.op).__name__.lower(), left, right)
+
+    def lower_binary(self, op, left, right):
+        # huge powers and shifts are not built at compile time
+        foldable = not (op in ("pow", "lshift") and is_number(right) and abs(right) > 64)
+        if is_number(left) and is_number(right) and op in BINARY_OPERATORS and foldable:
+            try:
+                return BINARY_OPERATORS[op](left, right)
+            except (ArithmeticError, ValueError):
+                pass  # keep the instruction so the error happens at run time
         result = self.get_new_var("tmp")
         self.add_instruction(op, [left, right], result)
-        self.memoized_expressions[expr] = result
-        if len(self.memoized_expressions) > self.cache_size:
-            self.memoized_expressions.popitem(last=False)
-
         return result
 
 
@@ -288,39 +860,32 @@ class SSAConverter(ast.NodeVisitor):
 
         self.set_current_block(then_block)
         self.visit_compound_statement(node.body)
-        self.add_instruction("jump", [after_block.name])
+        then_returned = self.returned
+        if not then_returned:
+            self.add_instruction("jump", [after_block.name])
 
+        self.returned = False
         self.set_current_block(else_block)
         self.visit_compound_statement(node.orelse)
-        self.add_instruction("jump", [after_block.name])
-
-        self.set_current_block(after_block)
+        else_returned = self.returned
+        if not else_returned:
+            self.add_instruction("jump", [after_block.name])
 
-        then_defs = self.current_def.get(then_block.name, {})
-        else_defs = self.current_def.get(else_block.name, {})
-        all_vars = set(then_defs.keys()).union(else_defs.keys())
-
-        for var in all_vars:
-            then_var = then_defs.get(var, None)
-            else_var = else_defs.get(var, None)
-            
-            if then_var is not None and else_var is not None and then_var != else_var:
-                phi_var = self.get_new_var(var)
-                phi_instr = SSAInstruction("phi", [then_var, else_var], phi_var)
-                self.add_instruction(phi_instr.op, phi_instr.args, phi_instr.result)
-                self.write_variable(var, phi_var)
-                self.removeTrivialPhiRecursively(phi_instr)
         self.set_current_block(after_block)
-
-        self.sealBlock(then_block)
-        self.sealBlock(else_block)
+        if then_returned and else_returned:
+            # nothing reaches the code after the if
+            self.cfg.remove_block(after_block)
+            return
+        # the join's predecessors are all known here, so reads from it
+        # place their phis right away
+        self.returned = False
 
     def sealBlock(self, block):
-        if block.name in self.incomplete_phis:
-            for variable, phi_instr in self.incomplete_phis[block.name].items():
-                self.addPhiOperands(variable, phi_instr)
-            self.incomplete_phis.pop(block.name, None)
-
+        # block has all its predecessors: complete the phis placed while it
+        # had not
+        self.open_loop_headers.discard(block.name)
+        for variable, phi_instr in self.incomplete_phis.pop(block.name, {}).items():
+            self.addPhiOperands(variable, phi_instr)
 
     def visit_While(self, node):
         cond_block = self.new_block()
@@ -329,246 +894,222 @@ class SSAConverter(ast.NodeVisitor):
 
         self.add_instruction("jump", [cond_block.name])
 
+        # reads in the header get phis whose back edge operands are added
+        # when the loop is closed
+        self.open_loop_headers.add(cond_block.name)
         self.set_current_block(cond_block)
         cond = self.visit(node.test)
         self.add_instruction("branch", [cond, body_block.name, after_block.name])
 
         self.set_current_block(body_block)
-        initial_var_map = self.var_map.copy()
         self.visit_compound_statement(node.body)
-        self.add_instruction("jump", [cond_block.name])
-
-        self.set_current_block(after_block)
-
-        for var in initial_var_map:
-            if var in self.var_map and self.var_map[var] != initial_var_map[var]:
-                incoming_var = initial_var_map[var]
-                body_var = self.var_map[var]
-                if incoming_var != body_var:
-                    phi_var = self.get_new_var(var)
-                    phi_instr = SSAInstruction("phi", [incoming_var, body_var], phi_var)
-                    self.add_instruction(phi_instr.op, phi_instr.args, phi_instr.result)
-                    self.write_variable(var, phi_var)
-                    self.removeTrivialPhiRecursively(phi_instr)
-        self.sealBlock(body_block)
+        if not self.returned:
+            self.add_instruction("jump", [cond_block.name])
+        self.returned = False
         self.sealBlock(cond_block)
-        self.sealBlock(after_block)
-        
+        self.set_current_block(after_block)
+        # there is no break, so a loop's else clause runs whenever it ends
+        self.visit_compound_statement(node.orelse)
 
     def visit_For(self, node):
         loop_cond_block = self.new_block()
         loop_body_block = self.new_block()
         after_block = self.new_block()
 
-        iter_obj = self.visit(node.iter)
-        
-        if isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name) and node.iter.func.id == "range":
+        is_range = (
+            isinstance(node.iter, ast.Call)
+            and isinstance(node.iter.func, ast.Name)
+            and node.iter.func.id == "range"
+        )
+        # the counter is a variable of its own, so the body can assign the
+        # target without changing the iteration
+        self.loop_counters += 1
+        if is_range:
             # 处理 range(start, stop, step)
             args = [self.visit(arg) for arg in node.iter.args]
-            start = args[0] if len(args) > 0 else 0
-            stop = args[1] if len(args) > 1 else start
+            if len(args) == 1:
+                start, stop = 0, args[0]
+            else:
+                start, stop = args[0], args[1]
             step = args[2] if len(args) > 2 else 1
-
-            current_var = self.get_new_var("range_index")
-            self.add_instruction("assign", [start], current_var)
-
-            iter_var = current_var
-            stop_var = stop
-            step_var = step
+            counter = ("range_index", self.loop_counters)
         else:
-            iter_var = iter_obj
-            index_var = self.get_new_var("index")
+            iter_var = self.visit(node.iter)
             length_var = self.get_new_var("length")
-            self.add_instruction("assign", [0], index_var)
             self.add_instruction("length", [iter_var], length_var)
+            start, stop, step = 0, length_var, 1
+            counter = ("index", self.loop_counters)
+        start_var = self.get_new_var(counter[0])
+        self.add_instruction("assign", [start], start_var)
+        self.write_variable(counter, start_var)
         self.add_instruction("jump", [loop_cond_block.name])
-        self.set_current_block(loop_cond_block)
-        cond_var = self.get_new_var("loop_cond")
-
-
-        if isinstance(node.iter, ast.Call) and node.iter.func.id == "range":
-            self.add_instruction("lt", [iter_var, stop_var], cond_var)
-        else:
-            self.add_instruction("lt", [index_var, length_var], cond_var)
 
+        self.open_loop_headers.add(loop_cond_block.name)
+        self.set_current_block(loop_cond_block)
+        index_var = self.readVariable(counter, loop_cond_block)
+        cond_var = self.add_range_test(index_var, stop, step)
         self.add_instruction("branch", [cond_var, loop_body_block.name, after_block.name])
 
         self.set_current_block(loop_body_block)
-        
-        if isinstance(node.iter, ast.Call) and node.iter.func.id == "range":
-            loop_value = iter_var
+        if is_range:
+            loop_value = index_var
         else:
             loop_value = self.get_new_var("loop_value")
             self.add_instruction("get_element", [iter_var, index_var], loop_value)
+        self.store_target(node.target, loop_value)
 
-        self.write_variable(node.target.id, loop_value)
-        
         self.visit_compound_statement(node.body)
 
-        if isinstance(node.iter, ast.Call) and node.iter.func.id == "range":
-            self.add_instruction("add", [iter_var, step_var], iter_var)
+        if self.returned:
+            self.returned = False
         else:
-            self.add_instruction("add", [index_var, 1], index_var)
-
-        self.add_instruction("jump", [loop_cond_block.name])
-
+            next_var = self.get_new_var(counter[0])
+            self.add_instruction("add", [self.readVariable(counter, self.current_block), step], next_var)
+            self.write_variable(counter, next_var)
+            self.add_instruction("jump", [loop_cond_block.name])
+        self.sealBlock(loop_cond_block)
         self.set_current_block(after_block)
+        self.visit_compound_statement(node.orelse)
 
-
-    def readVariableRecursive(self, variable, block, visited=None):
-        if visited is None:
-            visited = set()
-        if block.name in visited:
-            return None  
-        visited.add(block.name)
-
-        if variable in self.current_def.get(block.name, {}):
-            return self.current_def[block.name][variable]
-
-        preds = block.preds
-        if not preds:
-            return None
-        elif len(preds) == 1:
-            val = self.readVariableRecursive(variable, preds[0], visited)
-            self.write_variable(variable, val)
-            return val
+    def add_range_test(self, index, stop, step):
+        # index < stop for a positive step and index > stop for a negative
+        # one. A step only known at run time is tested through the sign of
+        # (stop - index) * step, which range steps (ints) make exact.
+        cond_var = self.get_new_var("loop_cond")
+        if is_number(step):
+            self.add_instruction("gt" if step < 0 else "lt", [index, stop], cond_var)
+            return cond_var
+        remaining = self.get_new_var("tmp")
+        self.add_instruction("sub", [stop, index], remaining)
+        scaled = self.get_new_var("tmp")
+        self.add_instruction("mult", [remaining, step], scaled)
+        self.add_instruction("gt", [scaled, 0], cond_var)
+        return cond_var
+
+    def readVariableRecursive(self, variable, block):
+        # Braun et al.: a block that may still get predecessors (an open
+        # loop header) gets an operandless phi, completed by sealBlock; a
+        # block with one predecessor reads from it; a join gets a phi over
+        # its predecessors. The result is remembered in every block walked
+        # through.
+        if block.name in self.open_loop_headers:
+            phi_instr = self.new_phi(variable, block)
+            self.incomplete_phis.setdefault(block.name, {})[variable] = phi_instr
+            value = phi_instr.result
+        elif not block.preds:
+            return None  # not defined on this path
+        elif len(block.preds) == 1:
+            value = self.readVariable(variable, block.preds[0])
         else:
-            phi_var = self.get_new_var(variable)
-            phi_instr = SSAInstruction("phi", [], phi_var)
-            self.current_block.add_instruction(phi_instr)
-            self.write_variable(variable, phi_var)
-
-            if self.current_block.name not in self.incomplete_phis:
-                self.incomplete_phis[self.current_block.name] = {}
-            self.incomplete_phis[self.current_block.name][variable] = phi_instr
-
-            operands = []
-            for pred in preds:
-                operand = self.readVariable(variable, pred)
-                operands.append(operand)
-            phi_instr.args = operands
-        
-            if len(operands) >= 2:
-                witness = (operands[0], operands[1])
-                self.phi_witnesses[phi_var] = witness
-            else:
-                self.phi_witnesses[phi_var] = tuple(operands)
-            
-            self.removeTrivialPhiRecursively(phi_instr)
-            return phi_var
-
-
+            phi_instr = self.new_phi(variable, block)
+            # recorded first, so a read that walks back around a loop into
+            # this block stops here
+            self.write_variable(variable, phi_instr.result, block)
+            value = self.addPhiOperands(variable, phi_instr)
+        self.write_variable(variable, value, block)
+        return value
+
+    def new_phi(self, variable, block):
+        # an empty phi after the phis already at the top of block
+        base = variable if isinstance(variable, str) else variable[0]
+        phi_instr = SSAInstruction("phi", [], self.get_new_var(base))
+        position = self.phi_counts.get(block.name, 0)
+        self.phi_counts[block.name] = position + 1
+        block.instructions.insert(position, phi_instr)
+        self.def_use.add(phi_instr, block)
+        return phi_instr
 
     def addPhiOperands(self, variable, phi_instr):
-        phi_block = self.current_block
-        preds = phi_block.preds
-        operands = []
-        for pred in preds:
-            operand = self.readVariable(variable, pred)
-            operands.append(operand)
-        phi_var = phi_instr.result
-        if phi_var in self.phi_witnesses:
-            witness = self.phi_witnesses[phi_var]
-            if witness[0] != witness[1]:
-                phi_instr.args = operands
-                return
-        else:
-            if len(operands) >= 2:
-                self.phi_witnesses[phi_var] = (operands[0], operands[1])
-        phi_instr.args = operands
-        self.removeTrivialPhiRecursively(phi_instr)
-
-    def get_phi_users(self, phi_var):
-        users = []
-        for block in self.blocks:
-            for instr in block.instructions:
-                if phi_var in instr.args and instr.op == "phi":
-                    users.append(instr)
-        return users
+        # operands follow the order of block.preds
+        operands = [self.readVariable(variable, pred) for pred in phi_instr.block.preds]
+        self.def_use.set_args(phi_instr, operands)
+        return self.removeTrivialPhiRecursively(phi_instr)
 
     def removeTrivialPhiRecursively(self, phi_instr):
+        # A phi whose operands are all one value (or the phi itself) is
+        # replaced by that value; phis using it may become trivial in turn.
+        # Returns the value that stands for the phi.
         phi_var = phi_instr.result
-
-        if phi_var in self.phi_witnesses:
-            witness = self.phi_witnesses[phi_var]
-            if len(witness) >= 2:
-                if witness[0] != witness[1]:
-                    return
-            else:
-                if len(set(witness)) == 1:
-                    pass
-                else:
-                    return
-        else:
-            return
-        
-        phi_operands = phi_instr.args
-
-        operand_definitions = []
-        for op in phi_operands:
-            if op != phi_instr.result:
-                definition = self.get_definition(op)
-                operand_definitions.append(definition)
-
-        if self.are_definitions_identical(operand_definitions):
-            same_definition = operand_definitions[0]
-
-            for block in self.blocks:
-                for i, instr in enumerate(block.instructions):
-                    if instr == phi_instr:
-                        new_instruction = SSAInstruction(
-                            op='assign',
-                            args=same_definition.args,
-                            result=phi_instr.result
-                        )
-                        block.instructions[i] = new_instruction
-                        break
-            self.var_map[phi_instr.result] = same_definition.result
-            #print(self.var_map[phi_instr.result],phi_instr.result)
-
-            users = self.get_phi_users(phi_instr.result)
-            for user_instr in users:
-                self.removeTrivialPhiRecursively(user_instr)
-
-    def are_definitions_identical(self, definitions):
-        if not definitions:
-            return False
-
-        reference_definition = definitions[0]
-
-        for definition in definitions[1:]:
-            if (reference_definition.op != definition.op or
-                reference_definition.args != definition.args):
-                return False
-
-        return True
-
-    def get_definition(self, var):
-        for block in self.blocks:
-            for instr in block.instructions:
-                if instr.result == var:
-                    return instr
-        return None
+        operands = {id(operand): operand for operand in map(self.resolve, phi_instr.args) if operand is not phi_var}
+        if len(operands) > 1:
+            return phi_var
+        # None: the variable is not defined on any path
+        same = next(iter(operands.values()), None)
+        block = phi_instr.block
+        if block is None:
+            return self.resolve(phi_var)  # removed while its operands were read
+        users = [user for user in self.def_use.get_users(phi_var) if user is not phi_instr]
+        self.def_use.remove(phi_instr)
+        self.stale_blocks.add(block)
+        self.replaced[phi_var] = same
+        for user in users:
+            self.def_use.set_args(user, [same if arg is phi_var else arg for arg in user.args])
+        for user in users:
+            if user.op == "phi" and user.block is not None:
+                self.removeTrivialPhiRecursively(user)
+        return same
+
+    def remove_replaced_phis(self):
+        # DefUseIndex.remove has detached the replaced phis
+        for block in self.stale_blocks:
+            block.instructions = [instr for instr in block.instructions if instr.block is not None]
+        self.stale_blocks.clear()
 
     def visit_compound_statement(self, stmts):
         for stmt in stmts:
+            if self.returned:
+                break  # the rest of the block is unreachable
             self.visit(stmt)
 
     def visit_Call(self, node):
         func_name = node.func.id if isinstance(node.func, ast.Name) else None
-        if func_name == "range":
+        if func_name == "range" and self.local_names is None:
             args = [self.visit(arg) for arg in node.args]
             return f"range({', '.join(map(str, args))})"
+        return self.emit_call(node, self.visit)
+
+    def emit_call(self, node, lower):
+        # call(func, *args), or with keywords
+        # call_kw(func, n_positional, *args, name_1, value_1, ...)
+        check_call(node)
+        func = lower(node.func)
+        args = [lower(arg) for arg in node.args]
+        result = self.get_new_var("tmp")
+        if node.keywords:
+            keywords = []
+            for keyword in node.keywords:
+                keywords += [keyword.arg, lower(keyword.value)]
+            self.add_instruction("call_kw", [func, len(args), *args, *keywords], result)
         else:
-            raise NotImplementedError(f"Unsupported function call: {func_name}")
+            self.add_instruction("call", [func, *args], result)
+        return result
 
     def visit(self, node):
         if isinstance(node, ast.Module):
+            self.unit_names = function_unit_names(node.body)
+            self.module_names = module_names(node)
             block = self.new_block()
             self.set_current_block(block)
             self.visit_compound_statement(node.body)
+            self.remove_replaced_phis()
         elif isinstance(node, ast.Assign):
             self.visit_Assign(node)
+        elif isinstance(node, ast.AugAssign):
+            self.visit_AugAssign(node)
+        elif isinstance(node, ast.Return) and self.local_names is not None:
+            self.visit_Return(node)
+        elif isinstance(node, ast.FunctionDef):
+            self.visit_FunctionDef(node)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            self.visit_Import(node)
+        elif isinstance(node, ast.Attribute):
+            return self.visit_Attribute(node)
+        elif isinstance(node, ast.Subscript):
+            return self.visit_Subscript(node)
+        elif isinstance(node, ast.UnaryOp):
+            return self.visit_UnaryOp(node)
+        elif isinstance(node, ast.Slice):
+            return self.visit_Slice(node)
         elif isinstance(node, ast.BinOp):
             return self.visit_BinOp(node)
         elif isinstance(node, ast.If):
@@ -594,11 +1135,783 @@ class SSAConverter(ast.NodeVisitor):
         elif isinstance(node, ast.Dict):
             return self.visit_Dict(node) 
         elif isinstance(node, ast.Expr):
+            # module level expression statements are not converted; in a
+            # function they are evaluated for their effects (calls), except
+            # for docstrings and other bare constants
+            if self.local_names is not None and not isinstance(node.value, ast.Constant):
+                self.visit(node.value)
+        elif isinstance(node, ast.Pass):
+            pass
+        else:
+            raise NotImplementedError(f"Unsupported AST node type: {type(node).__name__}")
+
+
+class VarRef:
+    # Placeholder for a source variable in the pre-SSA IR built by
+    # CytronSSAConverter; replaced by SSA names during renaming.
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"${self.name}"
+
+
+class CytronSSAConverter(SSAConverter):
+    # Cytron et al. construction: lower the whole AST to a CFG over source
+    # variables first, place phis at iterated dominance frontiers of each
+    # variable's definitions (only where the variable is live-in when
+    # pruned=True) and rename everything in one walk of the dominator tree.
+    def __init__(self, pruned=True):
+        super().__init__()
+        self.pruned = pruned
+        self.hidden_counter = 0
+
+    def append_instruction(self, instruction, block=None):
+        # the def-use index is built once after renaming
+        (block or self.current_block).add_instruction(instruction)
+
+    def visit(self, node):
+        if not isinstance(node, ast.Module):
+            raise NotImplementedError(f"Unsupported AST node type: {type(node).__name__}")
+        self.unit_names = function_unit_names(node.body)
+        self.module_names = module_names(node)
+        self.set_current_block(self.new_block())
+        self.lower_statements(node.body)
+        self.finish()
+
+    def visit_function(self, node):
+        check_signature(node)
+        self.local_names = local_names(node)
+        self.set_current_block(self.new_block())
+        for index, name in enumerate(parameter_names(node)):
+            self.add_instruction("param", [index], VarRef(name))
+        self.lower_statements(node.body)
+        self.add_instruction("return", [None])
+        self.finish()
+
+    def finish(self):
+        self.remove_unreachable_blocks()
+        phis = self.place_phis()
+        self.rename(phis)
+        self.def_use = DefUseIndex.from_blocks(self.blocks)
+
+    # --- lowering -------------------------------------------------------
+
+    def hidden_var(self, name):
+        # '#' cannot occur in identifiers, so hidden loop variables never
+        # collide with source variables; the SSA name uses the prefix only
+        self.hidden_counter += 1
+        return VarRef(f"{name}#{self.hidden_counter}")
+
+    def lower_statements(self, stmts):
+        for stmt in stmts:
+            self.lower_statement(stmt)
+
+    def lower_statement(self, node):
+        if isinstance(node, ast.Assign):
+            value = self.lower_expr(node.value)
+            for target in node.targets:
+                self.lower_store(target, value)
+        elif isinstance(node, ast.AugAssign):
+            value = self.lower_binary(
+                type(node.op).__name__.lower(), self.lower_expr(node.target), self.lower_expr(node.value)
+            )
+            self.lower_store(node.target, value)
+        elif isinstance(node, ast.If):
+            self.lower_if(node)
+        elif isinstance(node, ast.While):
+            self.lower_while(node)
+        elif isinstance(node, ast.For):
+            self.lower_for(node)
+        elif isinstance(node, ast.Return) and self.local_names is not None:
+            value = self.lower_expr(node.value) if node.value is not None else None
+            self.add_instruction("return", [value])
+            # anything after the return lands in a block nothing jumps to,
+            # which remove_unreachable_blocks drops
+            self.set_current_block(self.new_block())
+        elif isinstance(node, ast.FunctionDef):
+            if id(node) not in self.unit_names:
+                raise NotImplementedError(f"Unsupported nested function: {node.name}")
+            defaults = [self.lower_expr(default) for default in node.args.defaults]
+            self.add_instruction("function", [self.unit_names[id(node)], *defaults], VarRef(node.name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for name, op, args in import_bindings(node):
+                self.add_instruction(op, args, VarRef(name))
+        elif isinstance(node, ast.Expr):
+            # see SSAConverter.visit: only evaluated inside functions
+            if self.local_names is not None and not isinstance(node.value, ast.Constant):
+                self.lower_expr(node.value)
+        elif isinstance(node, ast.Pass):
             pass
         else:
             raise NotImplementedError(f"Unsupported AST node type: {type(node).__name__}")
 
+    def lower_store(self, target, value):
+        if isinstance(target, ast.Name):
+            self.add_instruction("assign", [value], VarRef(target.id))
+        elif isinstance(target, ast.Subscript):
+            target_obj = self.lower_expr(target.value)
+            target_index = self.lower_expr(target.slice)
+            self.add_instruction("store_element", [target_obj, target_index, value])
+        elif isinstance(target, ast.Attribute):
+            self.add_instruction("setattr", [self.lower_expr(target.value), target.attr, value])
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for i, elt in enumerate(check_unpack(target)):
+                element = self.get_new_var("tmp")
+                self.add_instruction("get_element", [value, i], element)
+                self.lower_store(elt, element)
+        else:
+            raise NotImplementedError(f"Unsupported target type: {type(target).__name__}")
+
+    def lower_expr(self, node):
+        if isinstance(node, ast.Constant):
+            return self.visit_Constant(node)
+        if isinstance(node, ast.Name):
+            if self.is_global(node.id):
+                return self.load_global(node.id)
+            return VarRef(node.id)
+        if isinstance(node, ast.Attribute):
+            obj = self.lower_expr(node.value)
+            result = self.get_new_var("tmp")
+            self.add_instruction("getattr", [obj, node.attr], result)
+            return result
+        if isinstance(node, ast.Call):
+            return self.emit_call(node, self.lower_expr)
+        if isinstance(node, ast.Slice):
+            return self.emit_slice(node, self.lower_expr)
+        if isinstance(node, ast.BinOp):
+            left = self.lower_expr(node.left)
+            right = self.lower_expr(node.right)
+            return self.lower_binary(type(node.op).__name__.lower(), left, right)
+        if isinstance(node, ast.UnaryOp):
+            operand = self.lower_expr(node.operand)
+            op = type(node.op).__name__.lower()
+            if is_number(operand) and op in UNARY_OPERATORS:
+                return UNARY_OPERATORS[op](operand)
+            result = self.get_new_var("tmp")
+            self.add_instruction(op, [operand], result)
+            return result
+        if isinstance(node, ast.Compare):
+            return self.lower_compare(node)
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return self.lower_sequence(node)
+        if isinstance(node, ast.Subscript):
+            obj = self.lower_expr(node.value)
+            index = self.lower_expr(node.slice)
+            result = self.get_new_var("tmp")
+            self.add_instruction("get_element", [obj, index], result)
+            return result
+        raise NotImplementedError(f"Unsupported AST node type: {type(node).__name__}")
+
+    def lower_compare(self, node):
+        # a < b < c is (a < b) and (b < c); every operand is evaluated once
+        left = self.lower_expr(node.left)
+        result = None
+        for op, comparator in zip(node.ops, node.comparators):
+            right = self.lower_expr(comparator)
+            tmp_result = self.get_new_var("tmp")
+            self.add_instruction(type(op).__name__.lower(), [left, right], tmp_result)
+            if result is None:
+                result = tmp_result
+            else:
+                combined = self.get_new_var("tmp")
+                self.add_instruction("bitand", [result, tmp_result], combined)
+                result = combined
+            left = right
+        return result
+
+    def lower_sequence(self, node):
+        if not is_literal(node):
+            elements = [self.lower_expr(element) for element in node.elts]
+            op = "build_list" if isinstance(node, ast.List) else "build_tuple"
+            result = self.get_new_var("tmp")
+            self.add_instruction(op, elements, result)
+            return result
+        elements = [str(self.lower_expr(element)) for element in node.elts]
+        if isinstance(node, ast.List):
+            return f"[{', '.join(elements)}]"
+        return f"({', '.join(elements)})"
+
+    def lower_if(self, node):
+        cond = self.lower_expr(node.test)
+        then_block = self.new_block()
+        else_block = self.new_block()
+        after_block = self.new_block()
+        self.add_instruction("branch", [cond, then_block.name, else_block.name])
+
+        self.set_current_block(then_block)
+        self.lower_statements(node.body)
+        self.add_instruction("jump", [after_block.name])
+
+        self.set_current_block(else_block)
+        self.lower_statements(node.orelse)
+        self.add_instruction("jump", [after_block.name])
+
+        self.set_current_block(after_block)
+
+    def lower_while(self, node):
+        cond_block = self.new_block()
+        body_block = self.new_block()
+        after_block = self.new_block()
+        self.add_instruction("jump", [cond_block.name])
+
+        self.set_current_block(cond_block)
+        cond = self.lower_expr(node.test)
+        self.add_instruction("branch", [cond, body_block.name, after_block.name])
+
+        self.set_current_block(body_block)
+        self.lower_statements(node.body)
+        self.add_instruction("jump", [cond_block.name])
+
+        self.set_current_block(after_block)
+        # there is no break, so a loop's else clause runs whenever it ends
+        self.lower_statements(node.orelse)
+
+    def lower_for(self, node):
+        if not isinstance(node.target, ast.Name):
+            raise NotImplementedError(f"Unsupported target type: {type(node.target).__name__}")
+        iter_node = node.iter
+        is_range = (
+            isinstance(iter_node, ast.Call)
+            and isinstance(iter_node.func, ast.Name)
+            and iter_node.func.id == "range"
+        )
+
+        # range() arguments and the iterated object are evaluated once, before
+        # the loop, so pin them in temporaries the body cannot redefine
+        if is_range:
+            args = [self.pin(self.lower_expr(arg)) for arg in iter_node.args]
+            if len(args) == 1:
+                start, stop, step = 0, args[0], 1
+            else:
+                start, stop = args[0], args[1]
+                step = args[2] if len(args) > 2 else 1
+            index = self.hidden_var("range_index")
+            self.add_instruction("assign", [start], index)
+        else:
+            iter_obj = self.pin(self.lower_expr(iter_node))
+            index = self.hidden_var("index")
+            stop = self.get_new_var("length")
+            step = 1
+            self.add_instruction("assign", [0], index)
+            self.add_instruction("length", [iter_obj], stop)
+
+        cond_block = self.new_block()
+        body_block = self.new_block()
+        after_block = self.new_block()
+        self.add_instruction("jump", [cond_block.name])
+
+        self.set_current_block(cond_block)
+        cond_var = self.add_range_test(index, stop, step)
+        self.add_instruction("branch", [cond_var, body_block.name, after_block.name])
+
+        self.set_current_block(body_block)
+        if is_range:
+            loop_value = index
+        else:
+            loop_value = self.get_new_var("loop_value")
+            self.add_instruction("get_element", [iter_obj, index], loop_value)
+        self.add_instruction("assign", [loop_value], VarRef(node.target.id))
+        self.lower_statements(node.body)
+        self.add_instruction("add", [index, step], index)
+        self.add_instruction("jump", [cond_block.name])
+
+        self.set_current_block(after_block)
+        self.lower_statements(node.orelse)
+
+    def pin(self, value):
+        if not isinstance(value, VarRef):
+            return value
+        result = self.get_new_var("tmp")
+        self.add_instruction("assign", [value], result)
+        return result
+
+    # --- phi placement and renaming ---------------------------------------
+
+    def remove_unreachable_blocks(self):
+        for block in list(self.blocks):
+            if not self.cfg.reachable(block):
+                self.cfg.remove_block(block)
+
+    def place_phis(self):
+        def_blocks = {}
+        for block in self.blocks:
+            for instr in block.instructions:
+                if isinstance(instr.result, VarRef):
+                    def_blocks.setdefault(instr.result.name, []).append(block)
+
+        live_in = self.compute_live_in() if self.pruned else None
+        phis = {}
+        for var, blocks in def_blocks.items():
+            for block in self.cfg.iterated_dominance_frontier(blocks):
+                if live_in is not None and var not in live_in[block]:
+                    continue
+                phi = SSAInstruction("phi", [None] * len(block.preds), VarRef(var))
+                phis.setdefault(block, []).append((var, phi))
+        for block, block_phis in phis.items():
+            block.instructions[:0] = [phi for _, phi in block_phis]
+        return phis
+
+    def compute_live_in(self):
+        uses = {}
+        kills = {}
+        for block in self.blocks:
+            block_uses = set()
+            block_kills = set()
+            for instr in block.instructions:
+                for arg in instr.args:
+                    if isinstance(arg, VarRef) and arg.name not in block_kills:
+                        block_uses.add(arg.name)
+                if isinstance(instr.result, VarRef):
+                    block_kills.add(instr.result.name)
+            uses[block] = block_uses
+            kills[block] = block_kills
+
+        live_in = {block: set(uses[block]) for block in self.blocks}
+        postorder = self.cfg.reverse_postorder()[::-1]
+        changed = True
+        while changed:
+            changed = False
+            for block in postorder:
+                live_out = set()
+                for succ in block.successors:
+                    live_out |= live_in[succ]
+                new_live_in = uses[block] | (live_out - kills[block])
+                if new_live_in != live_in[block]:
+                    live_in[block] = new_live_in
+                    changed = True
+        return live_in
+
+    def rename(self, phis):
+        stacks = {}
+
+        def read(arg):
+            if isinstance(arg, VarRef):
+                stack = stacks.get(arg.name)
+                return stack[-1] if stack else None
+            return arg
+
+        # explicit stack instead of recursion so deep dominator trees are fine
+        work = [(self.cfg.entry, False)]
+        pushed = {}
+        while work:
+            block, done = work.pop()
+            if done:
+                for var in pushed.pop(block):
+                    stacks[var].pop()
+                continue
+
+            defined = []
+            for instr in block.instructions:
+                if instr.op != "phi":
+                    instr.args = [read(arg) for arg in instr.args]
+                if isinstance(instr.result, VarRef):
+                    var = instr.result.name
+                    instr.result = self.get_new_var(var.split("#")[0])
+                    stacks.setdefault(var, []).append(instr.result)
+                    defined.append(var)
+            pushed[block] = defined
+
+            for succ in block.successors:
+                pred_index = succ.preds.index(block)
+                for var, phi in phis.get(succ, ()):
+                    stack = stacks.get(var)
+                    phi.args[pred_index] = stack[-1] if stack else None
+
+            work.append((block, True))
+            for child in reversed(self.cfg.dom_children(block)):
+                work.append((child, False))
+
+
+SSA_CONSTRUCTION_MODES = {
+    "braun": SSAConverter,
+    "cytron": CytronSSAConverter,
+}
+
+
+def build_ssa(source, mode="braun"):
+    tree = ast.parse(source) if isinstance(source, str) else source
+    converter = SSA_CONSTRUCTION_MODES[mode]()
+    converter.visit(tree)
+    return converter
+
+
+# Name of the compilation unit holding a module's top-level code. Every
+# top-level def is a unit of its own, named after the function.
+MODULE_UNIT = "<module>"
+
+
+class CompilationUnit:
+    # One separately converted piece of a module. key identifies the unit's
+    # AST (without line numbers) so an unchanged unit can be reused after
+    # the rest of the file was edited.
+    __slots__ = ("name", "key", "node", "blocks")
+
+    def __init__(self, name, key, node, blocks=None):
+        self.name = name
+        self.key = key
+        self.node = node
+        self.blocks = blocks
+
+    def __repr__(self):
+        return f"CompilationUnit({self.name!r})"
+
+
+def split_units(tree, mode="braun"):
+    # the module unit converts the top-level statements, where a def only
+    # binds the name; each def's body is converted as its own unit
+    tree = ast.parse(tree) if isinstance(tree, str) else tree
+    unit_names = function_unit_names(tree.body)
+    module_parts = [mode]
+    units = []
+    for stmt in tree.body:
+        if isinstance(stmt, ast.FunctionDef):
+            name = unit_names[id(stmt)]
+            module_parts.append(f"def {name}")
+            module_parts.extend(ast.dump(default) for default in stmt.args.defaults)
+            units.append(CompilationUnit(name, f"{mode}\0{ast.dump(stmt)}", stmt))
+        else:
+            module_parts.append(ast.dump(stmt))
+    units.insert(0, CompilationUnit(MODULE_UNIT, "\0".join(module_parts), tree))
+    return units
+
+
+def convert_unit(unit, mode="braun"):
+    if unit.name == MODULE_UNIT:
+        return build_ssa(unit.node, mode)
+    converter = SSA_CONSTRUCTION_MODES[mode]()
+    converter.visit_function(unit.node)
+    return converter
+
+
+class IncrementalConverter:
+    # Keeps the units of the last converted version of a module and, on
+    # update, only converts the units whose AST changed. With an SSACache
+    # the units are also looked up on disk, so a function that did not
+    # change is not converted again in a later run either.
+    def __init__(self, mode="braun", cache=None):
+        self.mode = mode
+        self.cache = cache
+        self.units = {}
+
+    def update(self, source):
+        # returns the names of the units that changed since the last update
+        previous = self.units
+        self.units = {}
+        rebuilt = []
+        for unit in split_units(source, self.mode):
+            old = previous.get(unit.name)
+            if old is not None and old.key == unit.key:
+                unit.blocks = old.blocks
+            else:
+                unit.blocks = self.convert(unit)
+                rebuilt.append(unit.name)
+            unit.node = None  # the AST is only needed while converting
+            self.units[unit.name] = unit
+        return rebuilt
+
+    def convert(self, unit):
+        if self.cache is None:
+            return convert_unit(unit, self.mode).blocks
+        key = self.cache.key(unit.key, self.mode)
+        blocks = self.cache.get(key)
+        if blocks is not None:
+            self.cache.hits += 1
+            return blocks
+        self.cache.misses += 1
+        blocks = convert_unit(unit, self.mode).blocks
+        self.cache.put(key, blocks)
+        return blocks
+
+
+def build_units(source, mode="braun", cache=None):
+    # {unit name: blocks}, the module unit first
+    converter = IncrementalConverter(mode, cache)
+    converter.update(source)
+    return {name: unit.blocks for name, unit in converter.units.items()}
+
+
+# Bump when the serialized layout below changes; changes to the converter
+# itself are picked up through the hash of this file.
+SSA_CACHE_FORMAT = 1
+_converter_digest = None
+
+
+def converter_digest():
+    global _converter_digest
+    if _converter_digest is None:
+        with open(os.path.abspath(__file__), "rb") as f:
+            _converter_digest = hashlib.sha256(f.read()).hexdigest()
+    return _converter_digest
+
+
+def encode_blocks(blocks):
+    # SSA values become their integer id and every literal operand a
+    # 1-tuple, so the two can't be confused; edges are stored as block
+    # names in their original order, which phi operands depend on
+    values = {}
+
+    def encode(arg):
+        if isinstance(arg, SSAValue):
+            values[arg.id] = (arg.base, arg.version)
+            return arg.id
+        return (arg,)
+
+    encoded = tuple(
+        (
+            block.name,
+            tuple(pred.name for pred in block.preds),
+            tuple(succ.name for succ in block.successors),
+            tuple(
+                (OPCODE_NAMES[instr.opcode], tuple(map(encode, instr.args)), encode(instr.result))
+                for instr in block.instructions
+            ),
+        )
+        for block in blocks
+    )
+    table = tuple((value_id, base, version) for value_id, (base, version) in values.items())
+    return zlib.compress(marshal.dumps((SSA_CACHE_FORMAT, table, encoded)), 1)
+
+
+def decode_blocks(data):
+    layout, table, encoded = marshal.loads(zlib.decompress(data))
+    if layout != SSA_CACHE_FORMAT:
+        raise ValueError(f"unknown SSA cache format {layout}")
+    values = {value_id: SSAValue(value_id, sys.intern(base), version) for value_id, base, version in table}
+
+    def decode(arg):
+        return arg[0] if isinstance(arg, tuple) else values[arg]
+
+    blocks = [SSABlock(name) for name, _, _, _ in encoded]
+    block_map = {block.name: block for block in blocks}
+    for block, (_, preds, successors, instructions) in zip(blocks, encoded):
+        block.preds = [block_map[name] for name in preds]
+        block.successors = [block_map[name] for name in successors]
+        block.instructions = [
+            SSAInstruction(op, [decode(arg) for arg in args], decode(result))
+            for op, args, result in instructions
+        ]
+    return blocks
+
+
+class SSACache:
+    # On-disk cache of converted blocks, keyed by the hash of the source, the
+    # construction mode and the converter itself. Entries are written to a
+    # temporary file and renamed into place, so concurrent processes only
+    # ever see complete entries. A hit refreshes the entry's mtime and the
+    # oldest entries are evicted once the directory grows past max_bytes.
+    def __init__(self, directory, max_bytes=256 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # bytes in the directory, scanned on first put
+
+    def key(self, source, mode="braun"):
+        digest = hashlib.sha256()
+        for part in (str(SSA_CACHE_FORMAT), converter_digest(), mode, source):
+            digest.update(part.encode("utf-8", "surrogatepass"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".ssab")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            blocks = decode_blocks(data)
+        except (ValueError, TypeError, KeyError, EOFError, zlib.error):
+            self._discard(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return blocks
+
+    def put(self, key, blocks):
+        try:
+            data = encode_blocks(blocks)
+        except ValueError:
+            return  # an operand marshal can't store
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            # evict down to 90% so the next few puts don't rescan
+            self.evict(self.max_bytes * 9 // 10)
+
+    def build(self, source, mode="braun"):
+        key = self.key(source, mode)
+        blocks = self.get(key)
+        if blocks is not None:
+            self.hits += 1
+            return blocks
+        self.misses += 1
+        blocks = build_ssa(source, mode).blocks
+        self.put(key, blocks)
+        return blocks
+
+    def evict(self, target_bytes):
+        # other processes may be writing and evicting at the same time, so
+        # the scan is authoritative and missing files are skipped
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            self._discard(path)
+            total -= size
+        self._size = total
+
+    def clear(self):
+        self.evict(0)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".ssab"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def format_blocks(blocks):
+    return "\n".join(map(str, blocks)) + "\n"
+
+
+def format_units(units):
+    # the module's blocks, then each function under a "# function" header
+    parts = []
+    for name, blocks in units.items():
+        if name != MODULE_UNIT:
+            parts.append(f"# function {name}\n")
+        parts.append(format_blocks(blocks))
+    return "\n".join(parts)
+
+
+def collect_sources(paths):
+    # (source path, output path relative to the output directory); files
+    # inside a directory keep their place under it
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(".py"):
+                        full = os.path.join(root, name)
+                        sources.append((full, os.path.relpath(full, path)))
+        else:
+            sources.append((path, os.path.basename(path)))
+    return sources
+
+
+def convert_file(path, output_path=None, mode="braun", cache=None):
+    # One file's failure must not take the batch down, so every error is
+    # returned as text. With an output path the worker writes the result
+    # itself instead of sending it back to the parent.
+    try:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        text = format_units(build_units(source, mode, cache))
+        if output_path is None:
+            return path, text, None
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path, None, None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def convert_chunk(jobs, mode, cache=None):
+    return [convert_file(path, output_path, mode, cache) for path, output_path in jobs]
+
+
+def convert_files(jobs, mode="braun", workers=None, chunksize=0, ordered=True, cache=None):
+    # jobs is a list of (path, output_path); yields convert_file results,
+    # in input order or as soon as each chunk finishes
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        for path, output_path in jobs:
+            yield convert_file(path, output_path, mode, cache)
+        return
+    # a few chunks per worker keeps the pool busy without paying one
+    # round trip per file
+    chunksize = chunksize or max(1, len(jobs) // (workers * 4))
+    chunks = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [pool.submit(convert_chunk, chunk, mode, cache) for chunk in chunks]
+        for future in futures if ordered else as_completed(futures):
+            yield from future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Python sources to SSA form.")
+    parser.add_argument("paths", nargs="+", help="source files or directories searched for .py files")
+    parser.add_argument("-o", "--output-dir",
+                        help="write <name>.ssa files here instead of printing to stdout")
+    parser.add_argument("-m", "--mode", choices=sorted(SSA_CONSTRUCTION_MODES), default="braun")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="worker processes, default one per CPU")
+    parser.add_argument("--chunksize", type=int, default=0, help="files per task, default automatic")
+    parser.add_argument("--unordered", action="store_true",
+                        help="report files as they finish instead of in input order")
+    parser.add_argument("--cache-dir", help="reuse converted SSA from this directory across runs")
+    parser.add_argument("--cache-size", type=int, default=256, help="cache size limit in MiB")
+    args = parser.parse_args(argv)
+    cache = SSACache(args.cache_dir, args.cache_size << 20) if args.cache_dir else None
+
+    jobs = []
+    for path, relative in collect_sources(args.paths):
+        output_path = None
+        if args.output_dir:
+            output_path = os.path.join(args.output_dir, os.path.splitext(relative)[0] + ".ssa")
+        jobs.append((path, output_path))
+
+    failures = 0
+    for path, text, error in convert_files(jobs, args.mode, args.jobs, args.chunksize,
+                                            not args.unordered, cache):
+        if error is not None:
+            failures += 1
+            print(f"{path}: {error}", file=sys.stderr)
+        elif text is not None:
+            print(f"# {path}")
+            print(text)
+    if failures:
+        print(f"{failures} of {len(jobs)} files failed", file=sys.stderr)
+    return 1 if failures else 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main())
+
     source_code = """
 x = "1"
 t = [3,4]
@@ -17,7 +17,7 @@ def dense_mv(A, x):
     y = np.zeros(A.shape[0])
     for i in range(A.shape[0]):
         for j in range(A.shape[1]):
-            y[i] = A[i, j] * x[j]
+            y[i] += A[i, j] * x[j]
     return y
 
 
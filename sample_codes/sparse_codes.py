@@ -0,0 +1,149 @@
+import numpy as np
+
+
+# sparse matrix vector multiplication, CSR format
+def csr_mv(indptr, indices, data, x):
+    """
+    Perform a sparse matrix-vector multiplication with a CSR matrix.
+
+    Args:
+        indptr: A numpy integer array of length n_rows + 1, row i owns the
+            entries indptr[i]:indptr[i + 1] of indices and data.
+        indices: A numpy integer array with the column of each nonzero.
+        data: A numpy array with the value of each nonzero.
+        x: A numpy array representing the vector.
+
+    Returns:
+        The result of the matrix-vector multiplication.
+    """
+    n_rows = indptr.shape[0] - 1
+    y = np.zeros(n_rows)
+    for i in range(n_rows):
+        for p in range(indptr[i], indptr[i + 1]):
+            y[i] += data[p] * x[indices[p]]
+    return y
+
+
+# sparse matrix vector multiplication, COO format
+def coo_mv(rows, cols, values, x, n_rows):
+    """
+    Perform a sparse matrix-vector multiplication with a COO matrix.
+
+    Args:
+        rows: A numpy integer array with the row of each nonzero.
+        cols: A numpy integer array with the column of each nonzero.
+        values: A numpy array with the value of each nonzero.
+        x: A numpy array representing the vector.
+        n_rows: The number of rows of the matrix.
+
+    Returns:
+        The result of the matrix-vector multiplication.
+    """
+    y = np.zeros(n_rows)
+    for k in range(rows.shape[0]):
+        y[rows[k]] += values[k] * x[cols[k]]
+    return y
+
+
+def coo_to_csr(rows, cols, values, n_rows):
+    """
+    Convert a COO matrix to CSR with a counting sort over the rows.
+
+    Entries keep their relative order within a row and duplicates are kept
+    as separate entries (they add up in a matrix-vector product).
+
+    Args:
+        rows: A numpy integer array with the row of each nonzero.
+        cols: A numpy integer array with the column of each nonzero.
+        values: A numpy array with the value of each nonzero.
+        n_rows: The number of rows of the matrix.
+
+    Returns:
+        The (indptr, indices, data) arrays of the CSR matrix.
+    """
+    nnz = rows.shape[0]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    for k in range(nnz):
+        indptr[rows[k] + 1] += 1
+    for i in range(n_rows):
+        indptr[i + 1] += indptr[i]
+    indices = np.empty(nnz, dtype=np.int64)
+    data = np.empty(nnz, dtype=values.dtype)
+    fill = indptr[:-1].copy()
+    for k in range(nnz):
+        p = fill[rows[k]]
+        indices[p] = cols[k]
+        data[p] = values[k]
+        fill[rows[k]] += 1
+    return indptr, indices, data
+
+
+def csr_to_dense(indptr, indices, data, n_cols):
+    """
+    Expand a CSR matrix into a dense numpy array.
+
+    Args:
+        indptr: The CSR row pointer array.
+        indices: The CSR column index array.
+        data: The CSR value array.
+        n_cols: The number of columns of the matrix.
+
+    Returns:
+        A dense numpy array holding the matrix.
+    """
+    n_rows = indptr.shape[0] - 1
+    A = np.zeros((n_rows, n_cols), dtype=data.dtype)
+    for i in range(n_rows):
+        for p in range(indptr[i], indptr[i + 1]):
+            A[i, indices[p]] += data[p]
+    return A
+
+
+def random_coo(n_rows, n_cols, density, skew=0.0, seed=None):
+    """
+    Generate a random sparse matrix in COO format, sorted by row and column.
+
+    Positions are drawn with replacement and deduplicated, so the matrix has
+    slightly fewer than density * n_rows * n_cols nonzeros. This never needs
+    memory proportional to the dense size.
+
+    Args:
+        n_rows: The number of rows.
+        n_cols: The number of columns.
+        density: The expected fraction of nonzero entries.
+        skew: Row i is picked with weight (i + 1) ** -skew; 0 spreads the
+            nonzeros uniformly, larger values concentrate them in the first
+            rows like the power-law matrices from graphs.
+        seed: Seed for numpy's random generator.
+
+    Returns:
+        The (rows, cols, values) arrays of the COO matrix.
+    """
+    rng = np.random.default_rng(seed)
+    nnz = int(round(density * n_rows * n_cols))
+    if skew:
+        weights = np.arange(1, n_rows + 1, dtype=np.float64) ** -skew
+        rows = rng.choice(n_rows, size=nnz, p=weights / weights.sum())
+    else:
+        rows = rng.integers(0, n_rows, size=nnz)
+    cols = rng.integers(0, n_cols, size=nnz)
+    positions = np.unique(rows.astype(np.int64) * n_cols + cols)
+    return positions // n_cols, positions % n_cols, rng.random(positions.shape[0])
+
+
+def random_csr(n_rows, n_cols, density, skew=0.0, seed=None):
+    """
+    Generate a random sparse matrix in CSR format.
+
+    Args:
+        n_rows: The number of rows.
+        n_cols: The number of columns.
+        density: The expected fraction of nonzero entries.
+        skew: Row skew of the nonzeros, see random_coo.
+        seed: Seed for numpy's random generator.
+
+    Returns:
+        The (indptr, indices, data) arrays of the CSR matrix.
+    """
+    rows, cols, values = random_coo(n_rows, n_cols, density, skew, seed)
+    return coo_to_csr(rows, cols, values, n_rows)
@@ -0,0 +1,861 @@
+import ast
+import re
+
+from project2 import MODULE_UNIT, ControlFlowGraph, SSABlock, SSAInstruction, SSAValue
+from ssa_interp import TEMPORARY_BASES, literal_value
+
+# Python backend for the SSA IR. A unit is first taken out of SSA form
+# (destruct_ssa): critical edges are split, phi results and operands that do
+# not interfere are coalesced into one variable, and the remaining phis
+# become sequentialized copies at the end of the predecessors. The result is
+# then emitted as a Python AST, with structured if/while statements where
+# the CFG allows it and a block dispatch loop otherwise, and compiled.
+
+_BINOPS = {
+    "add": ast.Add,
+    "sub": ast.Sub,
+    "mult": ast.Mult,
+    "div": ast.Div,
+    "floordiv": ast.FloorDiv,
+    "mod": ast.Mod,
+    "pow": ast.Pow,
+    "lshift": ast.LShift,
+    "rshift": ast.RShift,
+    "bitor": ast.BitOr,
+    "bitxor": ast.BitXor,
+    "bitand": ast.BitAnd,
+}
+_COMPARES = {"lt": ast.Lt, "lte": ast.LtE, "gt": ast.Gt, "gte": ast.GtE, "eq": ast.Eq, "noteq": ast.NotEq}
+_UNARY = {"usub": ast.USub, "uadd": ast.UAdd, "not": ast.Not, "invert": ast.Invert}
+
+# names the generated code itself refers to
+_FUNCTION_HELPER = "_ssa_function"
+_BUILTINS_USED = {"len", "slice", "float", "range", "type"}
+
+
+# --- out of SSA ---------------------------------------------------------
+
+
+def copy_blocks(blocks):
+    # instructions and edges are copied; SSA values and literals are shared
+    copies = {block.name: SSABlock(block.name) for block in blocks}
+    for block in blocks:
+        new = copies[block.name]
+        new.instructions = [SSAInstruction(instr.op, list(instr.args), instr.result) for instr in block.instructions]
+        new.preds = [copies[pred.name] for pred in block.preds]
+        new.successors = [copies[succ.name] for succ in block.successors]
+    return list(copies.values())
+
+
+def _phis(block):
+    return [instr for instr in block.instructions if instr.op == "phi"]
+
+
+def _check_phis(cfg, unit=None):
+    for block in cfg.blocks:
+        for phi in _phis(block):
+            if len(phi.args) != len(block.preds):
+                raise ValueError(
+                    ("" if unit is None else f"{unit}: ")
+                    + f"phi {phi!r} in {block.name} has {len(phi.args)} operands for {len(block.preds)} predecessors"
+                )
+
+
+def split_critical_edges(cfg):
+    # An edge from a block with several successors to a block with phis and
+    # several predecessors gets a block of its own, so the copies for that
+    # edge have somewhere to go. Returns the number of new blocks.
+    count = 0
+    for block in list(cfg.blocks):
+        if len(block.preds) < 2 or not _phis(block):
+            continue
+        for index, pred in enumerate(block.preds):
+            if len(pred.successors) < 2:
+                continue
+            # the k-th edge pred -> block is the k-th occurrence on both sides
+            occurrence = block.preds[:index].count(pred)
+            split = SSABlock(f"{pred.name}_{block.name}_{count}")
+            split.instructions = [SSAInstruction("jump", [block.name], None)]
+            split.preds = [pred]
+            split.successors = [block]
+            positions = [i for i, succ in enumerate(pred.successors) if succ is block]
+            pred.successors[positions[occurrence]] = split
+            _retarget(pred, block.name, split.name, occurrence)
+            block.preds[index] = split
+            cfg.add_block(split)
+            count += 1
+    return count
+
+
+def _retarget(block, old_name, new_name, occurrence):
+    seen = 0
+    for instr in block.instructions:
+        if instr.op in ("branch", "jump"):
+            args = list(instr.args)
+            for i in range(1 if instr.op == "branch" else 0, len(args)):
+                if args[i] == old_name:
+                    if seen == occurrence:
+                        args[i] = new_name
+                        instr.args = args
+                        return
+                    seen += 1
+
+
+def _def_sites(cfg):
+    # value -> (block, index); phis are defined at index -1. Values defined
+    # more than once (IR not in strict SSA form) are left out.
+    sites = {}
+    repeated = set()
+    for block in cfg.blocks:
+        for index, instr in enumerate(block.instructions):
+            value = instr.result
+            if isinstance(value, SSAValue):
+                if value in sites:
+                    repeated.add(value)
+                sites[value] = (block, -1 if instr.op == "phi" else index)
+    for value in repeated:
+        del sites[value]
+    return sites, repeated
+
+
+def _liveness(cfg):
+    # live_out[block] and the use sites of every value; a phi operand is
+    # used at the end of the matching predecessor
+    uses = {}
+    upward = {}
+    defs = {}
+    phi_defs = {}
+    phi_uses = {block: set() for block in cfg.blocks}
+    for block in cfg.blocks:
+        block_upward = set()
+        block_defs = set()
+        block_phi_defs = set()
+        for index, instr in enumerate(block.instructions):
+            if instr.op == "phi":
+                block_phi_defs.add(instr.result)
+                for arg, pred in zip(instr.args, block.preds):
+                    if isinstance(arg, SSAValue):
+                        uses.setdefault(arg, []).append((pred, len(pred.instructions)))
+                        phi_uses[pred].add(arg)
+                continue
+            for arg in instr.args:
+                if isinstance(arg, SSAValue):
+                    uses.setdefault(arg, []).append((block, index))
+                    if arg not in block_defs and arg not in block_phi_defs:
+                        block_upward.add(arg)
+            if isinstance(instr.result, SSAValue):
+                block_defs.add(instr.result)
+        upward[block] = block_upward
+        defs[block] = block_defs | block_phi_defs
+        phi_defs[block] = block_phi_defs
+
+    live_in = {block: set() for block in cfg.blocks}
+    live_out = {block: set() for block in cfg.blocks}
+    order = cfg.reverse_postorder()[::-1]
+    order += [block for block in cfg.blocks if block not in set(order)]
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            out = set(phi_uses[block])
+            for succ in block.successors:
+                out |= live_in[succ] - phi_defs[succ]
+            new_in = phi_defs[block] | upward[block] | (out - defs[block])
+            if out != live_out[block] or new_in != live_in[block]:
+                live_out[block] = out
+                live_in[block] = new_in
+                changed = True
+    return live_out, uses
+
+
+class _Interference:
+    # Value interference from liveness and dominance (Budimlic et al.): two
+    # values interfere when the one whose definition dominates the other is
+    # still live right after the other's definition.
+    def __init__(self, cfg, sites):
+        self.cfg = cfg
+        self.sites = sites
+        self.live_out, self.uses = _liveness(cfg)
+
+    def live_after(self, value, block, index):
+        if value in self.live_out[block]:
+            return True
+        return any(use_block is block and use_index > index for use_block, use_index in self.uses.get(value, ()))
+
+    def dominates(self, a, b):
+        if a[0] is b[0]:
+            return a[1] <= b[1]
+        return self.cfg.dominates(a[0], b[0])
+
+    def interfere(self, a, b):
+        site_a = self.sites[a]
+        site_b = self.sites[b]
+        if site_a[0] is site_b[0] and site_a[1] == site_b[1] == -1:
+            return True  # phis of one block are defined simultaneously
+        if self.dominates(site_a, site_b):
+            return self.live_after(a, *site_b)
+        if self.dominates(site_b, site_a):
+            return self.live_after(b, *site_a)
+        return False
+
+
+def coalesce(cfg, sites):
+    # Puts each phi and those of its operands it does not interfere with in
+    # one congruence class; returns value -> representative.
+    interference = _Interference(cfg, sites)
+    leader = {}
+    members = {}
+
+    def find(value):
+        while leader.get(value, value) is not value:
+            value = leader[value]
+        return value
+
+    for block in cfg.blocks:
+        for phi in _phis(block):
+            if phi.result not in sites:
+                continue
+            for arg in phi.args:
+                if not isinstance(arg, SSAValue) or arg not in sites:
+                    continue
+                a, b = find(phi.result), find(arg)
+                if a is b:
+                    continue
+                class_a = members.get(a, [a])
+                class_b = members.get(b, [b])
+                if any(interference.interfere(x, y) for x in class_a for y in class_b):
+                    continue
+                leader[b] = a
+                members[a] = class_a + class_b
+                members.pop(b, None)
+    return {value: find(value) for value in list(leader)}
+
+
+def sequentialize_copies(copies, new_temp):
+    # Orders a parallel copy [(dst, src)] into plain assignments. dsts are
+    # distinct variables; srcs are variables or literals (wrapped in a
+    # 1-tuple so they never match a variable). A cycle is broken by saving
+    # one variable in a temporary from new_temp().
+    pending = {dst: src for dst, src in copies if dst != src}
+    result = []
+    while pending:
+        sources = {}
+        for src in pending.values():
+            sources[src] = sources.get(src, 0) + 1
+        ready = [dst for dst in pending if dst not in sources]
+        if ready:
+            for dst in ready:
+                result.append((dst, pending.pop(dst)))
+            continue
+        # every remaining dst is also read: a set of cycles
+        dst = next(iter(pending))
+        temp = new_temp()
+        result.append((temp, dst))
+        pending = {d: (temp if s == dst else s) for d, s in pending.items()}
+    return result
+
+
+def destruct_ssa(cfg):
+    # Rewrites cfg in place without phis. Returns (names, temps): names maps
+    # every value to the variable it is stored in (coalesced values share
+    # one), temps lists the extra variables used to break copy cycles.
+    _check_phis(cfg)
+    split_critical_edges(cfg)
+    sites, repeated = _def_sites(cfg)
+    representative = coalesce(cfg, sites)
+
+    def variable(value):
+        return representative.get(value, value)
+
+    temps = []
+
+    def new_temp():
+        temp = SSAValue(-1 - len(temps), "swap", len(temps) + 1)
+        temps.append(temp)
+        return temp
+
+    copies = {}
+    for block in cfg.blocks:
+        phis = _phis(block)
+        if not phis:
+            continue
+        for index, pred in enumerate(block.preds):
+            edge_copies = []
+            for phi in phis:
+                arg = phi.args[index]
+                src = variable(arg) if isinstance(arg, SSAValue) else (arg,)
+                edge_copies.append((variable(phi.result), src))
+            copies.setdefault(pred, []).extend(edge_copies)
+        block.instructions = [instr for instr in block.instructions if instr.op != "phi"]
+
+    for pred, edge_copies in copies.items():
+        moves = []
+        for dst, src in sequentialize_copies(edge_copies, new_temp):
+            moves.append(SSAInstruction("assign", [src[0] if isinstance(src, tuple) else src], dst))
+        terminator = _terminator_index(pred)
+        pred.instructions[terminator:terminator] = moves
+    names = {value: variable(value) for value in sites}
+    names.update((value, value) for value in repeated)
+    return names, temps
+
+
+def _returns(block):
+    return bool(block.instructions) and block.instructions[-1].op == "return"
+
+
+def _terminator_index(block):
+    for index, instr in enumerate(block.instructions):
+        if instr.op in ("branch", "jump", "return"):
+            return index
+    return len(block.instructions)
+
+
+# --- code generation ----------------------------------------------------
+
+
+class _Unsupported(Exception):
+    # the CFG has a shape the structured emitter cannot express
+    pass
+
+
+def _operand_order(op, args):
+    # operand indices in the order Python evaluates them in the emitted code
+    if op == "store_element":
+        return [2, 0, 1]
+    if op == "setattr":
+        return [2, 0]
+    if op == "getattr":
+        return [0]
+    if op in ("global", "import", "import_from", "param"):
+        return []
+    if op == "function":
+        return list(range(1, len(args)))
+    if op == "call_kw":
+        positional = args[1]
+        return [0, *range(2, 2 + positional), *range(3 + positional, len(args), 2)]
+    return list(range(len(args)))
+
+
+def literal_expr(operand):
+    value = literal_value(operand)
+    if isinstance(value, float) and value != value:
+        return ast.Call(ast.Name("float", ast.Load()), [ast.Constant("nan")], [])
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return ast.Constant(value)
+    # list, dict, set and range literals are rebuilt from their source text,
+    # so every evaluation creates a new object
+    return ast.parse(operand, mode="eval").body
+
+
+def _identifier(text):
+    text = re.sub(r"\W", "_", text)
+    return text if text and not text[0].isdigit() else f"_{text}"
+
+
+def unit_function_name(unit_name):
+    return _identifier(f"_ssa_unit_{unit_name}")
+
+
+class _FunctionEmitter:
+    # phi_results (module units) maps a block name to the results of the
+    # phis it had, which are exported on entry to the block
+    def __init__(self, cfg, names, temps, module, phi_results=None):
+        self.cfg = cfg
+        self.module = module
+        self.blocks = cfg.blocks
+        self.temps = set(temps)
+        self.phi_results = phi_results or {}
+        self.variables = {}
+        self.globals_read = set()
+        self.exports = []
+        self.params = []
+        self._assign_names(names, temps)
+        self._count_uses()
+
+    # names
+
+    def _assign_names(self, names, temps):
+        reserved = set(_BUILTINS_USED) | {_FUNCTION_HELPER}
+        for block in self.blocks:
+            for instr in block.instructions:
+                if instr.op == "global":
+                    self.globals_read.add(instr.args[0])
+                elif instr.op == "function":
+                    reserved.add(unit_function_name(instr.args[0]))
+                elif instr.op == "param":
+                    self.params.append((instr.args[0], instr.result))
+        reserved |= self.globals_read
+        if self.module:
+            reserved |= {value.base for value in names if self._exported(value)}
+        self.params.sort(key=lambda param: param[0])
+        used = set(reserved)
+        classes = {}
+        for value, variable in names.items():
+            classes.setdefault(variable, []).append(value)
+
+        def take(text):
+            text = _identifier(text)
+            while text in used:
+                text += "_"
+            used.add(text)
+            return text
+
+        # parameters keep their source name where possible
+        for _, value in self.params:
+            variable = names.get(value, value)
+            if variable not in self.variables:
+                self.variables[variable] = take(value.base)
+        # a source variable that ends up in a single class keeps its name
+        bases = {}
+        for variable in classes:
+            if variable not in self.variables:
+                bases[variable.base] = bases.get(variable.base, 0) + 1
+        for variable in sorted(classes, key=lambda v: v.id):
+            if variable not in self.variables:
+                unique = bases[variable.base] == 1 and variable.base not in TEMPORARY_BASES
+                self.variables[variable] = take(variable.base if unique and not self.module else repr(variable))
+        for temp in temps:
+            self.variables[temp] = take(f"_{temp!r}")
+        self.class_of = names
+        self.class_size = {variable: len(values) for variable, values in classes.items()}
+
+    def name_of(self, value):
+        variable = self.class_of.get(value, value)
+        name = self.variables.get(variable)
+        if name is None:  # used but never defined
+            name = self.variables[variable] = _identifier(f"_undefined_{value!r}")
+        return name
+
+    def _exported(self, value):
+        return (
+            self.module
+            and isinstance(value, SSAValue)
+            and value not in self.temps
+            and value.base.isidentifier()
+            and value.base not in TEMPORARY_BASES
+        )
+
+    def _count_uses(self):
+        self.use_count = {}
+        self.use_block = {}
+        self.def_count = {}
+        for block in self.blocks:
+            for instr in block.instructions:
+                for index in _operand_order(instr.op, instr.args):
+                    arg = instr.args[index] if index < len(instr.args) else None
+                    if isinstance(arg, SSAValue):
+                        self.use_count[arg] = self.use_count.get(arg, 0) + 1
+                        self.use_block[arg] = block
+                if isinstance(instr.result, SSAValue):
+                    self.def_count[instr.result] = self.def_count.get(instr.result, 0) + 1
+
+    # expressions and statements
+
+    def load(self, value):
+        return ast.Name(self.name_of(value), ast.Load())
+
+    def store(self, value):
+        return ast.Name(self.name_of(value), ast.Store())
+
+    def operand(self, arg):
+        if isinstance(arg, SSAValue):
+            return self.load(arg)
+        return literal_expr(arg)
+
+    def expression(self, instr, operands):
+        # operands: index -> expression
+        op = instr.op
+        args = instr.args
+        if op in _BINOPS:
+            return ast.BinOp(operands[0], _BINOPS[op](), operands[1])
+        if op in _COMPARES:
+            return ast.Compare(operands[0], [_COMPARES[op]()], [operands[1]])
+        if op in _UNARY:
+            return ast.UnaryOp(_UNARY[op](), operands[0])
+        if op == "assign":
+            return operands[0]
+        if op == "get_element":
+            return ast.Subscript(operands[0], operands[1], ast.Load())
+        if op == "getattr":
+            return ast.Attribute(operands[0], args[1], ast.Load())
+        if op == "length":
+            return ast.Call(ast.Name("len", ast.Load()), [operands[0]], [])
+        if op == "build_list":
+            return ast.List([operands[i] for i in range(len(args))], ast.Load())
+        if op == "build_tuple":
+            return ast.Tuple([operands[i] for i in range(len(args))], ast.Load())
+        if op == "build_slice":
+            return ast.Call(ast.Name("slice", ast.Load()), [operands[i] for i in range(3)], [])
+        if op == "call":
+            return ast.Call(operands[0], [operands[i] for i in range(1, len(args))], [])
+        if op == "call_kw":
+            positional = args[1]
+            return ast.Call(
+                operands[0],
+                [operands[i] for i in range(2, 2 + positional)],
+                [ast.keyword(args[i], operands[i + 1]) for i in range(2 + positional, len(args), 2)],
+            )
+        if op == "global":
+            return ast.Name(args[0], ast.Load())
+        if op == "function":
+            defaults = ast.Tuple([operands[i] for i in range(1, len(args))], ast.Load())
+            return ast.Call(
+                ast.Name(_FUNCTION_HELPER, ast.Load()),
+                [ast.Name(unit_function_name(args[0]), ast.Load()), ast.Constant(args[0].split("#")[0]), defaults],
+                [],
+            )
+        raise ValueError(f"unsupported operation {op!r}")
+
+    def statement(self, instr, operands):
+        op = instr.op
+        if op == "store_element":
+            target = ast.Subscript(operands[0], operands[1], ast.Store())
+            return ast.Assign([target], operands[2])
+        if op == "setattr":
+            return ast.Assign([ast.Attribute(operands[0], instr.args[1], ast.Store())], operands[2])
+        if op == "import":
+            return ast.Import([ast.alias(instr.args[0], self.name_of(instr.result))])
+        if op == "import_from":
+            module = instr.args[0]
+            level = len(module) - len(module.lstrip("."))
+            names = [ast.alias(instr.args[1], self.name_of(instr.result))]
+            return ast.ImportFrom(module.lstrip(".") or None, names, level)
+        value = self.expression(instr, operands)
+        if instr.result is None or self.unused(instr.result):
+            return ast.Expr(value)
+        return ast.Assign([self.store(instr.result)], value)
+
+    def unused(self, value):
+        return (
+            self.use_count.get(value, 0) == 0
+            and self.class_size.get(self.class_of.get(value, value), 1) == 1
+            and not self._exported(value)
+        )
+
+    def inlinable(self, instr, block):
+        # a value used once, later in the same block, can be evaluated as
+        # part of its user's expression
+        value = instr.result
+        return (
+            isinstance(value, SSAValue)
+            and instr.op not in ("import", "import_from", "param")
+            and self.def_count.get(value) == 1
+            and self.use_count.get(value) == 1
+            and self.use_block.get(value) is block
+            and self.class_size.get(self.class_of.get(value, value), 1) == 1
+            and not self._exported(value)
+        )
+
+    def block_body(self, block):
+        # statements for everything but the terminator, plus the terminator
+        # and its (possibly inlined) operand
+        body = [self.export(value) for value in self.phi_results.get(block.name, ()) if self._exported(value)]
+        stack = []  # (value, expression) not emitted yet, in program order
+
+        def flush():
+            for value, expr in stack:
+                body.append(ast.Assign([self.store(value)], expr))
+            stack.clear()
+
+        def operands_of(instr, order):
+            operands = {}
+            for index in reversed(order):
+                arg = instr.args[index]
+                if isinstance(arg, SSAValue) and stack and stack[-1][0] is arg:
+                    operands[index] = stack.pop()[1]
+                elif isinstance(arg, SSAValue) and any(value is arg for value, _ in stack):
+                    # out of order: everything still pending is emitted first
+                    flush()
+                    break
+                else:
+                    operands[index] = self.operand(arg)
+            for index in order:
+                if index not in operands:
+                    operands[index] = self.operand(instr.args[index])
+            return operands
+
+        terminator = None
+        for instr in block.instructions:
+            op = instr.op
+            if op == "param":
+                continue
+            if op in ("branch", "jump", "return"):
+                terminator = instr
+                break
+            operands = operands_of(instr, _operand_order(op, instr.args))
+            if self.inlinable(instr, block):
+                stack.append((instr.result, self.expression(instr, operands)))
+                continue
+            flush()
+            body.append(self.statement(instr, operands))
+            if self._exported(instr.result):
+                body.append(self.export(instr.result))
+
+        value = None
+        if terminator is not None and terminator.op in ("branch", "return"):
+            value = operands_of(terminator, [0])[0]
+        flush()
+        return body, terminator, value
+
+    def export(self, value):
+        self.exports.append(value.base)
+        return ast.Assign([ast.Name(value.base, ast.Store())], self.load(value))
+
+    # control flow
+
+    def emit(self):
+        try:
+            return _StructuredEmitter(self).emit()
+        except _Unsupported:
+            return self.dispatch_loop()
+
+    def dispatch_loop(self):
+        # every block is one arm of an if chain inside "while True"
+        state = "_ssa_block"
+        index = {block.name: i for i, block in enumerate(self.blocks)}
+
+        def goto(name):
+            return [ast.Assign([ast.Name(state, ast.Store())], ast.Constant(index[name])), ast.Continue()]
+
+        arms = []
+        for i, block in enumerate(self.blocks):
+            body, terminator, value = self.block_body(block)
+            if terminator is None:
+                body += self.fall_off()
+            elif terminator.op == "jump":
+                body += goto(terminator.args[0])
+            elif terminator.op == "branch":
+                body.append(ast.If(value, goto(terminator.args[1]), goto(terminator.args[2])))
+            else:
+                body.append(ast.Return(value))
+            test = ast.Compare(ast.Name(state, ast.Load()), [ast.Eq()], [ast.Constant(i)])
+            arms.append((test, body))
+        chain = []
+        for test, body in reversed(arms):
+            chain = [ast.If(test, body, chain)]
+        return [ast.Assign([ast.Name(state, ast.Store())], ast.Constant(0)), ast.While(ast.Constant(True), chain, [])]
+
+    def fall_off(self):
+        if self.module:
+            return [ast.Return(None)]
+        return [ast.Return(ast.Constant(None))]
+
+
+class _StructuredEmitter:
+    # Emits reducible CFGs as nested if/while statements, following the
+    # dominator tree (Ramsey, "Beyond Relooper"). A loop header becomes
+    # "while True", a back edge "continue" and the edge to the loop's single
+    # exit block "break"; the exit block itself follows the loop. Blocks
+    # with several forward predecessors follow the if statement of their
+    # immediate dominator. Anything else raises _Unsupported.
+    def __init__(self, emitter):
+        self.emitter = emitter
+        cfg = emitter.cfg
+        self.cfg = cfg
+        order = cfg.reverse_postorder()
+        self.rpo = {block: i for i, block in enumerate(order)}
+        self.forward_preds = {}
+        self.loops = {}
+        for block in order:
+            for succ in block.successors:
+                if self.rpo[succ] > self.rpo[block]:
+                    self.forward_preds[succ] = self.forward_preds.get(succ, 0) + 1
+                elif not cfg.dominates(succ, block):
+                    raise _Unsupported("irreducible")
+                else:
+                    self.loops.setdefault(succ, set()).add(block)
+        self.exits = {header: self.loop_exit(header, latches) for header, latches in self.loops.items()}
+
+    def loop_exit(self, header, latches):
+        body = {header}
+        work = list(latches)
+        while work:
+            block = work.pop()
+            if block not in body:
+                body.add(block)
+                work.extend(pred for pred in block.preds if pred in self.rpo)
+        exits = {succ for block in body for succ in block.successors if succ not in body}
+        # a block that only returns can stay inside the loop
+        exits = {block for block in exits if not _returns(block) or len(block.preds) > 1}
+        if len(exits) > 1:
+            raise _Unsupported("loop with several exits")
+        return next(iter(exits), None)
+
+    def emit(self):
+        return self.tree(self.cfg.entry, [], None)
+
+    def merge_children(self, block, skip):
+        children = [
+            child for child in self.cfg.dom_children(block)
+            if self.forward_preds.get(child, 0) >= 2 and child is not skip
+        ]
+        # the latest block in program order is the outermost follower
+        return sorted(children, key=self.rpo.__getitem__, reverse=True)
+
+    def tree(self, block, loops, follow):
+        # code for block and everything it dominates; loops is the stack of
+        # enclosing (header, exit) pairs and follow the block that runs
+        # after this code falls through
+        if block in self.loops:
+            exit = self.exits[block]
+            inner = self.within(block, self.merge_children(block, exit), loops + [(block, exit)], block)
+            code = [ast.While(ast.Constant(True), _tidy_loop_body(inner), [])]
+            if exit is None or exit is follow:
+                return code
+            if not self.cfg.dominates(block, exit):
+                raise _Unsupported(f"exit of the loop at {block.name} is not its follower")
+            return code + self.tree(exit, loops, follow)
+        return self.within(block, self.merge_children(block, None), loops, follow)
+
+    def within(self, block, merges, loops, follow):
+        if merges:
+            outer, rest = merges[0], merges[1:]
+            return self.within(block, rest, loops, outer) + self.tree(outer, loops, follow)
+        body, terminator, value = self.emitter.block_body(block)
+        if terminator is None:
+            if follow is not None:
+                raise _Unsupported("fall through into a block")
+            return body + self.emitter.fall_off()
+        if terminator.op == "return":
+            return body + [ast.Return(value)]
+        if terminator.op == "jump":
+            return body + self.branch(block, self.cfg.get_block(terminator.args[0]), loops, follow)
+        then_code = self.branch(block, self.cfg.get_block(terminator.args[1]), loops, follow) or [ast.Pass()]
+        else_code = self.branch(block, self.cfg.get_block(terminator.args[2]), loops, follow)
+        return body + [ast.If(value, then_code, else_code)]
+
+    def branch(self, src, dst, loops, follow):
+        if self.rpo[dst] <= self.rpo[src]:
+            if loops and loops[-1][0] is dst:
+                return [ast.Continue()]
+            raise _Unsupported("continue to an outer loop")
+        if dst is follow:
+            return []
+        if loops and loops[-1][1] is dst:
+            return [ast.Break()]
+        if self.forward_preds.get(dst, 0) == 1 and self.cfg.idom(dst) is src:
+            return self.tree(dst, loops, follow)
+        raise _Unsupported(f"jump from {src.name} to {dst.name}")
+
+
+def _strip_trailing(body, kind):
+    # drops a final statement of the given kind, also from the arms of a
+    # final if statement, where it is implied by what follows the body
+    if not body:
+        return body
+    last = body[-1]
+    value = getattr(last, "value", None)
+    if isinstance(last, kind) and (value is None or isinstance(value, ast.Constant) and value.value is None):
+        return body[:-1]
+    if isinstance(last, ast.If):
+        last.body = _strip_trailing(last.body, kind) or [ast.Pass()]
+        last.orelse = _strip_trailing(last.orelse, kind)
+    return body
+
+
+def _negate(test):
+    if isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+        return test.operand
+    return ast.UnaryOp(ast.Not(), test)
+
+
+def _tidy_loop_body(body):
+    # "if c: ... else: break" (or return) at the end of a loop body becomes
+    # "if not c: break" followed by the rest of the loop body
+    body = _strip_trailing(body, ast.Continue)
+    last = body[-1] if body else None
+    if isinstance(last, ast.If) and last.orelse and _leaves(last.orelse):
+        rest = [] if _is_pass(last.body) else last.body
+        return body[:-1] + [ast.If(_negate(last.test), last.orelse, [])] + rest
+    if isinstance(last, ast.If) and _leaves(last.body):
+        return body[:-1] + [ast.If(last.test, last.body, [])] + last.orelse
+    return body or [ast.Pass()]
+
+
+def _leaves(body):
+    return isinstance(body[-1], (ast.Break, ast.Return))
+
+
+def _is_pass(body):
+    return len(body) == 1 and isinstance(body[0], ast.Pass)
+
+
+def _prepare(blocks, unit):
+    cfg = ControlFlowGraph.from_blocks(copy_blocks(blocks))
+    _check_phis(cfg, unit)
+    for block in list(cfg.blocks):
+        if not cfg.reachable(block):
+            for succ in list(block.successors):
+                index = succ.preds.index(block)
+                for phi in _phis(succ):
+                    if len(phi.args) == len(succ.preds):
+                        del phi.args[index]
+                cfg.remove_edge(block, succ)
+            cfg.remove_block(block)
+    return cfg
+
+
+def generate_function(blocks, name, unit=None):
+    # ast.FunctionDef for a function unit; parameters are positional
+    cfg = _prepare(blocks, name if unit is None else unit)
+    names, temps = destruct_ssa(cfg)
+    emitter = _FunctionEmitter(cfg, names, temps, module=False)
+    body = _strip_trailing(emitter.emit(), ast.Return)
+    params = [ast.arg(emitter.name_of(value)) for _, value in emitter.params]
+    arguments = ast.arguments(posonlyargs=[], args=params, vararg=None, kwonlyargs=[], kw_defaults=[],
+                              kwarg=None, defaults=[])
+    return ast.fix_missing_locations(ast.FunctionDef(name, arguments, body or [ast.Pass()], [], None))
+
+
+def generate_module(units):
+    # ast.Module for {unit name: blocks}: one def per function unit, then
+    # the module unit inside a function that declares the module variables
+    # global, so its own temporaries stay fast locals
+    body = [ast.parse(_FUNCTION_HELPER_SOURCE).body[0]]
+    for name, blocks in units.items():
+        if name != MODULE_UNIT:
+            body.append(generate_function(blocks, unit_function_name(name), name))
+    if MODULE_UNIT in units:
+        cfg = _prepare(units[MODULE_UNIT], MODULE_UNIT)
+        phi_results = {block.name: [phi.result for phi in _phis(block)] for block in cfg.blocks}
+        names, temps = destruct_ssa(cfg)
+        emitter = _FunctionEmitter(cfg, names, temps, module=True, phi_results=phi_results)
+        code = _strip_trailing(emitter.emit(), ast.Return)
+        if emitter.exports:
+            code.insert(0, ast.Global(sorted(set(emitter.exports))))
+        init = "_ssa_module"
+        arguments = ast.arguments(posonlyargs=[], args=[], vararg=None, kwonlyargs=[], kw_defaults=[],
+                                  kwarg=None, defaults=[])
+        body.append(ast.FunctionDef(init, arguments, code or [ast.Pass()], [], None))
+        body.append(ast.Expr(ast.Call(ast.Name(init, ast.Load()), [], [])))
+    return ast.fix_missing_locations(ast.Module(body, []))
+
+
+_FUNCTION_HELPER_SOURCE = f"""
+def {_FUNCTION_HELPER}(function, name, defaults):
+    function = type(function)(function.__code__, function.__globals__, name, defaults or None)
+    function.__qualname__ = name
+    return function
+"""
+
+
+def module_source(units):
+    return ast.unparse(generate_module(units)) + "\n"
+
+
+def compile_module(units, filename="<ssa>", namespace=None):
+    # runs the generated module and returns its namespace
+    namespace = {"__name__": "__ssa__"} if namespace is None else namespace
+    exec(compile(generate_module(units), filename, "exec"), namespace)
+    return namespace
+
+
+def compile_function(blocks, name="function", namespace=None, defaults=()):
+    # a Python function for one function unit; globals come from namespace
+    tree = ast.fix_missing_locations(ast.Module([generate_function(blocks, name)], []))
+    namespace = {} if namespace is None else namespace
+    scope = {}
+    exec(compile(tree, f"<ssa {name}>", "exec"), namespace, scope)
+    function = scope[name]
+    function.__defaults__ = tuple(defaults) or None
+    return function
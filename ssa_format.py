@@ -0,0 +1,461 @@
+import ast
+import mmap
+import re
+import struct
+import sys
+
+from project2 import SSABlock, SSAInstruction, SSAValue, intern_opcode
+
+# Binary layout (all integers are unsigned LEB128 varints):
+#
+#   magic "SSAIR" + format byte
+#   string table   count, then length + UTF-8 bytes per string
+#   constants      count, then a kind byte (0 float, 1 complex) and the raw
+#                  little-endian doubles per constant
+#   values         count, then fixed-size records of three little-endian
+#                  uint32s: id, base (string index), version
+#   block table    length in bytes, then the block count and per block: name
+#                  (string index), preds and successors (count + block
+#                  indices, in edge order) and the offset and length of the
+#                  block's body
+#   bodies         instruction count, then per instruction: opcode (string
+#                  index), argument count, arguments, result
+#
+# Operands are one varint each, payload << 3 | tag, where a value's payload
+# is the index of its record. The block table and the bodies are nothing but
+# varints, so a whole section is decoded in a single pass over its bytes.
+# Opening a file reads the strings, constants and block table; value records
+# are looked up when first used and bodies are decoded when a block's
+# instructions are.
+MAGIC = b"SSAIR"
+BINARY_FORMAT = 1
+TEXT_HEADER = "ssa-ir 1"
+
+TAG_NONE, TAG_VALUE, TAG_INT, TAG_NEG_INT, TAG_STR, TAG_CONST, TAG_BOOL = range(7)
+_DOUBLE = struct.Struct("<d")
+_COMPLEX = struct.Struct("<dd")
+_VALUE = struct.Struct("<III")
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_varints(buf, start, end):
+    words = []
+    append = words.append
+    n = shift = 0
+    for byte in buf[start:end]:
+        if byte < 0x80:
+            append(n | byte << shift)
+            n = shift = 0
+        else:
+            n |= (byte & 0x7F) << shift
+            shift += 7
+    if shift:
+        raise ValueError("Truncated varint in SSA IR")
+    return words
+
+
+class _Table:
+    # assigns indices to strings or constants in first-use order
+    def __init__(self):
+        self.index = {}
+        self.items = []
+
+    def __call__(self, item):
+        # keyed with the type so that 1.0 and (1+0j) stay apart, and numbers
+        # by repr so that -0.0 and 0.0, which compare equal, do too
+        key = (type(item), item if isinstance(item, str) else repr(item))
+        index = self.index.get(key)
+        if index is None:
+            index = self.index[key] = len(self.items)
+            self.items.append(item)
+        return index
+
+
+def _encode_operand(out, operand, strings, constants, values):
+    if operand is None:
+        out.append(TAG_NONE)
+    elif isinstance(operand, SSAValue):
+        index = values.get(operand)
+        if index is None:
+            index = values[operand] = len(values)
+        _write_varint(out, index << 3 | TAG_VALUE)
+    elif isinstance(operand, bool):
+        out.append(int(operand) << 3 | TAG_BOOL)
+    elif isinstance(operand, int):
+        if operand >= 0:
+            _write_varint(out, operand << 3 | TAG_INT)
+        else:
+            _write_varint(out, (-operand - 1) << 3 | TAG_NEG_INT)
+    elif isinstance(operand, str):
+        _write_varint(out, strings(operand) << 3 | TAG_STR)
+    elif isinstance(operand, (float, complex)):
+        _write_varint(out, constants(operand) << 3 | TAG_CONST)
+    else:
+        raise TypeError(f"Cannot serialize operand of type {type(operand).__name__}")
+
+
+def dumps_binary(blocks):
+    strings = _Table()
+    constants = _Table()
+    values = {}
+    block_index = {block.name: i for i, block in enumerate(blocks)}
+
+    bodies = bytearray()
+    spans = []
+    for block in blocks:
+        start = len(bodies)
+        _write_varint(bodies, len(block.instructions))
+        for instr in block.instructions:
+            _write_varint(bodies, strings(instr.op))
+            _write_varint(bodies, len(instr.args))
+            for arg in instr.args:
+                _encode_operand(bodies, arg, strings, constants, values)
+            _encode_operand(bodies, instr.result, strings, constants, values)
+        spans.append((start, len(bodies) - start))
+
+    records = bytearray()
+    for value in values:
+        records += _VALUE.pack(value.id, strings(value.base), value.version)
+    table = bytearray()
+    _write_varint(table, len(blocks))
+    for block, (start, length) in zip(blocks, spans):
+        _write_varint(table, strings(block.name))
+        for edges in (block.preds, block.successors):
+            _write_varint(table, len(edges))
+            for other in edges:
+                _write_varint(table, block_index[other.name])
+        _write_varint(table, start)
+        _write_varint(table, length)
+
+    # the string table goes first but is only complete once everything
+    # above has been encoded
+    out = bytearray(MAGIC)
+    out.append(BINARY_FORMAT)
+    _write_varint(out, len(strings.items))
+    for text in strings.items:
+        data = text.encode("utf-8", "surrogatepass")
+        _write_varint(out, len(data))
+        out += data
+    _write_varint(out, len(constants.items))
+    for constant in constants.items:
+        if isinstance(constant, complex):
+            out.append(1)
+            out += _COMPLEX.pack(constant.real, constant.imag)
+        else:
+            out.append(0)
+            out += _DOUBLE.pack(constant)
+    _write_varint(out, len(values))
+    out += records
+    _write_varint(out, len(table))
+    out += table
+    out += bodies
+    return bytes(out)
+
+
+def dump_binary(blocks, f):
+    f.write(dumps_binary(blocks))
+
+
+_INSTRUCTIONS = SSABlock.__dict__["instructions"]
+
+
+class LazySSABlock(SSABlock):
+    # A block whose edges are known but whose instructions are decoded from
+    # the reader on first access.
+    __slots__ = ("_reader", "_span")
+
+    @property
+    def instructions(self):
+        if self._reader is not None:
+            reader, self._reader = self._reader, None
+            _INSTRUCTIONS.__set__(self, reader.decode_body(*self._span))
+        return _INSTRUCTIONS.__get__(self)
+
+    @instructions.setter
+    def instructions(self, instructions):
+        self._reader = None
+        _INSTRUCTIONS.__set__(self, instructions)
+
+
+class BinaryIRReader:
+    # Reads the binary format from any buffer (bytes, memoryview, mmap).
+    def __init__(self, buffer):
+        self.buffer = buffer
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not an SSA IR file")
+        if buffer[len(MAGIC)] != BINARY_FORMAT:
+            raise ValueError(f"Unsupported SSA IR format {buffer[len(MAGIC)]}")
+        pos = len(MAGIC) + 1
+
+        count, pos = _read_varint(buffer, pos)
+        self.strings = []
+        for _ in range(count):
+            length, pos = _read_varint(buffer, pos)
+            self.strings.append(sys.intern(bytes(buffer[pos:pos + length]).decode("utf-8", "surrogatepass")))
+            pos += length
+        # opcode numbers for the strings used as opcodes, filled on demand
+        self.opcodes = {}
+
+        count, pos = _read_varint(buffer, pos)
+        self.constants = []
+        for _ in range(count):
+            if buffer[pos] == 1:
+                real, imag = _COMPLEX.unpack_from(buffer, pos + 1)
+                self.constants.append(complex(real, imag))
+                pos += 1 + _COMPLEX.size
+            else:
+                self.constants.append(_DOUBLE.unpack_from(buffer, pos + 1)[0])
+                pos += 1 + _DOUBLE.size
+
+        count, pos = _read_varint(buffer, pos)
+        self.values_offset = pos
+        self.values = [None] * count
+        pos += count * _VALUE.size
+
+        length, pos = _read_varint(buffer, pos)
+        words = iter(_read_varints(buffer, pos, pos + length))
+        bodies = pos + length
+
+        self.blocks = []
+        edges = []
+        for _ in range(next(words)):
+            block = LazySSABlock.__new__(LazySSABlock)
+            block.name = self.strings[next(words)]
+            preds = [next(words) for _ in range(next(words))]
+            successors = [next(words) for _ in range(next(words))]
+            start = bodies + next(words)
+            block._span = (start, start + next(words))
+            block._reader = self
+            self.blocks.append(block)
+            edges.append((preds, successors))
+        for block, (preds, successors) in zip(self.blocks, edges):
+            block.preds = [self.blocks[i] for i in preds]
+            block.successors = [self.blocks[i] for i in successors]
+        self.block_map = {block.name: block for block in self.blocks}
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def __getitem__(self, name):
+        return self.block_map[name]
+
+    def value(self, index):
+        value = self.values[index]
+        if value is None:
+            value_id, base, version = _VALUE.unpack_from(self.buffer, self.values_offset + index * _VALUE.size)
+            value = self.values[index] = SSAValue(value_id, self.strings[base], version)
+        return value
+
+    def decode_body(self, start, end):
+        values = self.values
+        strings = self.strings
+        constants = self.constants
+        opcodes = self.opcodes
+
+        def operand(word):
+            tag = word & 7
+            if tag == TAG_VALUE:
+                return values[word >> 3] or self.value(word >> 3)
+            if tag == TAG_STR:
+                return strings[word >> 3]
+            if tag == TAG_INT:
+                return word >> 3
+            if tag == TAG_NONE:
+                return None
+            if tag == TAG_NEG_INT:
+                return -(word >> 3) - 1
+            if tag == TAG_CONST:
+                return constants[word >> 3]
+            return bool(word >> 3)
+
+        words = _read_varints(self.buffer, start, end)
+        instructions = []
+        pos = 1
+        for _ in range(words[0]):
+            op = words[pos]
+            opcode = opcodes.get(op)
+            if opcode is None:
+                opcode = opcodes[op] = intern_opcode(strings[op])
+            n_args = words[pos + 1]
+            pos += 2
+            args = [operand(word) for word in words[pos:pos + n_args]]
+            pos += n_args
+            instructions.append(SSAInstruction(opcode, args, operand(words[pos])))
+            pos += 1
+        if pos != len(words):
+            raise ValueError("Corrupt SSA IR block")
+        return instructions
+
+    def materialize(self):
+        # every value is needed anyway, so unpack the records in one go
+        strings = self.strings
+        records = self.buffer[self.values_offset:self.values_offset + len(self.values) * _VALUE.size]
+        self.values[:] = [
+            SSAValue(value_id, strings[base], version) if value is None else value
+            for value, (value_id, base, version) in zip(self.values, _VALUE.iter_unpack(records))
+        ]
+        for block in self.blocks:
+            block.instructions
+        return self.blocks
+
+    def close(self):
+        # blocks not materialized yet can no longer be read afterwards
+        close = getattr(self.buffer, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_binary(path):
+    # memory-maps the file; use as a context manager, or call materialize()
+    # before closing if the blocks must outlive the mapping
+    with open(path, "rb") as f:
+        return BinaryIRReader(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def loads_binary(data):
+    return BinaryIRReader(data).materialize()
+
+
+def load_binary(path):
+    with open_binary(path) as reader:
+        return reader.materialize()
+
+
+# Text format: one header line per block listing its edges in order, then
+# one indented line per instruction. Values print as %base_version and every
+# other operand as a Python literal, so the text reads back exactly.
+#
+#   ssa-ir 1
+#   block_1: preds(block_0) succs(block_2, block_3)
+#       %tmp_1 = lt(%x_1, 10)
+#       branch(%tmp_1, 'block_2', 'block_3')
+
+_BLOCK_NAME = re.compile(r"[^\s:(),]+")
+_BLOCK_HEADER = re.compile(r"([^\s:(),]+): preds\(([^)]*)\) succs\(([^)]*)\)$")
+_INSTRUCTION = re.compile(r"(?:%(\w+) = )?(\w+)\((.*)\)$")
+_OPERAND = re.compile(
+    r"""\s*(?:%(\w+)|('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|([^\s,'"]+))\s*(?:,|$)""",
+    re.DOTALL,
+)
+
+
+_NON_FINITE = {"inf": float("inf"), "-inf": float("-inf"), "nan": float("nan")}
+
+
+def _format_operand(operand):
+    if isinstance(operand, SSAValue):
+        return f"%{operand.base}_{operand.version}"
+    return repr(operand)  # inf, nan and complex read back below
+
+
+def iter_text(blocks):
+    yield TEXT_HEADER + "\n"
+    for block in blocks:
+        if not _BLOCK_NAME.fullmatch(block.name):
+            raise ValueError(f"Block name {block.name!r} cannot be written as text")
+        preds = ", ".join(pred.name for pred in block.preds)
+        successors = ", ".join(succ.name for succ in block.successors)
+        yield f"{block.name}: preds({preds}) succs({successors})\n"
+        for instr in block.instructions:
+            args = ", ".join(map(_format_operand, instr.args))
+            if instr.result is None:
+                yield f"    {instr.op}({args})\n"
+            elif isinstance(instr.result, SSAValue):
+                yield f"    {_format_operand(instr.result)} = {instr.op}({args})\n"
+            else:
+                raise TypeError(f"Cannot write result {instr.result!r} as text")
+
+
+def dump_text(blocks, f):
+    f.writelines(iter_text(blocks))
+
+
+def dumps_text(blocks):
+    return "".join(iter_text(blocks))
+
+
+def loads_text(text):
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != TEXT_HEADER:
+        raise ValueError("Not an SSA IR text file")
+    values = {}
+
+    def value(name):
+        result = values.get(name)
+        if result is None:
+            base, _, version = name.rpartition("_")
+            result = values[name] = SSAValue(len(values), sys.intern(base), int(version))
+        return result
+
+    def operand(match):
+        name, string, literal = match.groups()
+        if name is not None:
+            return value(name)
+        if literal in _NON_FINITE:
+            return _NON_FINITE[literal]
+        if literal is not None and literal.rstrip(")").endswith("j"):
+            return complex(literal)  # also (inf+nanj), which is no literal
+        return ast.literal_eval(string if string is not None else literal)
+
+    blocks = []
+    edges = []
+    for number, line in enumerate(lines[1:], 2):
+        if not line.strip():
+            continue
+        if not line.startswith(" "):
+            match = _BLOCK_HEADER.match(line.strip())
+            if match is None:
+                raise ValueError(f"line {number}: expected a block header")
+            blocks.append(SSABlock(match.group(1)))
+            edges.append((match.group(2), match.group(3)))
+            continue
+        match = _INSTRUCTION.match(line.strip())
+        if match is None or not blocks:
+            raise ValueError(f"line {number}: expected an instruction")
+        result, op, args_text = match.groups()
+        args = []
+        pos = 0
+        while pos < len(args_text):
+            arg = _OPERAND.match(args_text, pos)
+            if arg is None or arg.end() == pos:
+                raise ValueError(f"line {number}: bad operand at {args_text[pos:]!r}")
+            args.append(operand(arg))
+            pos = arg.end()
+        blocks[-1].instructions.append(SSAInstruction(op, args, value(result) if result else None))
+
+    block_map = {block.name: block for block in blocks}
+    for block, (preds, successors) in zip(blocks, edges):
+        block.preds = [block_map[name.strip()] for name in preds.split(",") if name.strip()]
+        block.successors = [block_map[name.strip()] for name in successors.split(",") if name.strip()]
+    return blocks
+
+
+def load_text(path):
+    with open(path, encoding="utf-8") as f:
+        return loads_text(f.read())
@@ -0,0 +1,406 @@
+import ast
+import builtins
+import copy
+import importlib
+import inspect
+import operator
+from functools import partial
+
+from project2 import BINARY_OPERATORS, MODULE_UNIT, UNARY_OPERATORS, SSAValue
+
+# Register-based interpreter for the SSA IR. Every unit is decoded once into
+# a list of blocks whose instructions are flat tuples over integer register
+# slots: SSA values and literal operands alike live in one list, so running
+# an instruction is a tuple unpack, a few list indexings and one call, with
+# no dictionary lookups. Phis are not executed as instructions; each edge
+# carries the parallel copy that the phis of its target block perform when
+# entered from that predecessor.
+
+# instruction kinds, most frequent first
+_BINARY = 0  # regs[dst] = fn(regs[a], regs[b])
+_COPY = 1  # regs[dst] = regs[a]
+_UNARY = 2  # regs[dst] = fn(regs[a])
+_CALL = 3  # regs[dst] = fn(*regs[args]), dst may be None
+_EXPORT = 4  # globals[name] = regs[a], module units only
+
+# terminator kinds
+_JUMP = 0  # (kind, target, dsts, srcs)
+_BRANCH = 1  # (kind, cond, then target, dsts, srcs, else target, dsts, srcs)
+_RETURN = 2  # (kind, slot)
+
+# converter temporaries, which are not exported as module variables
+TEMPORARY_BASES = {"tmp", "loop_cond", "loop_value", "range_index", "index", "length"}
+
+
+def _call(func, *args):
+    return func(*args)
+
+
+def _call_kw(func, n_positional, *args):
+    keywords = args[n_positional:]
+    return func(*args[:n_positional], **dict(zip(keywords[::2], keywords[1::2])))
+
+
+def _import_from(module, name):
+    try:
+        return getattr(importlib.import_module(module), name)
+    except AttributeError:
+        return importlib.import_module(f"{module}.{name}")
+
+
+def _build_list(*elements):
+    return list(elements)
+
+
+def _build_tuple(*elements):
+    return elements
+
+
+# op -> (kind, function); ops missing here are handled in decode_instruction
+_OPS = {
+    **{op: (_BINARY, fn) for op, fn in BINARY_OPERATORS.items()},
+    **{op: (_UNARY, fn) for op, fn in UNARY_OPERATORS.items()},
+    "assign": (_COPY, None),
+    "get_element": (_BINARY, operator.getitem),
+    "getattr": (_BINARY, getattr),
+    "length": (_UNARY, len),
+    "store_element": (_CALL, operator.setitem),
+    "setattr": (_CALL, setattr),
+    "build_list": (_CALL, _build_list),
+    "build_tuple": (_CALL, _build_tuple),
+    "build_slice": (_CALL, slice),
+    "call": (_CALL, _call),
+    "call_kw": (_CALL, _call_kw),
+    "import": (_CALL, importlib.import_module),
+    "import_from": (_CALL, _import_from),
+}
+
+# operand positions holding a bare name rather than Python source text
+_NAME_OPERANDS = {
+    "getattr": (1,),
+    "setattr": (1,),
+    "global": (0,),
+    "function": (0,),
+    "import": (0,),
+    "import_from": (0, 1),
+}
+
+
+def literal_value(operand):
+    # Numbers, booleans and None are stored as themselves; other literals are
+    # kept as source text by the converters ('"abc"', '[1, 2]', 'range(3)'),
+    # with strings escaped so that they read back like the text format's.
+    if not isinstance(operand, str):
+        return operand
+    try:
+        return ast.literal_eval(operand)
+    except (ValueError, SyntaxError):
+        pass
+    try:
+        node = ast.parse(operand, mode="eval").body
+    except SyntaxError:
+        node = None
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range":
+        return range(*(ast.literal_eval(arg) for arg in node.args))
+    raise ValueError(f"Unsupported literal operand: {operand!r}")
+
+
+class CompiledUnit:
+    # Decoded form of one unit: blocks[i] is (body, size, terminator) and
+    # initial is the register file with every literal already in place.
+    # param_names are the parameter names in order, for keyword arguments.
+    __slots__ = ("name", "blocks", "initial", "params", "param_names", "slots", "static_count")
+
+    def __init__(self, name, blocks, initial, params, param_names, slots, static_count):
+        self.name = name
+        self.blocks = blocks
+        self.initial = initial
+        self.params = params
+        self.param_names = param_names
+        self.slots = slots
+        self.static_count = static_count
+
+
+class _Decoder:
+    def __init__(self, interpreter, name, export):
+        self.interpreter = interpreter
+        self.name = name
+        self.export = export
+        self.registers = [None]
+        self.slots = {}
+        self.literals = {(type(None), None): 0}
+
+    def value_slot(self, value):
+        slot = self.slots.get(value)
+        if slot is None:
+            slot = self.slots[value] = len(self.registers)
+            self.registers.append(None)
+        return slot
+
+    def literal_slot(self, value):
+        key = (type(value), value)
+        try:
+            slot = self.literals.get(key)
+        except TypeError:  # unhashable (list literal), one slot per use
+            key, slot = None, None
+        if slot is None:
+            slot = len(self.registers)
+            self.registers.append(value)
+            if key is not None:
+                self.literals[key] = slot
+        return slot
+
+    def operand_slot(self, operand, name=False):
+        if isinstance(operand, SSAValue):
+            return self.value_slot(operand)
+        return self.literal_slot(operand if name else literal_value(operand))
+
+    def decode(self, blocks):
+        index = {block.name: i for i, block in enumerate(blocks)}
+        # phi operands follow the order of block.preds
+        preds = [[index[pred.name] for pred in block.preds] for block in blocks]
+        phis = [[instr for instr in block.instructions if instr.op == "phi"] for block in blocks]
+        for i, block in enumerate(blocks):
+            for phi in phis[i]:
+                if len(phi.args) != len(preds[i]):
+                    raise ValueError(
+                        f"{self.name}: phi {phi!r} in {block.name} has {len(phi.args)} operands "
+                        f"for {len(preds[i])} predecessors"
+                    )
+
+        def edge(src, dst_name, occurrence=0):
+            # parallel copy done when src branches to dst; a branch with both
+            # arms on one block uses two entries of its preds
+            dst = index[dst_name]
+            pred_index = [p for p, pred in enumerate(preds[dst]) if pred == src]
+            if len(pred_index) <= occurrence:
+                raise ValueError(f"{self.name}: {blocks[src].name} -> {dst_name} is not in the CFG")
+            dsts = tuple(self.value_slot(phi.result) for phi in phis[dst])
+            srcs = tuple(self.operand_slot(phi.args[pred_index[occurrence]]) for phi in phis[dst])
+            return dst, dsts, srcs
+
+        decoded = []
+        params = []
+        param_names = {}
+        static_count = 0
+        for i, block in enumerate(blocks):
+            body = []
+            if self.export:
+                for phi in phis[i]:
+                    self.export_value(body, phi.result)
+            terminator = (_RETURN, 0)  # falling off the end returns None
+            for instr in block.instructions:
+                op = instr.op
+                if op == "phi":
+                    continue
+                if op == "jump":
+                    terminator = (_JUMP,) + edge(i, instr.args[0])
+                    break
+                if op == "branch":
+                    cond = self.operand_slot(instr.args[0])
+                    then_edge = edge(i, instr.args[1])
+                    else_edge = edge(i, instr.args[2], int(instr.args[1] == instr.args[2]))
+                    terminator = (_BRANCH, cond) + then_edge + else_edge
+                    break
+                if op == "return":
+                    terminator = (_RETURN, self.use_slot(body, instr.args[0]))
+                    break
+                if op == "param":
+                    params.append((instr.args[0], self.value_slot(instr.result)))
+                    param_names[instr.args[0]] = instr.result.base
+                else:
+                    self.decode_instruction(body, instr)
+                    if self.export:
+                        self.export_value(body, instr.result)
+            size = len(block.instructions)
+            static_count += size
+            decoded.append((tuple(body), size, terminator))
+        param_names = tuple(param_names[index] for index in sorted(param_names))
+        return CompiledUnit(self.name, decoded, self.registers, params, param_names, self.slots, static_count)
+
+    def export_value(self, body, value):
+        # module variables are copied to globals whenever they are written
+        if isinstance(value, SSAValue) and value.base.isidentifier() and value.base not in TEMPORARY_BASES:
+            body.append((_EXPORT, None, value.base, self.value_slot(value), None))
+
+    def use_slot(self, body, operand, name=False):
+        # a list, dict or set literal is a new object every time it is
+        # evaluated, so it is copied into a slot of its own right before use
+        if name or isinstance(operand, SSAValue):
+            return self.operand_slot(operand, name)
+        value = literal_value(operand)
+        if not isinstance(value, (list, dict, set)):
+            return self.literal_slot(value)
+        slot = len(self.registers)
+        self.registers.append(None)
+        body.append((_CALL, slot, partial(copy.deepcopy, value), (), None))
+        return slot
+
+    def decode_instruction(self, body, instr):
+        op = instr.op
+        args = instr.args
+        dst = None if instr.result is None else self.value_slot(instr.result)
+        names = _NAME_OPERANDS.get(op, ())
+        if op == "call_kw":
+            names = range(args[1] + 2, len(args), 2)  # keyword names
+        slots = tuple(self.use_slot(body, arg, i in names) for i, arg in enumerate(args))
+
+        if op == "global":
+            decoded = (_CALL, dst, partial(self.interpreter.load_global, args[0]), (), None)
+        elif op == "function":
+            function = partial(self.interpreter.make_function, args[0])
+            decoded = (_CALL, dst, function, slots[1:], None)
+        elif op in _OPS:
+            kind, fn = _OPS[op]
+            if kind == _BINARY:
+                decoded = (_BINARY, dst, fn, slots[0], slots[1])
+            elif kind == _UNARY:
+                decoded = (_UNARY, dst, fn, slots[0], None)
+            elif kind == _COPY:
+                decoded = (_COPY, dst, None, slots[0], None)
+            else:
+                decoded = (_CALL, dst, fn, slots, None)
+        else:
+            raise ValueError(f"{self.name}: unsupported operation {op!r}")
+        body.append(decoded)
+
+
+class SSAFunction:
+    # A function unit bound to an interpreter; calling it runs the unit.
+    def __init__(self, interpreter, name, defaults=()):
+        self.interpreter = interpreter
+        self.name = name
+        self.defaults = tuple(defaults)
+        self.signature = None
+
+    def __call__(self, *args, **kwargs):
+        code = self.interpreter.compile(self.name)
+        if kwargs:
+            args = self.bind(code, args, kwargs)
+        missing = len(code.params) - len(args)
+        if missing > 0 and missing <= len(self.defaults):
+            args += self.defaults[len(self.defaults) - missing:]
+        return self.interpreter.execute(code, args)
+
+    def bind(self, code, args, kwargs):
+        # positional arguments for args and kwargs, matched to the parameter
+        # names and defaults as Python matches them
+        if self.signature is None:
+            first_default = len(code.param_names) - len(self.defaults)
+            self.signature = inspect.Signature([
+                inspect.Parameter(
+                    name,
+                    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                    default=self.defaults[index - first_default] if index >= first_default else inspect.Parameter.empty,
+                )
+                for index, name in enumerate(code.param_names)
+            ])
+        try:
+            bound = self.signature.bind(*args, **kwargs)
+        except TypeError as error:
+            raise TypeError(f"{self.name}() {error}") from None
+        bound.apply_defaults()
+        return bound.args
+
+    def __repr__(self):
+        return f"<SSAFunction {self.name}>"
+
+
+class Interpreter:
+    # Runs the units of one module (as returned by build_units, or a single
+    # list of blocks for the module unit). Module variables, including the
+    # functions it defines, end up in self.globals; names missing there are
+    # looked up in builtins. instructions_executed counts IR instructions,
+    # phis and terminators included.
+    def __init__(self, units, globals=None):
+        self.units = dict(units) if isinstance(units, dict) else {MODULE_UNIT: list(units)}
+        self.globals = {} if globals is None else globals
+        self.compiled = {}
+        self.instructions_executed = 0
+        self.blocks_executed = 0
+
+    def compile(self, name):
+        code = self.compiled.get(name)
+        if code is None:
+            decoder = _Decoder(self, name, export=name == MODULE_UNIT)
+            code = self.compiled[name] = decoder.decode(self.units[name])
+        return code
+
+    def run(self):
+        # executes the module unit and returns the module's variables
+        self.execute(self.compile(MODULE_UNIT), ())
+        return self.globals
+
+    def call(self, name, *args):
+        return SSAFunction(self, name)(*args)
+
+    def load_global(self, name):
+        try:
+            return self.globals[name]
+        except KeyError:
+            pass
+        try:
+            return getattr(builtins, name)
+        except AttributeError:
+            raise NameError(f"name {name!r} is not defined") from None
+
+    def make_function(self, name, *defaults):
+        return SSAFunction(self, name, defaults)
+
+    def execute(self, code, args):
+        if len(args) != len(code.params):
+            raise TypeError(f"{code.name}() takes {len(code.params)} arguments ({len(args)} given)")
+        regs = list(code.initial)
+        for index, slot in code.params:
+            regs[slot] = args[index]
+        return self._loop(code.blocks, regs)
+
+    def _loop(self, blocks, regs):
+        module_globals = self.globals
+        executed = 0
+        count = 0
+        body, size, terminator = blocks[0]
+        try:
+            while True:
+                executed += size
+                count += 1
+                for kind, dst, fn, a, b in body:
+                    if kind == _BINARY:
+                        regs[dst] = fn(regs[a], regs[b])
+                    elif kind == _COPY:
+                        regs[dst] = regs[a]
+                    elif kind == _UNARY:
+                        regs[dst] = fn(regs[a])
+                    elif kind == _CALL:
+                        value = fn(*[regs[slot] for slot in a])
+                        if dst is not None:
+                            regs[dst] = value
+                    else:
+                        module_globals[fn] = regs[a]
+
+                kind = terminator[0]
+                if kind == _JUMP:
+                    _, target, dsts, srcs = terminator
+                elif kind == _BRANCH:
+                    if regs[terminator[1]]:
+                        target, dsts, srcs = terminator[2:5]
+                    else:
+                        target, dsts, srcs = terminator[5:8]
+                else:
+                    return regs[terminator[1]]
+                if dsts:
+                    if len(dsts) == 1:
+                        regs[dsts[0]] = regs[srcs[0]]
+                    else:
+                        values = [regs[slot] for slot in srcs]
+                        for slot, value in zip(dsts, values):
+                            regs[slot] = value
+                body, size, terminator = blocks[target]
+        finally:
+            self.instructions_executed += executed
+            self.blocks_executed += count
+
+
+def run_module(units, globals=None):
+    # runs a module and returns its variables
+    return Interpreter(units, globals).run()
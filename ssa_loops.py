@@ -0,0 +1,511 @@
+from project2 import SSABlock, SSAInstruction, SSAValue
+from ssa_passes import count_definitions, fold_operation, get_terminator, live_instructions, phi_instructions
+from ssa_types import INT, infer_types
+
+# Loop analyses over the SSA CFG: natural loops, induction variables and
+# trip counts, plus the two classic transformations built on them.
+#
+# A natural loop is found from a back edge latch -> header (header
+# dominates latch); its blocks are the header plus everything that reaches
+# the latch without passing the header. Back edges sharing a header form
+# one loop.
+#
+# A basic induction variable is a header phi that enters the loop with an
+# integer start and is stepped by a loop-invariant integer on every back
+# edge (i = phi(start, i + step)). A derived one is an add, sub, mult,
+# usub or assign of an induction variable and an invariant integer, so it
+# is linear in its basic variable. Only values that are integers on every
+# path qualify: strength reduction replaces a product by a running sum,
+# which is exact for ints but not for floats.
+#
+# strength_reduction gives every derived variable computed by a
+# multiplication its own header phi stepped by an add, turns the
+# multiplication into a copy of that phi, and then replaces the loop test
+# on the basic variable with a test on a reduced variable when the basic
+# variable is used for nothing else (linear function test replacement).
+# The basic variable's phi and increment are left for dead_code_elimination.
+
+# the comparison that holds after swapping its operands / after negating a
+# positive scale
+_MIRRORED = {"lt": "gt", "lte": "gte", "gt": "lt", "gte": "lte"}
+_NEGATED = {"lt": "gte", "lte": "gt", "gt": "lte", "gte": "lt"}
+
+
+def is_integer_literal(operand):
+    return isinstance(operand, int)
+
+
+def integer_values(cfg):
+    # Values that are ints on every path, by ssa_types.infer_types. Values
+    # defined more than once are left out: their type may differ between
+    # the points they are read at.
+    multiple = {value for value, count in count_definitions(cfg.blocks).items() if count > 1}
+    return {value for value, type_ in infer_types(cfg).items() if type_ == INT and value not in multiple}
+
+
+def literal_values(cfg):
+    # {value: literal} for the values that are copies of a literal
+    multiple = {value for value, count in count_definitions(cfg.blocks).items() if count > 1}
+    return {
+        instr.result: instr.args[0]
+        for block in cfg.blocks
+        for instr in block.instructions
+        if instr.op == "assign" and not isinstance(instr.args[0], SSAValue) and instr.result not in multiple
+    }
+
+
+def fresh_names(cfg):
+    # Returns (new_value(base), new_block_name()) that never clash with the
+    # values and blocks already in cfg.
+    values = [instr.result for block in cfg.blocks for instr in block.instructions if instr.result is not None]
+    versions = {}
+    for value in values:
+        versions[value.base] = max(versions.get(value.base, 0), value.version)
+    next_id = [max((value.id for value in values), default=0) + 1]
+    names = {block.name for block in cfg.blocks}
+
+    def new_value(base):
+        versions[base] = versions.get(base, 0) + 1
+        value = SSAValue(next_id[0], base, versions[base])
+        next_id[0] += 1
+        return value
+
+    def new_block_name():
+        index = len(names)
+        while f"block_{index}" in names:
+            index += 1
+        names.add(f"block_{index}")
+        return f"block_{index}"
+
+    return new_value, new_block_name
+
+
+class NaturalLoop:
+    def __init__(self, header, latches, blocks):
+        self.header = header
+        self.latches = latches
+        self.blocks = blocks  # in cfg order, header included
+        self.block_set = set(blocks)
+        self.defined = {instr.result for block in blocks for instr in block.instructions if instr.result}
+        self.parent = None
+        self.children = []
+
+    def __contains__(self, block):
+        return block in self.block_set
+
+    def __repr__(self):
+        return f"NaturalLoop({self.header.name}, {[block.name for block in self.blocks]})"
+
+    @property
+    def depth(self):
+        depth = 1
+        loop = self.parent
+        while loop is not None:
+            depth += 1
+            loop = loop.parent
+        return depth
+
+    @property
+    def entries(self):
+        # indices into header.preds of the edges entering from outside
+        return [i for i, pred in enumerate(self.header.preds) if pred not in self.block_set]
+
+    @property
+    def preheader(self):
+        # the single block outside the loop that enters it, if it enters
+        # nothing else (ensure_preheader makes one)
+        entries = self.entries
+        if len(entries) != 1 or self.header.preds[entries[0]].successors != [self.header]:
+            return None
+        return self.header.preds[entries[0]]
+
+    @property
+    def exits(self):
+        # (block in the loop, block outside) edges
+        return [(block, succ) for block in self.blocks for succ in block.successors if succ not in self.block_set]
+
+    def defines(self, value):
+        return value in self.defined
+
+
+def find_loops(cfg):
+    # Natural loops of cfg, outer loops before the loops they contain.
+    latches = {}
+    for block in cfg.reverse_postorder():
+        for succ in block.successors:
+            if cfg.dominates(succ, block):
+                latches.setdefault(succ, []).append(block)
+    loops = []
+    for header in cfg.reverse_postorder():
+        if header not in latches:
+            continue
+        body = {header}
+        worklist = [latch for latch in latches[header] if latch is not header]
+        while worklist:
+            block = worklist.pop()
+            if block not in body:
+                body.add(block)
+                worklist.extend(pred for pred in block.preds if cfg.reachable(pred))
+        loop = NaturalLoop(header, latches[header], [block for block in cfg.blocks if block in body])
+        # headers come in reverse postorder, so enclosing loops are known
+        for outer in reversed(loops):
+            if header in outer:
+                loop.parent = outer
+                outer.children.append(loop)
+                break
+        loops.append(loop)
+    return loops
+
+
+def ensure_preheader(cfg, loop, new_value, new_block_name):
+    # Returns loop's preheader, first moving the entering edges onto a new
+    # block when there is none. Entering phi operands that differ become
+    # phis of the new block. The new block joins the enclosing loops.
+    preheader = loop.preheader
+    if preheader is not None:
+        return preheader
+    header = loop.header
+    entries = loop.entries
+    preds = [header.preds[i] for i in entries]
+    if not preds or len(set(preds)) != len(preds) or any(pred.successors.count(header) != 1 for pred in preds):
+        return None
+    preheader = SSABlock(new_block_name())
+    for phi in phi_instructions(header):
+        incoming = [phi.args[i] for i in entries]
+        if all(arg is incoming[0] or (not isinstance(arg, SSAValue) and arg == incoming[0]) for arg in incoming):
+            merged = incoming[0]
+        else:
+            merged = new_value(phi.result.base)
+            preheader.instructions.append(SSAInstruction("phi", incoming, merged))
+        phi.args = [arg for i, arg in enumerate(phi.args) if i not in entries]
+        phi.args.insert(entries[0], merged)
+    preheader.instructions.append(SSAInstruction("jump", [header.name], None))
+    for pred in preds:
+        terminator = get_terminator(pred)
+        terminator.args = [
+            preheader.name if (i > 0 and arg == header.name) or terminator.op == "jump" else arg
+            for i, arg in enumerate(terminator.args)
+        ]
+        pred.successors[pred.successors.index(header)] = preheader
+    header.preds = [pred for pred in header.preds if pred not in preds]
+    header.preds.insert(entries[0], preheader)
+    preheader.preds = preds
+    preheader.successors = [header]
+    cfg.add_block(preheader)
+    outer = loop.parent
+    while outer is not None:
+        outer.blocks.append(preheader)
+        outer.block_set.add(preheader)
+        outer.defined.update(instr.result for instr in preheader.instructions if instr.result)
+        outer = outer.parent
+    return preheader
+
+
+class InductionVariable:
+    # value == scale * basic + offset on every iteration. Basic variables
+    # have start, step and the update instruction feeding the back edges;
+    # derived ones the instruction that computes them from source (another
+    # induction variable) and an invariant operand. op and args keep that
+    # computation after strength reduction rewrites the instruction.
+    def __init__(self, value, basic, scale, start=None, step=None, update=None, instr=None, source=None):
+        self.value = value
+        self.basic = basic
+        self.scale = scale  # int, or None when it is not a literal
+        self.start = start
+        self.step = step
+        self.update = update
+        self.instr = instr
+        self.source = source
+        self.op = instr.op if instr is not None else None
+        self.args = list(instr.args) if instr is not None else None
+
+    @property
+    def is_basic(self):
+        return self.instr is None
+
+    def __repr__(self):
+        if self.is_basic:
+            return f"InductionVariable({self.value}, start={self.start}, step={self.step})"
+        return f"InductionVariable({self.value} = {self.op}{tuple(self.args)}, scale={self.scale})"
+
+
+def _invariant(loop, operand, integers):
+    # an int literal, or an int value defined outside the loop
+    if isinstance(operand, SSAValue):
+        return operand in integers and not loop.defines(operand)
+    return is_integer_literal(operand)
+
+
+def _step_of(loop, phi, update, integers):
+    # step when update is phi + c, c + phi or phi - c with c invariant
+    if update is None or len(update.args) != 2:
+        return None
+    a, b = update.args
+    if update.op == "add" and a is phi.result and _invariant(loop, b, integers):
+        return b
+    if update.op == "add" and b is phi.result and _invariant(loop, a, integers):
+        return a
+    if update.op == "sub" and a is phi.result and _invariant(loop, b, integers):
+        return -b if is_integer_literal(b) else None
+    return None
+
+
+def induction_variables(cfg, loop, integers=None):
+    # {value: InductionVariable} for the basic and derived induction
+    # variables of loop. A basic variable must enter the loop with the same
+    # start on every entering edge.
+    entries = loop.entries
+    if not entries:
+        return {}
+    if integers is None:
+        integers = integer_values(cfg)
+    definitions = {instr.result: instr for block in loop.blocks for instr in block.instructions if instr.result}
+    ivs = {}
+    for phi in phi_instructions(loop.header):
+        if phi.result not in integers or len(phi.args) != len(loop.header.preds):
+            continue
+        starts = [phi.args[i] for i in entries]
+        if any(start is not starts[0] and (isinstance(start, SSAValue) or start != starts[0]) for start in starts):
+            continue
+        updates = {arg for i, arg in enumerate(phi.args) if i not in entries}
+        if len(updates) != 1:
+            continue
+        update = definitions.get(next(iter(updates)))
+        while update is not None and update.op == "assign" and isinstance(update.args[0], SSAValue):
+            update = definitions.get(update.args[0])
+        step = _step_of(loop, phi, update, integers)
+        if step is not None:
+            ivs[phi.result] = InductionVariable(phi.result, phi.result, 1, starts[0], step, update)
+
+    # derived variables; reverse postorder sees a definition before its uses
+    order = [block for block in cfg.reverse_postorder() if block in loop]
+    for block in order:
+        for instr in block.instructions:
+            if instr.result is None or instr.result in ivs or instr.result not in integers:
+                continue
+            derived = _derive(loop, instr, ivs, integers)
+            if derived is not None:
+                ivs[instr.result] = derived
+    return ivs
+
+
+def _derive(loop, instr, ivs, integers):
+    args = instr.args
+    if instr.op in ("assign", "usub") and len(args) == 1 and args[0] in ivs:
+        source = ivs[args[0]]
+        scale = source.scale if instr.op == "assign" or source.scale is None else -source.scale
+        return InductionVariable(instr.result, source.basic, scale, instr=instr, source=source)
+    if instr.op not in ("add", "sub", "mult") or len(args) != 2:
+        return None
+    a, b = args
+    if isinstance(a, SSAValue) and a in ivs and _invariant(loop, b, integers):
+        source, other, first = ivs[a], b, True
+    elif isinstance(b, SSAValue) and b in ivs and _invariant(loop, a, integers):
+        source, other, first = ivs[b], a, False
+    else:
+        return None
+    scale = source.scale
+    if scale is not None:
+        if instr.op == "mult":
+            scale = scale * other if is_integer_literal(other) else None
+        elif instr.op == "sub" and not first:
+            scale = -scale
+    return InductionVariable(instr.result, source.basic, scale, instr=instr, source=source)
+
+
+def loop_test(cfg, loop, ivs):
+    # (compare instruction, op, basic variable, bound) for a loop left only
+    # from its header, whose branch stays in the loop while
+    # "basic op bound" holds
+    if any(block is not loop.header for block, _ in loop.exits):
+        return None
+    branch = get_terminator(loop.header)
+    if branch is None or branch.op != "branch":
+        return None
+    compare = next((instr for instr in loop.header.instructions if instr.result is branch.args[0]), None)
+    if compare is None or compare.op not in _MIRRORED:
+        return None
+    a, b = compare.args
+    if isinstance(a, SSAValue) and a in ivs and ivs[a].is_basic:
+        op, basic, bound = compare.op, a, b
+    elif isinstance(b, SSAValue) and b in ivs and ivs[b].is_basic:
+        op, basic, bound = _MIRRORED[compare.op], b, a
+    else:
+        return None
+    inside = cfg.get_block(branch.args[1]) in loop
+    if inside == (cfg.get_block(branch.args[2]) in loop):
+        return None
+    if not inside:
+        op = _NEGATED[op]
+    return compare, op, basic, bound
+
+
+def trip_count(cfg, loop, ivs=None):
+    # Number of times the loop body runs when that is a constant: the loop
+    # is left only by its header test, which compares a basic induction
+    # variable with literal start and step to a literal bound. None
+    # otherwise.
+    if ivs is None:
+        ivs = induction_variables(cfg, loop)
+    test = loop_test(cfg, loop, ivs)
+    if test is None:
+        return None
+    _, op, basic, bound = test
+    constants = literal_values(cfg)
+    start, step, bound = (constants.get(x, x) for x in (ivs[basic].start, ivs[basic].step, bound))
+    if not all(is_integer_literal(x) for x in (start, step, bound)):
+        return None
+    if op == "lt" and step > 0:
+        return max(0, -((start - bound) // step))
+    if op == "lte" and step > 0:
+        return max(0, (bound - start) // step + 1)
+    if op == "gt" and step < 0:
+        return max(0, -((bound - start) // -step))
+    if op == "gte" and step < 0:
+        return max(0, (start - bound) // -step + 1)
+    return None
+
+
+class _Reducer:
+    def __init__(self, cfg, loop, ivs, integers, new_value):
+        self.cfg = cfg
+        self.loop = loop
+        self.ivs = ivs
+        self.integers = integers
+        self.new_value = new_value
+        self.preheader = loop.preheader
+        self.values = {}  # (iv, at) -> value of iv with its basic variable at "at"
+        self.steps = {}
+
+    def emit(self, op, args):
+        # op on invariant operands, folded or computed in the preheader
+        if op == "assign":
+            return args[0]
+        folded, value = fold_operation(op, args)
+        if folded:
+            return value
+        result = self.new_value("iv")
+        terminator = get_terminator(self.preheader)
+        index = self.preheader.instructions.index(terminator)
+        self.preheader.instructions.insert(index, SSAInstruction(op, list(args), result))
+        return result
+
+    def value_at(self, iv, at):
+        # iv's value when its basic variable equals at
+        if iv.is_basic:
+            return at
+        key = (iv.value, at if isinstance(at, SSAValue) else ("literal", at))
+        if key not in self.values:
+            inner = self.value_at(iv.source, at)
+            args = [inner if arg is iv.source.value else arg for arg in iv.args]
+            self.values[key] = self.emit(iv.op, args)
+        return self.values[key]
+
+    def step(self, iv):
+        # the amount iv changes by per iteration
+        if iv.is_basic:
+            return iv.step
+        if iv.value not in self.steps:
+            step = self.step(iv.source)
+            op, args = iv.op, iv.args
+            if op == "mult":
+                other = args[1] if args[0] is iv.source.value else args[0]
+                step = self.emit("mult", [step, other])
+            elif op == "usub" or (op == "sub" and args[1] is iv.source.value):
+                step = self.emit("usub", [step])
+            self.steps[iv.value] = step
+        return self.steps[iv.value]
+
+    def reduce(self, iv):
+        # iv gets a header phi stepped on every back edge; its instruction
+        # becomes a copy of the phi
+        header = self.loop.header
+        start = self.ivs[iv.basic].start
+        init = self.value_at(iv, start)
+        step = self.step(iv)
+        phi_value = self.new_value(iv.value.base)
+        args = []
+        for pred in header.preds:
+            if pred is self.preheader:
+                args.append(init)
+                continue
+            stepped = self.new_value(iv.value.base)
+            terminator = get_terminator(pred)
+            pred.instructions.insert(
+                pred.instructions.index(terminator), SSAInstruction("add", [phi_value, step], stepped)
+            )
+            args.append(stepped)
+        phis = list(phi_instructions(header))
+        header.instructions.insert(len(phis), SSAInstruction("phi", args, phi_value))
+        iv.instr.op = "assign"
+        iv.instr.args = [phi_value]
+        return phi_value
+
+    def replace_test(self, reduced, live_uses):
+        # lftr: "i op bound" becomes "t op' value_at(t, bound)" for a reduced
+        # t = scale * i + offset with a literal, non-zero scale
+        test = loop_test(self.cfg, self.loop, self.ivs)
+        if test is None:
+            return False
+        compare, op, basic, bound = test
+        if not _invariant(self.loop, bound, self.integers):
+            return False
+        candidates = [(iv, phi) for iv, phi in reduced if iv.basic is basic and iv.scale]
+        if not candidates:
+            return False
+        # the basic variable may only feed its own update and the test
+        update = self.ivs[basic].update
+        if any(user is not update and user is not compare for user in live_uses.get(basic, ())):
+            return False
+        phi = next(phi for phi in phi_instructions(self.loop.header) if phi.result is basic)
+        if any(user is not phi for user in live_uses.get(update.result, ())):
+            return False
+        iv, phi = candidates[0]
+        if iv.scale < 0:
+            op = _MIRRORED[op]
+        branch = get_terminator(self.loop.header)
+        inside = self.cfg.get_block(branch.args[1]) in self.loop
+        compare.op = op if inside else _NEGATED[op]
+        compare.args = [phi, self.value_at(iv, bound)]
+        return True
+
+
+def _live_uses(cfg):
+    # value -> instructions using it that are not dead themselves
+    live = live_instructions(cfg)
+    uses = {}
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            if id(instr) in live:
+                for arg in instr.args:
+                    if isinstance(arg, SSAValue):
+                        uses.setdefault(arg, []).append(instr)
+    return uses
+
+
+def strength_reduction(cfg):
+    # Reduces the multiplications that compute derived induction variables
+    # to additions and replaces loop tests on basic variables that are no
+    # longer needed (see the module comment). Innermost loops go first.
+    # Returns the number of instructions rewritten.
+    integers = integer_values(cfg)
+    new_value, new_block_name = fresh_names(cfg)
+    count = 0
+    for loop in reversed(find_loops(cfg)):
+        ivs = induction_variables(cfg, loop, integers)
+        if not any(not iv.is_basic and iv.op == "mult" for iv in ivs.values()):
+            continue
+        preheader = ensure_preheader(cfg, loop, new_value, new_block_name)
+        if preheader is None or get_terminator(preheader) is None:
+            continue
+        reducer = _Reducer(cfg, loop, ivs, integers, new_value)
+        reduced = []
+        for iv in list(ivs.values()):
+            if not iv.is_basic and iv.op == "mult":
+                phi = reducer.reduce(iv)
+                integers.add(phi)
+                reduced.append((iv, phi))
+        count += len(reduced)
+        if reduced and reducer.replace_test(reduced, _live_uses(cfg)):
+            count += 1
+    return count
@@ -0,0 +1,544 @@
+from project2 import (
+    BINARY_OPERATORS,
+    UNARY_OPERATORS,
+    DefUseIndex,
+    SSAInstruction,
+    SSAValue,
+    is_number,
+)
+from ssa_types import IMMUTABLE_TYPES, NUMERIC_TYPES, infer_types, may_raise, simplify_arithmetic, type_of
+
+PURE_OPS = set(BINARY_OPERATORS) | set(UNARY_OPERATORS) | {"assign", "length", "build_tuple"}
+COMMUTATIVE_OPS = {"add", "mult", "eq", "noteq", "bitand", "bitor", "bitxor"}
+# commutative only for numbers: "a" + "b", [1] * 2 or dict | dict are not
+NUMERIC_COMMUTATIVE_OPS = {"add", "mult", "bitand", "bitor", "bitxor"}
+
+
+def count_definitions(blocks):
+    counts = {}
+    for block in blocks:
+        for instr in block.instructions:
+            if instr.result is not None:
+                counts[instr.result] = counts.get(instr.result, 0) + 1
+    return counts
+
+
+def fold_operation(op, args):
+    # Returns (True, value) when op applied to literal numbers can be
+    # evaluated now, (False, None) otherwise (including operations that
+    # would raise, which must still raise at run time).
+    if not all(is_number(arg) or isinstance(arg, bool) for arg in args):
+        return False, None
+    if op in ("pow", "lshift") and abs(args[1]) > 64:
+        return False, None  # do not build huge numbers at compile time
+    try:
+        if op in BINARY_OPERATORS and len(args) == 2:
+            return True, BINARY_OPERATORS[op](*args)
+        if op in UNARY_OPERATORS and len(args) == 1:
+            return True, UNARY_OPERATORS[op](*args)
+    except (ArithmeticError, ValueError, TypeError):
+        pass
+    return False, None
+
+
+def _operand_key(operand):
+    # SSAValues hash by id; literals are keyed with their type so that 1,
+    # 1.0 and True do not collide
+    if isinstance(operand, SSAValue):
+        return operand
+    return (type(operand).__name__, operand)
+
+
+def _operand_order(operand):
+    if isinstance(operand, SSAValue):
+        return (0, operand.id, "")
+    return (1, 0, f"{type(operand).__name__}:{operand!r}")
+
+
+def is_mutable_literal(operand):
+    # list, dict and set literals build a new object each time they are
+    # evaluated, so two uses of one are not the same value
+    return isinstance(operand, str) and operand[:1] in ("[", "{")
+
+
+def global_value_numbering(cfg):
+    # Dominator-scoped hash-based value numbering (Briggs, Cooper & Simpson).
+    # Expressions are hashed on the value numbers of their operands in a
+    # table that is scoped over the dominator tree, so a value is only reused
+    # where its definition dominates the redundant computation. Copies are
+    # propagated, literal operations folded and phis whose operands all agree
+    # (or that duplicate another phi of the same block) are removed. Copies
+    # of list, dict and set literals stay, as they create the object.
+    # Operands of add, mult and the bit operations are only put in canonical
+    # order when ssa_types.infer_types shows both are numbers. Operations
+    # are only numbered when all their operands are numbers or strings:
+    # a + b on lists (or NumPy arrays) builds a new object each time, and
+    # len(x) changes when x does.
+    # Values defined more than once (IR that is not in strict SSA form) are
+    # never numbered. Returns the number of removed instructions.
+    multiple_defs = {value for value, count in count_definitions(cfg.blocks).items() if count > 1}
+    types = infer_types(cfg)
+    leader = {}
+
+    def commutes(op, args):
+        if op in NUMERIC_COMMUTATIVE_OPS:
+            return all(type_of(types, arg) in NUMERIC_TYPES for arg in args)
+        return op in COMMUTATIVE_OPS and not any(isinstance(arg, str) for arg in args)
+
+    def shareable(args):
+        return all(type_of(types, arg) in IMMUTABLE_TYPES for arg in args)
+
+    def resolve(operand):
+        if not isinstance(operand, SSAValue):
+            return operand
+        seen = operand
+        while isinstance(operand, SSAValue) and operand in leader:
+            operand = leader[operand]
+        if operand is not seen:
+            leader[seen] = operand
+        return operand
+
+    table = {}
+    undo_log = []
+    removed = 0
+    work = [(cfg.entry, None)] if cfg.entry is not None else []
+    while work:
+        block, mark = work.pop()
+        if mark is not None:
+            while len(undo_log) > mark:
+                del table[undo_log.pop()]
+            continue
+
+        scope_mark = len(undo_log)
+        memory_epoch = 0
+        kept = []
+        for instr in block.instructions:
+            args = [resolve(arg) for arg in instr.args]
+            instr.args = args
+            op = instr.op
+            result = instr.result
+
+            if result is None or result in multiple_defs:
+                if op not in PURE_OPS and op != "get_element":
+                    memory_epoch += 1
+                kept.append(instr)
+                continue
+
+            key = None
+            if any(is_mutable_literal(arg) for arg in args):
+                if op not in PURE_OPS and op != "get_element":
+                    memory_epoch += 1
+            elif op == "assign":
+                operand = args[0]
+                if not (isinstance(operand, SSAValue) and operand in multiple_defs):
+                    leader[result] = operand
+                    removed += 1
+                    continue
+            elif op == "phi":
+                distinct = {_operand_key(arg): arg for arg in args if arg is not result}
+                if len(distinct) == 1:
+                    operand = next(iter(distinct.values()))
+                    if not (isinstance(operand, SSAValue) and operand in multiple_defs):
+                        leader[result] = operand
+                        removed += 1
+                        continue
+                key = ("phi", block.name) + tuple(_operand_key(arg) for arg in args)
+            elif op in PURE_OPS:
+                folded, value = fold_operation(op, args)
+                if folded:
+                    leader[result] = value
+                    removed += 1
+                    continue
+                if any(isinstance(arg, SSAValue) and arg in multiple_defs for arg in args) or not shareable(args):
+                    key = None
+                elif commutes(op, args):
+                    ordered = sorted(args, key=_operand_order)
+                    key = (instr.opcode,) + tuple(_operand_key(arg) for arg in ordered)
+                else:
+                    key = (instr.opcode,) + tuple(_operand_key(arg) for arg in args)
+            elif op == "get_element":
+                # loads are only reused inside one block and between stores
+                if not any(isinstance(arg, SSAValue) and arg in multiple_defs for arg in args):
+                    key = ("load", block.name, memory_epoch) + tuple(_operand_key(arg) for arg in args)
+            else:
+                memory_epoch += 1
+
+            if key is not None:
+                existing = table.get(key)
+                if existing is not None:
+                    leader[result] = existing
+                    removed += 1
+                    continue
+                table[key] = result
+                undo_log.append(key)
+            kept.append(instr)
+        block.instructions = kept
+
+        work.append((block, scope_mark))
+        for child in reversed(cfg.dom_children(block)):
+            work.append((child, None))
+
+    # operands defined later in the dominator walk (phi operands along back
+    # edges) and unreachable blocks still need their leaders substituted
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            instr.args = [resolve(arg) for arg in instr.args]
+    return removed
+
+
+def phi_instructions(block):
+    for instr in block.instructions:
+        if instr.op == "phi":
+            yield instr
+
+
+def detach_edge(cfg, src, dst):
+    # Removes the src -> dst edge together with the matching phi operands of
+    # dst (phis whose arity does not follow dst.preds are left untouched).
+    pred_index = dst.preds.index(src)
+    arity = len(dst.preds)
+    for phi in phi_instructions(dst):
+        if len(phi.args) == arity:
+            del phi.args[pred_index]
+    cfg.remove_edge(src, dst)
+
+
+def delete_block(cfg, block):
+    for succ in list(block.successors):
+        detach_edge(cfg, block, succ)
+    cfg.remove_block(block)
+
+
+def get_terminator(block):
+    for instr in reversed(block.instructions):
+        if instr.op in ("branch", "jump"):
+            return instr
+    return None
+
+
+def replace_terminator(block, target_name):
+    for i in range(len(block.instructions) - 1, -1, -1):
+        if block.instructions[i].op == "branch":
+            block.instructions[i] = SSAInstruction("jump", [target_name], None)
+            return
+
+
+_TOP = object()
+_BOTTOM = object()
+
+
+def _meet(a, b):
+    if a is _TOP:
+        return b
+    if b is _TOP:
+        return a
+    if a is _BOTTOM or b is _BOTTOM:
+        return _BOTTOM
+    if type(a) is type(b) and a == b:
+        return a
+    return _BOTTOM
+
+
+def sparse_conditional_constant_propagation(cfg):
+    # Wegman & Zadeck SCCP. Values start at TOP and only move down the
+    # lattice TOP -> constant -> BOTTOM; instructions are only evaluated once
+    # their block is reachable through an executable CFG edge, and phis only
+    # meet operands that arrive over executable edges. Afterwards constant
+    # values are substituted into their users, branches on constant conditions
+    # become jumps and blocks that never became executable are deleted.
+    # Returns the set of names of the deleted (unreachable) blocks.
+    def_use = DefUseIndex.from_blocks(cfg.blocks)
+    multiple_defs = {value for value, count in count_definitions(cfg.blocks).items() if count > 1}
+    lattice = {}
+    executable_edges = set()
+    executable_blocks = set()
+
+    def lattice_of(operand):
+        if isinstance(operand, SSAValue):
+            if operand in multiple_defs:
+                return _BOTTOM
+            return lattice.get(operand, _TOP)
+        if is_number(operand) or isinstance(operand, bool):
+            return operand
+        return _BOTTOM
+
+    def evaluate(instr, block):
+        op = instr.op
+        if op == "phi":
+            value = _TOP
+            if len(instr.args) == len(block.preds):
+                for arg, pred in zip(instr.args, block.preds):
+                    if (pred, block) in executable_edges:
+                        value = _meet(value, lattice_of(arg))
+            else:
+                for arg in instr.args:
+                    value = _meet(value, lattice_of(arg))
+            return value
+        if op == "assign":
+            return lattice_of(instr.args[0])
+        if op in BINARY_OPERATORS or op in UNARY_OPERATORS:
+            values = [lattice_of(arg) for arg in instr.args]
+            if any(value is _BOTTOM for value in values):
+                return _BOTTOM
+            if any(value is _TOP for value in values):
+                return _TOP
+            folded, value = fold_operation(op, values)
+            return value if folded else _BOTTOM
+        return _BOTTOM
+
+    cfg_worklist = [(None, cfg.entry)] if cfg.entry is not None else []
+    ssa_worklist = []
+
+    def visit(instr, block):
+        if instr.op == "branch":
+            cond = lattice_of(instr.args[0])
+            if cond is _TOP:
+                return
+            if cond is _BOTTOM:
+                targets = instr.args[1:]
+            else:
+                targets = [instr.args[1] if cond else instr.args[2]]
+            for name in targets:
+                cfg_worklist.append((block, cfg.get_block(name)))
+            return
+        if instr.op == "jump":
+            cfg_worklist.append((block, cfg.get_block(instr.args[0])))
+            return
+        result = instr.result
+        if result is None:
+            return
+        if result in multiple_defs:
+            new_value = _BOTTOM
+        else:
+            new_value = evaluate(instr, block)
+        old_value = lattice.get(result, _TOP)
+        if new_value is _TOP or new_value is old_value:
+            return
+        if old_value is not _TOP and new_value is not _BOTTOM:
+            return  # constant can only drop to BOTTOM
+        lattice[result] = new_value
+        ssa_worklist.append(result)
+
+    while cfg_worklist or ssa_worklist:
+        while cfg_worklist:
+            edge = cfg_worklist.pop()
+            if edge in executable_edges:
+                continue
+            if edge[0] is not None:
+                executable_edges.add(edge)
+            block = edge[1]
+            if block in executable_blocks:
+                # a new incoming edge only changes phis
+                for phi in phi_instructions(block):
+                    visit(phi, block)
+                continue
+            executable_blocks.add(block)
+            for instr in block.instructions:
+                visit(instr, block)
+        while ssa_worklist:
+            value = ssa_worklist.pop()
+            for user in def_use.get_users(value):
+                if user.block in executable_blocks:
+                    visit(user, user.block)
+
+    # rewrite
+    constants = {
+        value: constant
+        for value, constant in lattice.items()
+        if constant is not _TOP and constant is not _BOTTOM
+    }
+    for block in cfg.blocks:
+        kept = []
+        for instr in block.instructions:
+            if instr.result in constants:
+                continue
+            instr.args = [
+                constants.get(arg, arg) if isinstance(arg, SSAValue) else arg
+                for arg in instr.args
+            ]
+            kept.append(instr)
+        block.instructions = kept
+
+    for block in list(cfg.blocks):
+        if block not in executable_blocks:
+            continue
+        for succ in list(block.successors):
+            if (block, succ) not in executable_edges:
+                detach_edge(cfg, block, succ)
+        terminator = get_terminator(block)
+        if terminator is not None and terminator.op == "branch":
+            cond = terminator.args[0]
+            if is_number(cond) or isinstance(cond, bool):
+                replace_terminator(block, terminator.args[1] if cond else terminator.args[2])
+
+    unreachable = [block for block in cfg.blocks if block not in executable_blocks]
+    for block in unreachable:
+        delete_block(cfg, block)
+    return {block.name for block in unreachable}
+
+
+REMOVABLE_OPS = PURE_OPS | {"phi", "build_list"}
+
+
+def remove_unreachable_blocks(cfg):
+    unreachable = [block for block in cfg.blocks if not cfg.reachable(block)]
+    for block in unreachable:
+        delete_block(cfg, block)
+    return len(unreachable)
+
+
+def live_instructions(cfg):
+    # Mark-sweep over SSA def-use edges: side-effecting instructions (stores,
+    # control flow, calls and anything not known to be pure) are the roots,
+    # and so are pure operations that may raise for their operand types
+    # (x[10], 1 // x), which must still raise at run time. Every definition
+    # reached from a live operand is live. Returns the ids of the live
+    # instructions.
+    types = infer_types(cfg)
+    definitions = {}
+    worklist = []
+    live = set()
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            if instr.result is not None:
+                definitions.setdefault(instr.result, []).append(instr)
+            if instr.op not in REMOVABLE_OPS or instr.result is None or may_raise(instr, types):
+                live.add(id(instr))
+                worklist.append(instr)
+    while worklist:
+        instr = worklist.pop()
+        for arg in instr.args:
+            if isinstance(arg, SSAValue):
+                for definition in definitions.get(arg, ()):
+                    if id(definition) not in live:
+                        live.add(id(definition))
+                        worklist.append(definition)
+    return live
+
+
+def remove_dead_instructions(cfg):
+    # Unlike use counting this also removes dead phi cycles around loops.
+    live = live_instructions(cfg)
+    removed = 0
+    for block in cfg.blocks:
+        kept = [instr for instr in block.instructions if id(instr) in live]
+        removed += len(block.instructions) - len(kept)
+        block.instructions = kept
+    return removed
+
+
+def _retarget(block, old_name, new_name):
+    terminator = get_terminator(block)
+    terminator.args = [
+        new_name if i > 0 and arg == old_name else arg
+        for i, arg in enumerate(terminator.args)
+    ] if terminator.op == "branch" else [new_name]
+
+
+def _fold_same_target_branch(cfg, block):
+    terminator = get_terminator(block)
+    if terminator is not None and terminator.op == "branch" and terminator.args[1] == terminator.args[2]:
+        target = cfg.get_block(terminator.args[1])
+        replace_terminator(block, target.name)
+        detach_edge(cfg, block, target)
+        return True
+    return False
+
+
+def _bypass_empty_block(cfg, block):
+    # block holds nothing but "jump target": send its predecessors straight
+    # to target, giving each of them the phi operand block used to supply
+    target = block.successors[0]
+    if target is block:
+        return False
+    target_phis = list(phi_instructions(target))
+    if target_phis:
+        if any(len(phi.args) != len(target.preds) for phi in target_phis):
+            return False
+        if any(pred in target.preds for pred in block.preds):
+            return False
+    block_index = target.preds.index(block)
+    for pred in list(block.preds):
+        _retarget(pred, block.name, target.name)
+        while block in pred.successors:
+            cfg.remove_edge(pred, block)
+            cfg.add_edge(pred, target)
+            for phi in target_phis:
+                phi.args.append(phi.args[block_index])
+        _fold_same_target_branch(cfg, pred)
+    delete_block(cfg, block)
+    return True
+
+
+def _merge_into_predecessor(cfg, block, succ):
+    # block ends in "jump succ" and is succ's only predecessor
+    for phi in phi_instructions(succ):
+        phi.op = "assign"
+        phi.args = phi.args[:1]
+    instructions = block.instructions
+    instructions.remove(get_terminator(block))
+    instructions.extend(succ.instructions)
+    succ.instructions = []
+    cfg.remove_edge(block, succ)
+    for next_block in list(succ.successors):
+        # keep the position in next_block.preds so phi operands still match
+        next_block.preds[next_block.preds.index(succ)] = block
+        block.successors.append(next_block)
+    succ.successors = []
+    cfg.remove_block(succ)
+
+
+def simplify_cfg(cfg):
+    changed = True
+    count = 0
+    while changed:
+        changed = False
+        for block in list(cfg.blocks):
+            if block.name not in cfg.block_map:
+                continue
+            if _fold_same_target_branch(cfg, block):
+                changed = True
+            terminator = get_terminator(block)
+            if terminator is None or terminator.op != "jump":
+                continue
+            succ = cfg.get_block(terminator.args[0])
+            if block is not cfg.entry and len(block.instructions) == 1:
+                if _bypass_empty_block(cfg, block):
+                    changed = True
+                    count += 1
+                    continue
+            if succ is not block and succ is not cfg.entry and len(succ.preds) == 1:
+                _merge_into_predecessor(cfg, block, succ)
+                changed = True
+                count += 1
+    return count
+
+
+def dead_code_elimination(cfg):
+    # Removes unreachable blocks, instructions whose results are never used
+    # by anything with a side effect, and then empty or straight-line
+    # blocks. Returns the number of removed instructions and blocks.
+    removed = remove_unreachable_blocks(cfg)
+    while True:
+        removed += remove_dead_instructions(cfg)
+        # folding branches may have killed their conditions
+        simplified = simplify_cfg(cfg)
+        removed += simplified
+        if not simplified:
+            return removed
+
+
+DEFAULT_PIPELINE = (
+    sparse_conditional_constant_propagation,
+    simplify_arithmetic,
+    global_value_numbering,
+    dead_code_elimination,
+)
+
+
+def optimize(cfg, passes=DEFAULT_PIPELINE):
+    # The passes do not maintain a DefUseIndex; rebuild one with
+    # DefUseIndex.from_blocks(cfg.blocks) if it is needed afterwards.
+    for ssa_pass in passes:
+        ssa_pass(cfg)
+    return cfg
@@ -0,0 +1,307 @@
+from project2 import SSAInstruction, SSAValue, is_number
+
+# Type inference over the SSA IR and the algebraic simplifications it
+# makes safe.
+#
+# Every value gets one of the types below. UNKNOWN means anything, e.g. a
+# parameter, a call result or a tuple. Values start out undefined and only
+# move up the lattice (undefined -> one type -> UNKNOWN), so loop phis are
+# resolved optimistically: i = phi(0, i + 1) is an int. A phi joins its
+# operands; every other instruction applies Python's rules for the operand
+# types (int + float is a float, str * int a str, a / b always a float).
+#
+# Identities such as x - x == 0 or x * 0 == 0 only hold for some types:
+# they fail for floats (nan, inf, -0.0), strings, lists and NumPy arrays.
+# simplify_arithmetic applies each rewrite only to the types it is exact
+# for, turning the instruction into a copy that GVN then propagates.
+
+INT = "int"
+FLOAT = "float"
+BOOL = "bool"
+STR = "str"
+LIST = "list"
+UNKNOWN = "unknown"
+
+NUMERIC_TYPES = (BOOL, INT, FLOAT)
+# values of these types can be shared: an operation that gives one does
+# not build an object the program could later modify
+IMMUTABLE_TYPES = NUMERIC_TYPES + (STR,)
+
+_ARITHMETIC_OPS = {"add", "sub", "mult", "floordiv", "mod"}
+_BITWISE_OPS = {"bitand", "bitor", "bitxor"}
+_SHIFT_OPS = {"lshift", "rshift"}
+_ORDER_OPS = {"lt", "lte", "gt", "gte"}
+_TYPED_OPS = (
+    _ARITHMETIC_OPS | _BITWISE_OPS | _SHIFT_OPS | _ORDER_OPS
+    | {"div", "pow", "eq", "noteq", "usub", "uadd", "invert", "assign", "get_element"}
+)
+
+
+def literal_type(operand):
+    # the type of a literal operand: numbers are kept as they are, the
+    # other constants as their source text
+    if isinstance(operand, bool) or operand in ("True", "False"):
+        return BOOL
+    if isinstance(operand, int):
+        return INT
+    if isinstance(operand, float):
+        return FLOAT
+    if isinstance(operand, str) and operand[:1] in ("'", '"'):
+        return STR
+    if isinstance(operand, str) and operand[:1] == "[":
+        return LIST
+    return UNKNOWN
+
+
+def join(a, b):
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    return UNKNOWN
+
+
+def binary_type(op, a, b):
+    # result type of op on values of types a and b
+    if a in NUMERIC_TYPES and b in NUMERIC_TYPES:
+        if op == "div":
+            return FLOAT
+        if op in _ARITHMETIC_OPS:
+            return FLOAT if FLOAT in (a, b) else INT
+        if op == "pow":
+            return FLOAT if FLOAT in (a, b) else UNKNOWN  # int ** -1 is a float
+        if op in _ORDER_OPS or op in ("eq", "noteq"):
+            return BOOL
+        if FLOAT in (a, b):
+            return UNKNOWN
+        if op in _BITWISE_OPS:
+            return BOOL if a == b == BOOL else INT
+        if op in _SHIFT_OPS:
+            return INT
+    if op in _ORDER_OPS:
+        return BOOL if a == b and a in (STR, LIST) else UNKNOWN
+    if op in ("eq", "noteq"):
+        return BOOL if UNKNOWN not in (a, b) else UNKNOWN
+    if op == "add" and a == b and a in (STR, LIST):
+        return a
+    if op == "mult" and a in (STR, LIST) and b in (INT, BOOL):
+        return a
+    if op == "mult" and b in (STR, LIST) and a in (INT, BOOL):
+        return b
+    if op == "mod" and a == STR:
+        return STR
+    return UNKNOWN
+
+
+def unary_type(op, a):
+    if op == "not":
+        return BOOL
+    if op in ("usub", "uadd"):
+        return {BOOL: INT, INT: INT, FLOAT: FLOAT}.get(a, UNKNOWN)
+    if op == "invert":
+        return INT if a in (BOOL, INT) else UNKNOWN
+    return UNKNOWN
+
+
+class _Inference:
+    def __init__(self, cfg):
+        self.types = {}
+        self.users = {}
+        self.instructions = [instr for block in cfg.blocks for instr in block.instructions]
+        for instr in self.instructions:
+            for arg in instr.args:
+                if isinstance(arg, SSAValue):
+                    self.users.setdefault(arg, []).append(instr)
+
+    def type_of(self, operand):
+        # None while a value is still undefined
+        if isinstance(operand, SSAValue):
+            return self.types.get(operand)
+        return literal_type(operand)
+
+    def transfer(self, instr):
+        op = instr.op
+        if op == "phi":
+            result = None
+            for arg in instr.args:
+                result = join(result, self.type_of(arg))
+            return result
+        if op == "length":
+            return INT
+        if op == "build_list":
+            return LIST
+        if op == "not":
+            return BOOL
+        if op not in _TYPED_OPS:
+            return UNKNOWN
+        types = [self.type_of(arg) for arg in instr.args]
+        if None in types:
+            return None
+        if op == "assign":
+            return types[0]
+        if op == "get_element":
+            return STR if types[0] == STR else UNKNOWN
+        if op == "pow" and types[0] in (BOOL, INT) and isinstance(instr.args[1], int) and instr.args[1] >= 0:
+            return INT
+        if len(types) == 1:
+            return unary_type(op, types[0])
+        return binary_type(op, *types)
+
+    def run(self):
+        worklist = list(reversed(self.instructions))
+        while worklist:
+            instr = worklist.pop()
+            if instr.result is None:
+                continue
+            new = join(self.types.get(instr.result), self.transfer(instr))
+            if new is not None and new != self.types.get(instr.result):
+                self.types[instr.result] = new
+                worklist.extend(self.users.get(instr.result, ()))
+        return self.types
+
+
+def infer_types(cfg):
+    # {value: type} for every value of cfg. A value defined more than once
+    # (module variables) gets the join of its definitions; one that no
+    # executable definition reaches is left out.
+    return _Inference(cfg).run()
+
+
+def type_of(types, operand):
+    # operand's type under infer_types' result
+    if isinstance(operand, SSAValue):
+        return types.get(operand, UNKNOWN)
+    return literal_type(operand)
+
+
+def _is_nonzero_literal(operand):
+    return type(operand) in (int, float) and operand != 0
+
+
+def may_raise(instr, types):
+    # False when instr cannot raise for the inferred operand types, so dead
+    # code elimination may drop it. Mixed int/float arithmetic can overflow
+    # when the int is huge, and true division of ints too, so those are
+    # only safe with a literal on the other side.
+    op = instr.op
+    if op in ("assign", "phi", "build_list", "build_tuple"):
+        return False
+    operand_types = [type_of(types, arg) for arg in instr.args]
+    if op == "not":
+        return UNKNOWN in operand_types
+    if op == "length":
+        return operand_types[0] not in (STR, LIST)
+    if op in ("usub", "uadd"):
+        return operand_types[0] not in NUMERIC_TYPES
+    if op == "invert":
+        return operand_types[0] not in (BOOL, INT)
+    if len(instr.args) != 2 or op not in _TYPED_OPS:
+        return True
+    a, b = instr.args
+    ta, tb = operand_types
+    if op in ("eq", "noteq"):
+        return UNKNOWN in operand_types
+    if op in _ORDER_OPS and ta == tb == STR:
+        return False
+    if ta not in NUMERIC_TYPES or tb not in NUMERIC_TYPES:
+        return not (op == "add" and ta == tb and ta in (STR, LIST))
+    integers = FLOAT not in (ta, tb)
+    if not integers and ta != tb and not is_number(a if tb == FLOAT else b):
+        return True  # a huge int does not convert to float
+    if op in _ORDER_OPS or op in ("add", "sub", "mult"):
+        return False
+    if op in _BITWISE_OPS:
+        return not integers
+    if op == "rshift":
+        return not (integers and type(b) is int and b >= 0)
+    if op == "lshift":
+        return not (integers and type(b) is int and 0 <= b <= 64)
+    if op == "div":
+        return not (ta == FLOAT and _is_nonzero_literal(b))
+    if op in ("floordiv", "mod"):
+        return not _is_nonzero_literal(b)
+    return True  # pow
+
+
+def _is_literal(operand, value):
+    # operand is exactly the int literal value (not a bool or a float)
+    return type(operand) is int and operand == value
+
+
+def _simplified(instr, types):
+    # the operand instr can be replaced by, or None
+    op = instr.op
+    args = instr.args
+    if len(args) != 2:
+        return None
+    a, b = args
+    ta, tb = type_of(types, a), type_of(types, b)
+    if op == "add":
+        if _is_literal(b, 0) and ta == INT:
+            return a
+        if _is_literal(a, 0) and tb == INT:
+            return b
+    elif op == "sub":
+        if _is_literal(b, 0) and ta in (INT, FLOAT):
+            return a
+        if isinstance(a, SSAValue) and a is b and ta in (INT, BOOL):
+            return 0
+    elif op == "mult":
+        if _is_literal(b, 1) and ta in (INT, FLOAT):
+            return a
+        if _is_literal(a, 1) and tb in (INT, FLOAT):
+            return b
+        if _is_literal(b, 0) and ta in (INT, BOOL) or _is_literal(a, 0) and tb in (INT, BOOL):
+            return 0
+    elif op == "div":
+        if _is_literal(b, 1) and ta == FLOAT:
+            return a
+    elif op == "floordiv":
+        if _is_literal(b, 1) and ta == INT:
+            return a
+    elif op == "mod":
+        if _is_literal(b, 1) and ta in (INT, BOOL):
+            return 0
+    elif op == "pow":
+        if _is_literal(b, 1) and ta in (INT, FLOAT):
+            return a
+        if _is_literal(b, 0) and ta in (INT, FLOAT):
+            return 1 if ta == INT else 1.0
+    return None
+
+
+def simplify_arithmetic(cfg, types=None):
+    # Applies the algebraic identities that are exact for the inferred
+    # operand types (x + 0, x - 0, x - x, x * 1, x * 0, x / 1, x // 1,
+    # x % 1, x ** 1, x ** 0). Rewritten values, and copies of them, are
+    # replaced in the instructions after them, so chains such as
+    # (i - i) + j + 0 collapse in one pass. Other copies are left to GVN,
+    # which knows not to forward mutable literals. Returns the number of
+    # rewritten instructions.
+    if types is None:
+        types = infer_types(cfg)
+    definitions = {}
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            if instr.result is not None:
+                definitions[instr.result] = definitions.get(instr.result, 0) + 1
+    replaced = {}
+    count = 0
+    for block in cfg.reverse_postorder():
+        for index, instr in enumerate(block.instructions):
+            forwarded = instr.op == "assign" and instr.args[0] in replaced
+            instr.args = [replaced.get(arg, arg) if isinstance(arg, SSAValue) else arg for arg in instr.args]
+            if instr.result is None:
+                continue
+            if forwarded:
+                replacement = instr.args[0]
+            else:
+                replacement = _simplified(instr, types)
+                if replacement is None:
+                    continue
+                block.instructions[index] = SSAInstruction("assign", [replacement], instr.result)
+                count += 1
+            # a value defined more than once may differ where it is read
+            if definitions[instr.result] == 1 and definitions.get(replacement, 1) == 1:
+                replaced[instr.result] = replacement
+    return count
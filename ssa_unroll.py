@@ -0,0 +1,249 @@
+from project2 import SSABlock, SSAInstruction, SSAValue
+from ssa_loops import ensure_preheader, find_loops, fresh_names, induction_variables, literal_values, loop_test, trip_count
+from ssa_passes import count_definitions, get_terminator, optimize, phi_instructions
+
+# Loop unrolling for counted loops: innermost natural loops with a single
+# latch that are left only by their header test (a preheader is added when
+# the loop has none).
+#
+# A loop whose trip count T is a constant (ssa_loops.trip_count) and whose
+# T copies fit in the budget is unrolled fully: the body is copied T times
+# in a chain, each copy's header phis becoming copies of the previous
+# iteration's values, and a last header copy jumps straight to the exit.
+#
+# Any other loop on a basic induction variable with a literal step is
+# unrolled partially by factor. A new main loop runs factor body copies per
+# iteration while the last of them would still pass the test
+# (i + (factor - 1) * step < bound for "i < bound"); the original loop
+# then runs the remaining iterations.
+#
+# The copies keep the loop test and the phi copies of every iteration.
+# unroll_loops re-runs ssa_passes.optimize afterwards so that constant
+# propagation folds them, value numbering merges the repeated index
+# arithmetic, and straight-line blocks are merged.
+
+DEFAULT_BUDGET = 128  # instructions unrolling may add per loop
+DEFAULT_FACTOR = 4
+
+
+class _Copy:
+    # one copy of the loop: header, body blocks and the value map
+    def __init__(self, header, blocks, values, latch):
+        self.header = header
+        self.blocks = blocks
+        self.values = values
+        self.latch = latch
+
+    def value(self, operand):
+        return self.values.get(operand, operand) if isinstance(operand, SSAValue) else operand
+
+
+class _Unroller:
+    def __init__(self, cfg, loop, new_value, new_block_name):
+        self.cfg = cfg
+        self.loop = loop
+        self.new_value = new_value
+        self.new_block_name = new_block_name
+        self.header = loop.header
+        self.preheader = loop.preheader
+        self.latch = loop.latches[0]
+        self.entry_index = self.header.preds.index(self.preheader)
+        self.latch_index = self.header.preds.index(self.latch)
+        self.phis = list(phi_instructions(self.header))
+        branch = get_terminator(self.header)
+        self.body = cfg.get_block(branch.args[1])
+        self.exit = cfg.get_block(branch.args[2])
+        if self.body not in loop:
+            self.body, self.exit = self.exit, self.body
+
+    def copy(self, incoming, body=True):
+        # A copy of the header whose phis take incoming and that jumps to
+        # the body copy (or the exit when body is False), plus the body
+        # blocks. The latch copy is left without its back edge.
+        blocks = [self.header] + ([block for block in self.loop.blocks if block is not self.header] if body else [])
+        names = {block.name: self.new_block_name() for block in blocks}
+        values = {}
+        for block in blocks:
+            for instr in block.instructions:
+                if instr.result is not None:
+                    values[instr.result] = self.new_value(instr.result.base)
+        copies = {}
+        for block in blocks:
+            new = SSABlock(names[block.name])
+            for instr in block.instructions:
+                if block is self.header and instr.op == "phi":
+                    args = [incoming[self.phis.index(instr)]]
+                    new.instructions.append(SSAInstruction("assign", args, values[instr.result]))
+                    continue
+                if block is self.header and instr.op == "branch":
+                    target = self.body if body else self.exit
+                    new.instructions.append(SSAInstruction("jump", [names.get(target.name, target.name)], None))
+                    continue
+                args = [
+                    values.get(arg, arg) if isinstance(arg, SSAValue) else arg
+                    for arg in instr.args
+                ]
+                if instr.op in ("branch", "jump"):
+                    # back edges keep the header's name for enter() to retarget
+                    args = [names[arg] if isinstance(arg, str) and arg in names and arg != self.header.name
+                            else arg for arg in args]
+                result = values[instr.result] if instr.result is not None else None
+                new.instructions.append(SSAInstruction(instr.op, args, result))
+            copies[block] = new
+            self.cfg.add_block(new)
+        # edges inside the copy, in the original order so phis still match
+        for block, new in copies.items():
+            if block is self.header:
+                continue
+            new.preds = [copies[pred] for pred in block.preds]
+            new.successors = [copies[succ] for succ in block.successors if succ is not self.header]
+        header = copies[self.header]
+        if body:
+            header.successors = [copies[self.body]]
+        else:
+            header.successors = [self.exit]
+        return _Copy(header, list(copies.values()), values, copies.get(self.latch))
+
+    def enter(self, block, copy):
+        # block (the preheader or a latch copy) now continues into copy
+        terminator = get_terminator(block)
+        terminator.args = [copy.header.name if arg == self.header.name else arg for arg in terminator.args]
+        if self.header in block.successors:
+            block.successors[block.successors.index(self.header)] = copy.header
+        else:
+            block.successors.append(copy.header)
+        copy.header.preds.append(block)
+
+    def chain(self, count, incoming, previous):
+        # count copies, each entered from the previous one (the first from
+        # previous, unless that is None); returns them
+        copies = []
+        for _ in range(count):
+            copy = self.copy(incoming)
+            if previous is not None:
+                self.enter(previous, copy)
+            incoming = [copy.value(phi.args[self.latch_index]) for phi in self.phis]
+            previous = copy.latch
+            copies.append(copy)
+        return copies
+
+    def unroll_fully(self, trips):
+        copies = self.chain(trips, [phi.args[self.entry_index] for phi in self.phis], self.preheader)
+        incoming = [copies[-1].value(phi.args[self.latch_index]) for phi in self.phis] if copies else [
+            phi.args[self.entry_index] for phi in self.phis
+        ]
+        last = self.copy(incoming, body=False)
+        self.enter(copies[-1].latch if copies else self.preheader, last)
+        self.exit.preds[self.exit.preds.index(self.header)] = last.header
+
+        # only header values reach past a loop that is left from its header
+        new = {block for copy in copies + [last] for block in copy.blocks}
+        for block in self.cfg.blocks:
+            if block in self.loop or block in new:
+                continue
+            for instr in block.instructions:
+                instr.args = [last.value(arg) for arg in instr.args]
+        for block in self.loop.blocks:
+            block.preds = []
+            block.successors = []
+            self.cfg.remove_block(block)
+        self.cfg.invalidate()
+
+    def unroll_partially(self, factor, basic, op, step, bound):
+        # main: phis; last = basic + (factor - 1) * step; op(last, bound)
+        main = SSABlock(self.new_block_name())
+        self.cfg.add_block(main)
+        merged = [self.new_value(phi.result.base) for phi in self.phis]
+        basic_value = merged[[phi.result for phi in self.phis].index(basic)]
+        last = self.new_value("unroll")
+        cond = self.new_value("loop_cond")
+        copies = self.chain(factor, merged, None)
+        main.instructions = [
+            SSAInstruction("phi", [phi.args[self.entry_index], copies[-1].value(phi.args[self.latch_index])], value)
+            for phi, value in zip(self.phis, merged)
+        ] + [
+            SSAInstruction("add", [basic_value, (factor - 1) * step], last),
+            SSAInstruction(op, [last, bound], cond),
+            SSAInstruction("branch", [cond, copies[0].header.name, self.header.name], None),
+        ]
+
+        # preheader -> main -> (copies -> main) | original loop
+        terminator = get_terminator(self.preheader)
+        terminator.args = [main.name if arg == self.header.name else arg for arg in terminator.args]
+        self.preheader.successors[self.preheader.successors.index(self.header)] = main
+        main.preds = [self.preheader, copies[-1].latch]
+        latch_jump = get_terminator(copies[-1].latch)
+        latch_jump.args = [main.name if arg == self.header.name else arg for arg in latch_jump.args]
+        copies[-1].latch.successors.append(main)
+        main.successors = [copies[0].header, self.header]
+        copies[0].header.preds = [main]
+        self.header.preds[self.entry_index] = main
+        for phi, value in zip(self.phis, merged):
+            phi.args[self.entry_index] = value
+        self.cfg.invalidate()
+        return main
+
+
+def _size(loop):
+    return sum(len(block.instructions) for block in loop.blocks)
+
+
+def _candidate(cfg, loop, multiple):
+    if loop.children or len(loop.latches) != 1 or not loop.entries:
+        return False
+    if any(block is not loop.header for block, _ in loop.exits):
+        return False
+    branch = get_terminator(loop.header)
+    if branch is None or branch.op != "branch":
+        return False
+    return not any(instr.result in multiple for block in loop.blocks for instr in block.instructions)
+
+
+def unroll_loops(cfg, budget=DEFAULT_BUDGET, factor=DEFAULT_FACTOR, cleanup=True, module=False):
+    # Unrolls the counted innermost loops of cfg in place (see the module
+    # comment): fully when the trip count is constant and the copies add
+    # at most budget instructions, otherwise by factor when the copies fit.
+    # Loops that become innermost after a full unroll are tried again.
+    # module marks cfg as a module unit; the passes would treat its
+    # variables as dead, so it is not cleaned up. Returns the number of
+    # loops unrolled.
+    new_value, new_block_name = fresh_names(cfg)
+    done = set()
+    count = 0
+    changed = True
+    while changed:
+        changed = False
+        multiple = {value for value, n in count_definitions(cfg.blocks).items() if n > 1}
+        constants = literal_values(cfg)
+        for loop in find_loops(cfg):
+            if loop.header.name in done or not _candidate(cfg, loop, multiple):
+                continue
+            ivs = induction_variables(cfg, loop)
+            size = _size(loop)
+            trips = trip_count(cfg, loop, ivs)
+            if trips is not None and trips * size <= budget:
+                if ensure_preheader(cfg, loop, new_value, new_block_name) is None:
+                    continue
+                _Unroller(cfg, loop, new_value, new_block_name).unroll_fully(trips)
+                count += 1
+                changed = True
+                break  # the loop nest changed
+            test = loop_test(cfg, loop, ivs)
+            if test is None or factor < 2 or (factor - 1) * size > budget:
+                continue
+            _, op, basic, bound = test
+            step = constants.get(ivs[basic].step, ivs[basic].step)
+            if not isinstance(step, int) or loop.defines(bound):
+                continue
+            if trips is not None and trips < factor:
+                continue
+            if not (op in ("lt", "lte") and step > 0 or op in ("gt", "gte") and step < 0):
+                continue
+            if ensure_preheader(cfg, loop, new_value, new_block_name) is None:
+                continue
+            main = _Unroller(cfg, loop, new_value, new_block_name).unroll_partially(factor, basic, op, step, bound)
+            done.update((loop.header.name, main.name))
+            count += 1
+    if count and cleanup and not module:
+        optimize(cfg)
+    return count
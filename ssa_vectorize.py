@@ -0,0 +1,547 @@
+from project2 import SSABlock, SSAInstruction, SSAValue
+from ssa_loops import fresh_names
+from ssa_passes import count_definitions, get_terminator, phi_instructions
+
+# Loop vectorizer: rewrites counted loops over array elements into whole
+# array NumPy operations. A candidate is an innermost loop as the cytron
+# converter builds it for "for i in range(start, stop)":
+#
+#   header:  i = phi(start, i_next), acc = phi(init, acc_next) ...
+#            cond = lt(i, stop); branch(cond, body, exit)
+#   body:    ...; i_next = add(i, 1); jump(header)
+#
+# whose body only loads array elements, does element-wise arithmetic and
+# either stores one element per iteration (a map, y[i] = ...), adds into
+# one element (y[k] += ..., with k loop invariant or an index array, which
+# becomes np.add.at) or accumulates into scalar phis (s = s + ...). Indices
+# are the counter, tuples holding the counter once, or elements of another
+# array indexed by the counter (a gather, x[cols[i]]).
+#
+# The loop is versioned rather than replaced: guard blocks check at run
+# time that every array is an ndarray of the expected rank, that the
+# counter range is non-empty and within the arrays, and that the stored
+# array does not overlap any array the loop reads. Only then does control
+# reach the vectorized block; otherwise the original loop runs. Reductions
+# are summed by NumPy (np.sum, np.dot for a sum of products), so floating
+# point results can differ from the loop in the last bits. NumPy sums
+# small integer dtypes in a wider type while the loop wraps around, so a
+# loop that reduces only takes the vectorized path when every array it
+# reads holds float64, complex128 or int64.
+#
+# Arithmetic on the counter alone (i * i, or summing i itself) is left
+# alone: the loop computes it on Python ints, which never overflow, while
+# np.arange gives int64. The counter may still be an index, be stored or
+# be combined with array elements, as it is below the guarded array size.
+
+# dtypes np.sum and np.dot keep, so they add up like the loop does
+SUM_DTYPES = ("float64", "complex128", "int64")
+
+# element-wise operations that mean the same on NumPy scalars and arrays
+VECTOR_OPS = {"add", "sub", "mult", "div", "floordiv", "mod", "usub", "uadd"}
+
+# value kinds inside a loop body
+_INVARIANT = "invariant"  # same in every iteration
+_COUNTER = "counter"  # the induction variable itself
+_INDEX = "index"  # a tuple index with the counter in one position
+_VECTOR = "vector"  # one element per iteration
+
+
+class _Loop:
+    def __init__(self, header, body, exit, preheader, counter, start, stop, latch_value):
+        self.header = header
+        self.body = body
+        self.exit = exit
+        self.preheader = preheader
+        self.counter = counter
+        self.start = start
+        self.stop = stop
+        self.latch_value = latch_value
+
+
+def _find_loop(header):
+    # Returns a _Loop when header heads a single-block counted loop
+    if len(header.preds) != 2 or len(header.successors) != 2:
+        return None
+    instructions = header.instructions
+    phis = list(phi_instructions(header))
+    if len(instructions) != len(phis) + 2:
+        return None
+    cond, branch = instructions[-2:]
+    if cond.op != "lt" or branch.op != "branch" or branch.args[0] is not cond.result:
+        return None
+    body = next((block for block in header.successors if block.name == branch.args[1]), None)
+    exit = next((block for block in header.successors if block.name == branch.args[2]), None)
+    if body is None or exit is None or body is exit:
+        return None
+    if body.preds != [header] or body.successors != [header]:
+        return None
+    latch_index = header.preds.index(body)
+    preheader = header.preds[1 - latch_index]
+    if preheader.successors.count(header) != 1 or get_terminator(preheader) is None:
+        return None
+    counter = cond.args[0]
+    counter_phi = next((phi for phi in phis if phi.result is counter), None)
+    if counter_phi is None:
+        return None
+    latch_value = counter_phi.args[latch_index]
+    increment = next((instr for instr in body.instructions if instr.result is latch_value), None)
+    if increment is None or increment.op != "add" or increment.args != [counter, 1]:
+        return None
+    return _Loop(header, body, exit, preheader, counter, counter_phi.args[1 - latch_index], cond.args[1],
+                 latch_value)
+
+
+class _Vectorizer:
+    def __init__(self, cfg, loop, new_value):
+        self.cfg = cfg
+        self.loop = loop
+        self.new_value = new_value
+        self.latch_index = loop.header.preds.index(loop.body)
+        self.defined = {
+            instr.result for block in (loop.header, loop.body) for instr in block.instructions if instr.result
+        }
+        self.kinds = {loop.counter: _COUNTER}
+        self.definitions = {}
+        self.uses = {}
+        for instr in loop.body.instructions:
+            for arg in instr.args:
+                if isinstance(arg, SSAValue):
+                    self.uses.setdefault(arg, []).append(instr)
+            if instr.result is not None:
+                self.definitions[instr.result] = instr
+
+    def kind(self, operand):
+        if not isinstance(operand, SSAValue) or operand not in self.defined:
+            return _INVARIANT
+        return self.kinds.get(operand)
+
+    # analysis
+
+    def analyze(self):
+        # Classifies the body; returns False when the loop does not fit.
+        loop = self.loop
+        self.reductions = []  # (phi, update instruction)
+        for phi in phi_instructions(loop.header):
+            if phi.result is loop.counter:
+                continue
+            update = self.definitions.get(phi.args[self.latch_index])
+            if update is None or not self.accumulates(update, phi.result):
+                return False
+            if len(self.uses.get(phi.result, ())) != 1 or update.result in self.uses:
+                return False
+            self.kinds[phi.result] = "accumulator"
+            self.reductions.append((phi, update))
+
+        self.store = None
+        self.arrays = {}  # array -> rank it is indexed with, for the guards
+        self.bounded = []  # (array, axis) indexed by the counter
+        self.read = set()  # every array loaded from
+        self.loads = []
+        for instr in loop.body.instructions:
+            op = instr.op
+            if instr.result is loop.latch_value or op == "jump":
+                continue
+            if op == "store_element":
+                if self.store is not None:
+                    return False
+                self.store = instr
+                continue
+            if instr.result is None:
+                return False
+            if op == "assign":
+                self.kinds[instr.result] = self.kind(instr.args[0])
+            elif op == "build_tuple":
+                kinds = [self.kind(arg) for arg in instr.args]
+                if kinds.count(_COUNTER) == 1 and kinds.count(_INVARIANT) == len(kinds) - 1:
+                    self.kinds[instr.result] = _INDEX
+                elif all(kind == _INVARIANT for kind in kinds):
+                    self.kinds[instr.result] = _INVARIANT
+                else:
+                    return False
+            elif op == "get_element":
+                kind = self.load_kind(instr)
+                if kind is None:
+                    return False
+                self.kinds[instr.result] = kind
+                self.loads.append(instr)
+            elif op in VECTOR_OPS:
+                kinds = [self.kind(arg) for arg in instr.args]
+                if "accumulator" in kinds:
+                    phi = next((phi for phi, update in self.reductions if update is instr), None)
+                    if phi is None or self.kind(self.summand(instr, phi.result)) != _VECTOR:
+                        return False
+                    continue
+                if any(kind not in (_INVARIANT, _COUNTER, _VECTOR) for kind in kinds):
+                    return False
+                if _COUNTER in kinds and _VECTOR not in kinds:
+                    return False  # int64 where the loop has Python ints
+                self.kinds[instr.result] = _INVARIANT if all(kind == _INVARIANT for kind in kinds) else _VECTOR
+            else:
+                return False
+        return self.analyze_store() and self.analyze_uses()
+
+    def accumulates(self, update, accumulator):
+        # acc + e, e + acc or acc - e
+        if update.op == "add" and any(arg is accumulator for arg in update.args):
+            other = update.args[1] if update.args[0] is accumulator else update.args[0]
+        elif update.op == "sub" and update.args[0] is accumulator:
+            other = update.args[1]
+        else:
+            return False
+        return other is not accumulator
+
+    def summand(self, update, accumulator):
+        # e in acc + e, e + acc or acc - e
+        return update.args[1] if update.args[0] is accumulator else update.args[0]
+
+    def index_kind(self, index):
+        kind = self.kind(index)
+        if kind in (_COUNTER, _INDEX, _INVARIANT, _VECTOR):
+            return kind
+        return None
+
+    def load_kind(self, instr):
+        array, index = instr.args
+        if self.kind(array) != _INVARIANT or not isinstance(array, SSAValue):
+            return None
+        kind = self.index_kind(index)
+        if kind is None:
+            return None
+        self.read.add(array)
+        if kind == _INVARIANT:
+            return _INVARIANT
+        if kind == _VECTOR:
+            self.note_array(array, 1)
+        else:
+            self.note_indexed(array, index)
+        return _VECTOR
+
+    def note_array(self, array, rank):
+        if self.arrays.setdefault(array, rank) != rank:
+            self.arrays[array] = None
+
+    def note_indexed(self, array, index):
+        if self.kind(index) == _COUNTER:
+            self.note_array(array, 1)
+            self.bounded.append((array, 0))
+        else:
+            instr = self.definitions[index]
+            while instr.op == "assign":
+                instr = self.definitions[instr.args[0]]
+            self.note_array(array, len(instr.args))
+            self.bounded.append((array, [self.kind(arg) for arg in instr.args].index(_COUNTER)))
+
+    def index_key(self, index):
+        # structural key so that two build_tuple instructions or two gathers
+        # with the same operands count as one index (the overlap guard keeps
+        # the store from changing what a gather reads)
+        instr = self.definitions.get(index)
+        if instr is not None and instr.op == "build_tuple":
+            return ("tuple",) + tuple(self.index_key(arg) for arg in instr.args)
+        if instr is not None and instr.op == "get_element":
+            return ("element", instr.args[0], self.index_key(instr.args[1]))
+        if instr is not None and instr.op == "assign":
+            return self.index_key(instr.args[0])
+        return index if isinstance(index, SSAValue) else ("literal", index)
+
+    def analyze_store(self):
+        # the store decides between a map, an element reduction and a
+        # scatter reduction; every other load of the stored array must read
+        # the element being written
+        self.mode = None
+        if self.store is None:
+            return bool(self.reductions)
+        array, index, value = self.store.args
+        if not isinstance(array, SSAValue) or self.kind(array) != _INVARIANT:
+            return False
+        index_kind = self.index_kind(index)
+        own_loads = [load for load in self.loads if load.args[0] is array]
+        if index_kind in (_COUNTER, _INDEX):
+            if any(self.index_key(load.args[1]) != self.index_key(index) for load in own_loads):
+                return False
+            position = {id(instr): i for i, instr in enumerate(self.loop.body.instructions)}
+            if any(position[id(load)] > position[id(self.store)] for load in own_loads):
+                return False  # reads the element just written
+            if self.kind(value) not in (_INVARIANT, _VECTOR, _COUNTER):
+                return False
+            self.mode = "map"
+            self.note_indexed(array, index)
+            return True
+        # y[k] += e: the one load of y[k] feeds the add that is stored
+        update = self.definitions.get(value)
+        if len(own_loads) != 1 or update is None or update.op not in ("add", "sub"):
+            return False
+        load = own_loads[0]
+        if self.index_key(load.args[1]) != self.index_key(index) or not self.accumulates(update, load.result):
+            return False
+        if len(self.uses.get(load.result, ())) != 1 or len(self.uses.get(update.result, ())) != 1:
+            return False
+        other = self.summand(update, load.result)
+        if self.kind(other) != _VECTOR:
+            return False
+        if index_kind == _INVARIANT:
+            self.mode = "reduce"
+        elif index_kind == _VECTOR and update.op == "add":
+            self.mode = "scatter"
+            self.note_array(array, 1)
+        else:
+            return False
+        self.element_update = (load, update, other)
+        self.kinds[load.result] = "element"
+        self.kinds[update.result] = "element"
+        return True
+
+    def analyze_uses(self):
+        # values of the loop used after it: only the header phis, whose
+        # final values the vectorized code can produce
+        loop = self.loop
+        phis = self.header_phis()
+        for block in self.cfg.blocks:
+            if block is loop.header or block is loop.body:
+                continue
+            for instr in block.instructions:
+                for arg in instr.args:
+                    if isinstance(arg, SSAValue) and arg in self.defined and arg not in phis:
+                        return False
+        return all(rank is not None for rank in self.arrays.values())
+
+    def header_phis(self):
+        return {phi.result for phi in phi_instructions(self.loop.header)}
+
+    # rewriting
+
+    def emit(self, block, op, args, base="tmp"):
+        result = self.new_value(base) if op not in ("store_element",) else None
+        block.instructions.append(SSAInstruction(op, list(args), result))
+        return result
+
+    def rewrite(self, names):
+        # preheader -> checks [-> bounds] -> select -> vector | landing
+        # -> original loop; both versions leave through the loop's exit
+        loop = self.loop
+        if loop.exit.preds != [loop.header] or any(instr.op == "phi" for instr in loop.exit.instructions):
+            self.split_exit(SSABlock(names()))
+        checks, bounds, select, landing, vector = (SSABlock(names()) for _ in range(5))
+
+        # types first, so that the attribute lookups in bounds cannot fail
+        numpy = self.emit(checks, "import", ["numpy"])
+        ndarray = self.emit(checks, "getattr", [numpy, "ndarray"])
+        isinstance_ = self.emit(checks, "global", ["isinstance"])
+        ok = self.emit(checks, "lt", [loop.start, loop.stop])
+        for array in self.arrays:
+            is_array = self.emit(checks, "call", [isinstance_, array, ndarray])
+            ok = self.emit(checks, "bitand", [ok, is_array])
+        checks.instructions.append(SSAInstruction("branch", [ok, bounds.name, select.name], None))
+
+        # ranks, bounds and overlap
+        ok = self.emit(bounds, "lte", [0, loop.start])
+        for array, rank in self.arrays.items():
+            ndim = self.emit(bounds, "getattr", [array, "ndim"])
+            ok = self.emit(bounds, "bitand", [ok, self.emit(bounds, "eq", [ndim, rank])])
+        if self.reductions or self.mode == "reduce":
+            for array in self.read:
+                dtype = self.emit(bounds, "getattr", [array, "dtype"])
+                summable = False
+                for name in SUM_DTYPES:
+                    same = self.emit(bounds, "eq", [dtype, self.emit(bounds, "getattr", [numpy, name])])
+                    summable = self.emit(bounds, "bitor", [summable, same])
+                ok = self.emit(bounds, "bitand", [ok, summable])
+        shapes = {}
+        for array, axis in self.bounded:
+            if array not in shapes:
+                shapes[array] = self.emit(bounds, "getattr", [array, "shape"])
+            size = self.emit(bounds, "get_element", [shapes[array], axis])
+            ok = self.emit(bounds, "bitand", [ok, self.emit(bounds, "lte", [loop.stop, size])])
+        if self.store is not None:
+            overlap = self.emit(bounds, "getattr", [numpy, "may_share_memory"])
+            target = self.store.args[0]
+            for array in self.read:
+                if array is not target:
+                    shared = self.emit(bounds, "call", [overlap, target, array])
+                    ok = self.emit(bounds, "bitand", [ok, self.emit(bounds, "not", [shared])])
+        bounds.instructions.append(SSAInstruction("jump", [select.name], None))
+
+        use_vector = self.new_value("tmp")
+        select.instructions = [
+            SSAInstruction("phi", [False, ok], use_vector),
+            SSAInstruction("branch", [use_vector, vector.name, landing.name], None),
+        ]
+        landing.instructions.append(SSAInstruction("jump", [loop.header.name], None))
+
+        finals = self.vector_body(vector, numpy)
+        vector.instructions.append(SSAInstruction("jump", [loop.exit.name], None))
+        self.link(checks, bounds, select, landing, vector)
+        self.merge_exit(vector, finals)
+
+    def vector_body(self, block, numpy):
+        # the loop body over slices; returns {header phi: final value}
+        loop = self.loop
+        span = self.emit(block, "build_slice", [loop.start, loop.stop, None])
+        mapped = {}
+        fused = self.fused_products()  # value -> mult instruction
+
+        def counter_values():
+            if loop.counter not in mapped:
+                arange = self.emit(block, "getattr", [numpy, "arange"])
+                mapped[loop.counter] = self.emit(block, "call", [arange, loop.start, loop.stop])
+            return mapped[loop.counter]
+
+        def operand(arg):
+            kind = self.kind(arg)
+            if kind == _COUNTER:
+                return counter_values()
+            if kind == _INVARIANT:
+                return mapped.get(arg, arg)
+            return mapped[arg]
+
+        def index(arg):
+            kind = self.kind(arg)
+            if kind == _COUNTER:
+                return span
+            if kind == _INDEX:
+                return mapped[arg]
+            return operand(arg)
+
+        finals = {}
+        for instr in loop.body.instructions:
+            op = instr.op
+            result = instr.result
+            if result is loop.latch_value or self.kind(result) == "element" or result in fused:
+                continue
+            if any(instr is update for _, update in self.reductions):
+                continue
+            if op in ("store_element", "jump") or self.kind(result) == _COUNTER:
+                continue
+            if op == "build_tuple" and self.kind(result) == _INDEX:
+                mapped[result] = self.emit(block, "build_tuple", [index(arg) for arg in instr.args])
+            elif op == "get_element":
+                mapped[result] = self.emit(block, "get_element", [instr.args[0], index(instr.args[1])])
+            elif op == "assign":
+                mapped[result] = index(instr.args[0]) if self.kind(result) == _INDEX else operand(instr.args[0])
+            else:
+                mapped[result] = self.emit(block, op, [operand(arg) for arg in instr.args])
+
+        def total(value):
+            product = fused.get(value)
+            if product is not None:
+                dot = self.emit(block, "getattr", [numpy, "dot"])
+                return self.emit(block, "call", [dot] + [operand(arg) for arg in product.args])
+            summed = self.emit(block, "getattr", [numpy, "sum"])
+            return self.emit(block, "call", [summed, operand(value)])
+
+        if self.mode == "map":
+            array, target, value = self.store.args
+            self.emit(block, "store_element", [array, index(target), operand(value)])
+        elif self.mode == "reduce":
+            load, update, other = self.element_update
+            array, target, _ = self.store.args
+            element = self.emit(block, "get_element", [load.args[0], index(load.args[1])])
+            new = self.emit(block, update.op, [element, total(other)])
+            self.emit(block, "store_element", [array, index(target), new])
+        elif self.mode == "scatter":
+            _, _, other = self.element_update
+            array, target, _ = self.store.args
+            add = self.emit(block, "getattr", [numpy, "add"])
+            at = self.emit(block, "getattr", [add, "at"])
+            self.emit(block, "call", [at, array, index(target), operand(other)])
+        for phi, update in self.reductions:
+            initial = phi.args[1 - self.latch_index]
+            finals[phi.result] = self.emit(block, update.op, [initial, total(self.summand(update, phi.result))])
+        finals[loop.counter] = loop.stop
+        return finals
+
+    def fused_products(self):
+        # products of two arrays that are only summed become np.dot
+        summed = [self.summand(update, phi.result) for phi, update in self.reductions]
+        if self.mode == "reduce":
+            summed.append(self.element_update[2])
+        fused = {}
+        for value in summed:
+            instr = self.definitions.get(value)
+            if (
+                instr is not None
+                and instr.op == "mult"
+                and len(self.uses.get(value, ())) == 1
+                and all(self.kind(arg) in (_VECTOR, _COUNTER) for arg in instr.args)
+            ):
+                fused[value] = instr
+        return fused
+
+    def split_exit(self, join):
+        # gives the loop an exit of its own for the versions to meet in,
+        # e.g. when it leaves straight to an enclosing loop's header
+        loop = self.loop
+        branch = get_terminator(loop.header)
+        branch.args[2] = join.name
+        loop.header.successors[loop.header.successors.index(loop.exit)] = join
+        loop.exit.preds[loop.exit.preds.index(loop.header)] = join
+        join.instructions.append(SSAInstruction("jump", [loop.exit.name], None))
+        join.preds = [loop.header]
+        join.successors = [loop.exit]
+        self.cfg.add_block(join)
+        loop.exit = join
+
+    def link(self, checks, bounds, select, landing, vector):
+        loop = self.loop
+        cfg = self.cfg
+        for block in (checks, bounds, select, landing, vector):
+            cfg.add_block(block)
+        terminator = get_terminator(loop.preheader)
+        terminator.args = [checks.name if arg == loop.header.name else arg for arg in terminator.args]
+        position = loop.preheader.successors.index(loop.header)
+        loop.preheader.successors[position] = checks
+        checks.preds = [loop.preheader]
+        checks.successors = [bounds, select]
+        bounds.preds = [checks]
+        bounds.successors = [select]
+        select.preds = [checks, bounds]
+        select.successors = [vector, landing]
+        landing.preds = [select]
+        landing.successors = [loop.header]
+        loop.header.preds[loop.header.preds.index(loop.preheader)] = landing
+        vector.preds = [select]
+        vector.successors = [loop.exit]
+        loop.exit.preds.append(vector)
+        cfg.invalidate()
+
+    def merge_exit(self, vector, finals):
+        # header phis used after the loop now come from either version
+        loop = self.loop
+        merged = {}
+        for block in self.cfg.blocks:
+            if block in (loop.header, loop.body):
+                continue
+            for instr in block.instructions:
+                for arg in instr.args:
+                    if isinstance(arg, SSAValue) and arg in finals and arg not in merged:
+                        merged[arg] = self.new_value(arg.base)
+        phis = [SSAInstruction("phi", [value, finals[value]], merged[value]) for value in merged]
+        for block in self.cfg.blocks:
+            if block in (loop.header, loop.body) or block is vector:
+                continue
+            for instr in block.instructions:
+                instr.args = [merged.get(arg, arg) if isinstance(arg, SSAValue) else arg for arg in instr.args]
+        loop.exit.instructions[:0] = phis
+
+
+def vectorize_loops(cfg):
+    # Rewrites the vectorizable innermost loops of cfg in place (see the
+    # module comment). Returns the number of loops rewritten.
+    multiple_defs = {value for value, count in count_definitions(cfg.blocks).items() if count > 1}
+    new_value, new_block_name = fresh_names(cfg)
+
+    count = 0
+    for header in list(cfg.blocks):
+        loop = _find_loop(header)
+        if loop is None:
+            continue
+        if any(
+            instr.result in multiple_defs for block in (loop.header, loop.body) for instr in block.instructions
+        ):
+            continue
+        vectorizer = _Vectorizer(cfg, loop, new_value)
+        if not vectorizer.analyze():
+            continue
+        vectorizer.rewrite(new_block_name)
+        count += 1
+    return count
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project2 import MODULE_UNIT, SSA_CONSTRUCTION_MODES, ControlFlowGraph, build_units  # noqa: E402
+from ssa_codegen import compile_module  # noqa: E402
+from ssa_interp import Interpreter  # noqa: E402
+
+# Differential checks: a program converted to SSA, transformed and run (as
+# generated Python code and in the interpreter) must give what the
+# program itself gives, including the exception it raises.
+
+
+def outcome(function, args):
+    # the result of function(*args), or the type of the exception it raised
+    try:
+        return repr(function(*args))
+    except Exception as error:
+        return type(error)
+
+
+def native(source, name, args):
+    namespace = {}
+    exec(source, namespace)
+    return outcome(namespace[name], args)
+
+
+def unit_cfg(source, name, mode):
+    # the ControlFlowGraph of one unit of source
+    return ControlFlowGraph.from_blocks(build_units(source, mode)[name])
+
+
+def run_pass(source, name, mode, pass_):
+    # one unit's ControlFlowGraph after pass_(cfg), and what the pass returned
+    cfg = unit_cfg(source, name, mode)
+    return cfg, pass_(cfg)
+
+
+def count_ops(cfg, op):
+    return sum(instr.op == op for block in cfg.blocks for instr in block.instructions)
+
+
+def transformed(source, mode, transform):
+    # {unit name: blocks} with transform(cfg) applied to every function
+    # unit; the passes treat module variables as dead, so the module unit
+    # is left alone
+    units = build_units(source, mode)
+    for unit, blocks in list(units.items()):
+        if unit == MODULE_UNIT or transform is None:
+            continue
+        cfg = ControlFlowGraph.from_blocks(blocks)
+        transform(cfg)
+        units[unit] = cfg.blocks
+    return units
+
+
+def assert_same(source, name, args, mode, transform):
+    # args is a tuple, or a function making new arguments for each run
+    # (for programs that modify them)
+    make_args = args if callable(args) else lambda: args
+    expected = native(source, name, make_args())
+    units = transformed(source, mode, transform)
+    generated = compile_module(units)[name]
+    assert outcome(generated, make_args()) == expected
+    interpreted = Interpreter(units).run()[name]
+    assert outcome(interpreted, make_args()) == expected
+
+
+@pytest.fixture(params=sorted(SSA_CONSTRUCTION_MODES))
+def mode(request):
+    return request.param
@@ -0,0 +1,78 @@
+import os
+
+from project2 import SSACache, build_ssa
+
+SOURCES = [f"x = {i}\nwhile x < {i + 10}:\n    x = x + 1\n" for i in range(12)]
+
+
+def formatted(blocks):
+    return [str(block) for block in blocks]
+
+
+def test_hits_and_misses(tmp_path):
+    cache = SSACache(str(tmp_path))
+    first = cache.build(SOURCES[0])
+    second = cache.build(SOURCES[0])
+    cache.build(SOURCES[0], "cytron")
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert formatted(second) == formatted(first) == formatted(build_ssa(SOURCES[0]).blocks)
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = SSACache(str(tmp_path))
+    cache.build(SOURCES[0])
+    path = cache.path(cache.key(SOURCES[0]))
+    with open(path, "wb") as f:
+        f.write(b"not an entry")
+    assert formatted(cache.build(SOURCES[0])) == formatted(build_ssa(SOURCES[0]).blocks)
+    assert (cache.hits, cache.misses) == (0, 2)
+    # the entry was written again
+    assert cache.build(SOURCES[0]) is not None and cache.hits == 1
+
+
+def test_eviction_keeps_the_newest_entries_under_the_limit(tmp_path):
+    sizes = {}
+    probe = SSACache(str(tmp_path / "probe"))
+    for source in SOURCES:
+        probe.build(source)
+        sizes[source] = os.path.getsize(probe.path(probe.key(source)))
+    limit = sum(sizes.values()) // 2
+    cache = SSACache(str(tmp_path / "cache"), limit)
+    for n, source in enumerate(SOURCES):
+        cache.build(source)
+        path = cache.path(cache.key(source))
+        os.utime(path, (n, n))  # strictly increasing ages
+    entries = sorted(cache._entries())
+    total = sum(size for _, size, _ in entries)
+    assert total <= limit
+    assert cache.path(cache.key(SOURCES[-1])) in [path for _, _, path in entries]
+    # every evicted entry is older than every kept one
+    kept = {path for _, _, path in entries}
+    ages = [cache.path(cache.key(source)) in kept for source in SOURCES]
+    assert ages == sorted(ages)
+
+
+def test_eviction_goes_down_to_ninety_percent(tmp_path):
+    cache = SSACache(str(tmp_path), 10 ** 9)
+    for n, source in enumerate(SOURCES):
+        cache.build(source)
+        os.utime(cache.path(cache.key(source)), (n, n))
+    before = sorted(cache._entries())
+    cache.max_bytes = sum(size for _, size, _ in before) - 1
+    cache.build("y = 1\n")
+    after = list(cache._entries())
+    remaining = sum(size for _, size, _ in after)
+    target = cache.max_bytes * 9 // 10
+    assert remaining <= target
+    # the oldest entries went first, and no more of them than needed
+    evicted = before[:len(before) + 1 - len(after)]
+    assert {path for _, _, path in after} & {path for _, _, path in evicted} == set()
+    assert remaining + evicted[-1][1] > target
+
+
+def test_clear(tmp_path):
+    cache = SSACache(str(tmp_path))
+    for source in SOURCES[:3]:
+        cache.build(source)
+    cache.clear()
+    assert list(cache._entries()) == []
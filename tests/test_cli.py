@@ -0,0 +1,41 @@
+import pytest
+
+from project2 import main
+
+
+@pytest.fixture
+def sources(tmp_path):
+    root = tmp_path / "src"
+    (root / "pkg").mkdir(parents=True)
+    (root / "a.py").write_text("x = 1\nwhile x < 5:\n    x = x + 1\n")
+    (root / "pkg" / "b.py").write_text("def f(n):\n    return n + 1\n")
+    return root
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_converts_a_tree(sources, tmp_path, capsys, jobs):
+    out = tmp_path / "out"
+    assert main([str(sources), "-o", str(out), "-j", jobs]) == 0
+    assert "x_2 = phi(x_1, x_3)" in (out / "a.ssa").read_text()
+    assert "# function f" in (out / "pkg" / "b.ssa").read_text()
+    assert capsys.readouterr().err == ""
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_one_bad_file_fails_the_run(sources, tmp_path, capsys, jobs):
+    (sources / "bad.py").write_text("for i in range(3):\n    break\n")
+    out = tmp_path / "out"
+    assert main([str(sources), "-o", str(out), "-j", jobs]) == 1
+    # the other files are still converted
+    assert (out / "a.ssa").exists() and (out / "pkg" / "b.ssa").exists()
+    assert not (out / "bad.ssa").exists()
+    err = capsys.readouterr().err
+    assert "bad.py: NotImplementedError" in err
+    assert "1 of 3 files failed" in err
+
+
+def test_prints_to_stdout_in_order(sources, capsys):
+    assert main([str(sources / "pkg" / "b.py"), str(sources / "a.py"), "-j", "2", "--cache-dir",
+                 str(sources / "cache")]) == 0
+    out = capsys.readouterr().out
+    assert out.index("b.py") < out.index("a.py")
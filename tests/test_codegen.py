@@ -0,0 +1,75 @@
+import ast
+
+import pytest
+
+from conftest import native, outcome
+from project2 import build_units
+from ssa_codegen import compile_function, compile_module, literal_expr, module_source
+
+
+def evaluate(operand):
+    return eval(compile(ast.fix_missing_locations(ast.Expression(literal_expr(operand))), "<test>", "eval"))
+
+
+@pytest.mark.parametrize("operand", ['"abc"', '"say \\"hi\\"\\n"', "[1, 2]", "range(3)", 4, None, float("inf")])
+def test_literal_expr(operand):
+    expected = operand if not isinstance(operand, str) else eval(operand)
+    assert evaluate(operand) == expected
+
+
+def test_list_literal_is_rebuilt():
+    assert evaluate("[1, 2]") is not evaluate("[1, 2]")
+
+
+def test_generated_module_runs(mode):
+    source = """
+def g(a, b=2):
+    return a * b
+
+def f(n):
+    s = 'say "hi"\\n'
+    total = 0
+    for i in range(n):
+        if i > 2:
+            total = total + g(i, b=3)
+    return s, total
+
+x = f(5)
+"""
+    namespace = compile_module(build_units(source, mode))
+    expected = {}
+    exec(source, expected)
+    assert namespace["x"] == expected["x"]
+    assert outcome(namespace["g"], (4,)) == native(source, "g", (4,))
+
+
+def test_structured_control_flow(mode):
+    # a loop with a branch needs no block dispatch loop
+    source = """
+def f(n):
+    s = 0
+    for i in range(n):
+        if i > 2:
+            s = s + i
+    return s
+"""
+    text = module_source(build_units(source, mode))
+    assert "_ssa_block" not in text
+    compile(text, "<test>", "exec")
+
+
+def test_compile_function(mode):
+    blocks = build_units("def f(a, b):\n    return a - b\n", mode)["f"]
+    function = compile_function(blocks, "f", defaults=(1,))
+    assert function(5) == 4
+    assert function.__name__ == "f"
+
+
+def test_module_level_builtins(mode):
+    source = """
+y = len([1, 2])
+if y > 1:
+    y = abs(-y) + min(y, 7)
+"""
+    namespace = compile_module(build_units(source, mode))
+    assert namespace["y"] == 4
@@ -0,0 +1,40 @@
+from conftest import unit_cfg
+from ssa_passes import count_definitions
+
+LOOPS = """
+def f(n, xs):
+    s = 0
+    for i in range(n):
+        j = 0
+        while j < i:
+            s = s + j
+            j = j + 1
+        i = 10
+    for x in xs:
+        if x > s:
+            s = x
+    return s
+"""
+
+
+def test_every_value_is_defined_once(mode):
+    counts = count_definitions(unit_cfg(LOOPS, "f", mode).blocks)
+    assert all(count == 1 for count in counts.values())
+
+
+def test_phis_match_predecessors(mode):
+    for block in unit_cfg(LOOPS, "f", mode).blocks:
+        for instr in block.instructions:
+            if instr.op == "phi":
+                assert len(instr.args) == len(block.preds)
+                assert len(block.preds) > 1
+
+
+def test_braun_loop_headers_get_phis():
+    # each loop header (a block with a back edge into it) carries the phis
+    # of the variables the loop assigns, the hidden counter included
+    cfg = unit_cfg(LOOPS, "f", "braun")
+    headers = [block for block in cfg.blocks if any(cfg.dominates(block, pred) for pred in block.preds)]
+    assert len(headers) == 3
+    for header in headers:
+        assert any(instr.op == "phi" for instr in header.instructions)
@@ -0,0 +1,72 @@
+from conftest import assert_same, count_ops, run_pass, unit_cfg
+from ssa_passes import dead_code_elimination, live_instructions, sparse_conditional_constant_propagation
+
+SOURCE = """
+def unused(k):
+    t = 0
+    for i in range(k):
+        u = i * 2 + 1
+        t = t + 1
+    return k
+
+def raising(x):
+    t = x[10]
+    u = 1 // x[0]
+    return 0
+
+def side_effects(xs):
+    ys = xs
+    ys.append(1)
+    return 0
+
+def straight_line(a):
+    x = 3
+    if x > 2:
+        b = a + 1
+    else:
+        b = a - 1
+    return b
+"""
+
+
+def eliminated(name, mode):
+    return run_pass(SOURCE, name, mode, dead_code_elimination)
+
+
+def test_unused_values_and_phi_cycles_are_removed(mode):
+    # t and u feed nothing live: t's phi cycle and the arithmetic go
+    cfg, removed = eliminated("unused", mode)
+    assert removed
+    assert count_ops(cfg, "mult") == 0
+    assert not any(
+        instr.result.base == "t" for block in cfg.blocks for instr in block.instructions if instr.result is not None
+    )
+    assert_same(SOURCE, "unused", (3,), mode, dead_code_elimination)
+
+
+def test_operations_that_may_raise_are_kept(mode):
+    cfg, _ = eliminated("raising", mode)
+    assert count_ops(cfg, "get_element") == 2
+    assert count_ops(cfg, "floordiv") == 1
+    assert_same(SOURCE, "raising", ([1],), mode, dead_code_elimination)
+    assert_same(SOURCE, "raising", ([0] * 11,), mode, dead_code_elimination)
+
+
+def test_calls_are_roots(mode):
+    cfg, _ = eliminated("side_effects", mode)
+    assert count_ops(cfg, "call") == 1
+    cfg = unit_cfg(SOURCE, "side_effects", mode)
+    calls = [instr for block in cfg.blocks for instr in block.instructions if instr.op == "call"]
+    assert {id(instr) for instr in calls} <= live_instructions(cfg)
+
+
+def test_blocks_are_merged(mode):
+    # once SCCP turned the branch into a jump, the blocks left form one
+    # straight line
+    def fold_and_eliminate(cfg):
+        sparse_conditional_constant_propagation(cfg)
+        dead_code_elimination(cfg)
+
+    cfg, _ = run_pass(SOURCE, "straight_line", mode, fold_and_eliminate)
+    assert len(cfg.blocks) == 1
+    assert_same(SOURCE, "straight_line", (4,), mode, fold_and_eliminate)
@@ -0,0 +1,86 @@
+import math
+
+import pytest
+
+from project2 import SSAInstruction, build_ssa, build_units
+from ssa_format import dump_binary, dumps_binary, dumps_text, load_binary, loads_binary, loads_text
+
+CONSTANTS = [
+    '"say \\"hi\\"\\n"',
+    "'q\"'",
+    "[1, 'a, b']",
+    0.0,
+    -0.0,
+    float("inf"),
+    float("-inf"),
+    float("nan"),
+    1.5,
+    complex(0, -0.0),
+    1 + 2j,
+    complex(float("inf"), float("nan")),
+    None,
+    True,
+    -7,
+    2 ** 40,
+]
+
+
+def program():
+    converter = build_ssa("x = 1\nwhile x < 10:\n    x = x + 1\n")
+    value = converter.get_new_var("t")
+    converter.blocks[0].instructions.insert(0, SSAInstruction("build_tuple", CONSTANTS, value))
+    return converter.blocks
+
+
+def same_operand(a, b):
+    if isinstance(a, complex):
+        return isinstance(b, complex) and same_operand(a.real, b.real) and same_operand(a.imag, b.imag)
+    if isinstance(a, float):
+        # tells -0.0 from 0.0 and matches nan with nan
+        return isinstance(b, float) and math.copysign(1, a) == math.copysign(1, b) and (a == b or a != a and b != b)
+    return type(a) is type(b) and a == b
+
+
+def assert_same_blocks(actual, expected):
+    assert [block.name for block in actual] == [block.name for block in expected]
+    for a, b in zip(actual, expected):
+        assert [pred.name for pred in a.preds] == [pred.name for pred in b.preds]
+        assert [succ.name for succ in a.successors] == [succ.name for succ in b.successors]
+        assert [instr.op for instr in a.instructions] == [instr.op for instr in b.instructions]
+        for x, y in zip(a.instructions, b.instructions):
+            assert str(x.result) == str(y.result)
+            assert len(x.args) == len(y.args)
+            for arg, other in zip(x.args, y.args):
+                if hasattr(other, "base"):
+                    assert str(arg) == str(other)
+                else:
+                    assert same_operand(arg, other), (arg, other)
+
+
+@pytest.mark.parametrize(
+    "dumps, loads", [(dumps_text, loads_text), (dumps_binary, loads_binary)], ids=["text", "binary"]
+)
+def test_round_trip(dumps, loads):
+    blocks = program()
+    assert_same_blocks(loads(dumps(blocks)), blocks)
+
+
+def test_text_is_stable():
+    text = dumps_text(program())
+    assert dumps_text(loads_text(text)) == text
+
+
+def test_converted_units_round_trip(mode, tmp_path):
+    source = """
+def f(n, xs):
+    s = 'a "b"\\n'
+    for i in range(n):
+        s = s + str(xs[i] * 1.5e-300)
+    return s, -0.0, 2j
+"""
+    for name, blocks in build_units(source, mode).items():
+        path = tmp_path / "unit.ssab"
+        with open(path, "wb") as f:
+            dump_binary(blocks, f)
+        assert_same_blocks(load_binary(path), blocks)
+        assert_same_blocks(loads_text(dumps_text(blocks)), blocks)
@@ -0,0 +1,62 @@
+from conftest import assert_same, count_ops, run_pass
+from ssa_passes import global_value_numbering
+
+SOURCE = """
+def repeated(k):
+    t = 0
+    for i in range(k):
+        a = i * 2 + 1
+        b = 1 + 2 * i
+        t = t + a * b
+    return t
+
+def branches(k, c):
+    t = 0
+    for i in range(k):
+        if c:
+            a = i * 3
+        else:
+            a = i * 3
+        t = t + a - i * 3
+    return t
+
+def lists(a, b):
+    x = a + b
+    y = a + b
+    x.append(1)
+    return y
+
+def copies(s):
+    m = s
+    k = m
+    return k
+"""
+
+
+def numbered(name, mode):
+    return run_pass(SOURCE, name, mode, global_value_numbering)
+
+
+def test_commutative_int_expressions_are_merged(mode):
+    cfg, _ = numbered("repeated", mode)
+    assert count_ops(cfg, "mult") == 2  # i * 2 and a * b
+    assert_same(SOURCE, "repeated", (5,), mode, global_value_numbering)
+
+
+def test_only_dominating_expressions_are_reused(mode):
+    # neither branch dominates the other or the join, so all three stay
+    cfg, _ = numbered("branches", mode)
+    assert count_ops(cfg, "mult") == 3
+    assert_same(SOURCE, "branches", (5, True), mode, global_value_numbering)
+
+
+def test_operations_on_unknown_types_are_not_merged(mode):
+    cfg, _ = numbered("lists", mode)
+    assert count_ops(cfg, "add") == 2
+    assert_same(SOURCE, "lists", lambda: ([1], [2]), mode, global_value_numbering)
+
+
+def test_copies_are_propagated(mode):
+    cfg, removed = numbered("copies", mode)
+    assert count_ops(cfg, "assign") == 0
+    assert removed == 2
@@ -0,0 +1,116 @@
+import pytest
+
+from conftest import native, outcome
+from project2 import build_units
+from ssa_interp import Interpreter, literal_value
+
+
+def interpreted(source, name, args, mode):
+    return outcome(Interpreter(build_units(source, mode)).run()[name], args)
+
+
+@pytest.mark.parametrize(
+    "operand, value",
+    [
+        ('"abc"', "abc"),
+        ('"say \\"hi\\"\\n"', 'say "hi"\n'),
+        ("[1, 2]", [1, 2]),
+        ("range(3)", range(3)),
+        (4, 4),
+    ],
+)
+def test_literal_value(operand, value):
+    assert literal_value(operand) == value
+
+
+def test_string_constants(mode):
+    source = """
+def f():
+    a = 'say "hi"\\n'
+    b = ["back\\\\slash", 'q"']
+    return a + "\\t", b, len(a)
+"""
+    assert interpreted(source, "f", (), mode) == native(source, "f", ())
+
+
+def test_keyword_arguments(mode):
+    source = """
+def g(a, b, c=3):
+    return a - b * c
+
+def f(x):
+    return g(x, c=2, b=5), g(b=1, a=x)
+"""
+    assert interpreted(source, "f", (10,), mode) == native(source, "f", (10,))
+
+
+def test_keyword_argument_errors(mode):
+    source = """
+def g(a, b=1):
+    return a + b
+"""
+    functions = Interpreter(build_units(source, mode)).run()
+    assert functions["g"](b=2, a=1) == 3
+    with pytest.raises(TypeError):
+        functions["g"](1, a=2)
+    with pytest.raises(TypeError):
+        functions["g"](c=2)
+
+
+def test_module_variables_and_functions(mode):
+    source = """
+def square(v):
+    return v * v
+
+total = 0
+for i in range(4):
+    total = total + square(i)
+"""
+    namespace = Interpreter(build_units(source, mode)).run()
+    assert (namespace["total"], namespace["i"]) == (14, 3)
+    assert namespace["square"](5) == 25
+
+
+def test_exceptions_propagate(mode):
+    source = """
+def f(x):
+    return x[3]
+"""
+    assert interpreted(source, "f", ([1],), mode) is IndexError
+
+
+def test_instruction_counts(mode):
+    source = """
+def f(n):
+    s = 0
+    for i in range(n):
+        s = s + i
+    return s
+"""
+    interpreter = Interpreter(build_units(source, mode))
+    function = interpreter.run()["f"]
+    before = interpreter.instructions_executed
+    function(2)
+    short = interpreter.instructions_executed - before
+    function(4)
+    assert interpreter.instructions_executed - before - short > short
+    assert interpreter.compile("f").static_count > 0
+
+
+def test_phi_arity_is_checked(mode):
+    units = build_units("def f(n):\n    while n > 0:\n        n = n - 1\n    return n\n", mode)
+    phi = next(instr for block in units["f"] for instr in block.instructions if instr.op == "phi")
+    phi.args.append(0)
+    with pytest.raises(ValueError):
+        Interpreter(units).run()["f"](1)
+
+
+def test_module_level_builtins(mode):
+    source = """
+y = len([1, 2])
+for i in range(3):
+    y = max(y, abs(i - 5))
+z = str(y) + "!"
+"""
+    namespace = Interpreter(build_units(source, mode)).run()
+    assert (namespace["y"], namespace["z"]) == (5, "5!")
@@ -0,0 +1,81 @@
+import pytest
+
+from conftest import assert_same, count_ops, run_pass
+from ssa_loops import find_loops, induction_variables, strength_reduction, trip_count
+from ssa_passes import dead_code_elimination, optimize
+
+SOURCE = """
+def nested(n):
+    s = 0
+    for i in range(n):
+        for j in range(3):
+            s = s + i * 4 + j
+    return s
+
+def scaled(n):
+    s = 0
+    for i in range(n):
+        s = s + i * 4
+    return s
+
+def up():
+    s = 0
+    for i in range(2, 11, 3):
+        s = s + i
+    return s
+
+def down():
+    s = 0
+    for i in range(10, 0, -2):
+        s = s + i
+    return s
+
+def unknown(n):
+    s = 0
+    for i in range(n):
+        s = s + i
+    return s
+"""
+
+
+def optimized(name, mode):
+    return run_pass(SOURCE, name, mode, optimize)[0]
+
+
+def test_nested_loops(mode):
+    loops = find_loops(optimized("nested", mode))
+    assert [loop.depth for loop in loops] == [1, 2]
+    assert loops[1].parent is loops[0]
+
+
+def test_basic_and_derived_induction_variables(mode):
+    cfg = optimized("scaled", mode)
+    [loop] = find_loops(cfg)
+    ivs = induction_variables(cfg, loop)
+    basic = [iv for iv in ivs.values() if iv.is_basic]
+    assert [(iv.start, iv.step) for iv in basic] == [(0, 1)]
+    assert any(not iv.is_basic and iv.op == "mult" and iv.scale == 4 for iv in ivs.values())
+
+
+@pytest.mark.parametrize("name, trips", [("up", 3), ("down", 5), ("unknown", None)])
+def test_trip_count(mode, name, trips):
+    cfg = optimized(name, mode)
+    [loop] = find_loops(cfg)
+    assert trip_count(cfg, loop) == trips
+
+
+def reduce(cfg):
+    optimize(cfg)
+    count = strength_reduction(cfg)
+    dead_code_elimination(cfg)
+    return count
+
+
+def test_multiplication_is_reduced(mode):
+    cfg, count = run_pass(SOURCE, "scaled", mode, reduce)
+    assert count > 0
+    [loop] = find_loops(cfg)
+    assert not any(instr.op == "mult" for block in loop.blocks for instr in block.instructions)
+    assert count_ops(cfg, "mult") == 0
+    for n in (0, 1, 7):
+        assert_same(SOURCE, "scaled", (n,), mode, reduce)
@@ -0,0 +1,272 @@
+import pytest
+
+numba = pytest.importorskip("numba")
+
+import numpy as np  # noqa: E402
+from numba import njit, types  # noqa: E402
+from numba.typed import Dict  # noqa: E402
+
+from numba_pass import MyCompiler, MyParallelCompiler  # noqa: E402
+from sample_codes.matrix_codes import dense_mv, matmul  # noqa: E402
+from sample_codes.sparse_codes import coo_mv, csr_mv, random_coo, random_csr  # noqa: E402
+
+# Each function is compiled with both custom pipelines and must give what
+# it gives as plain Python: the same result, the same changes to its
+# (array) arguments, or the same exception type.
+
+PIPELINES = {
+    "serial": lambda function: njit(pipeline_class=MyCompiler)(function),
+    "parallel": lambda function: njit(parallel=True, pipeline_class=MyParallelCompiler)(function),
+}
+
+
+@pytest.fixture(params=sorted(PIPELINES))
+def pipeline(request):
+    return PIPELINES[request.param]
+
+
+def run(function, args):
+    try:
+        return function(*args), args
+    except Exception as error:
+        return type(error), args
+
+
+def assert_equal(actual, expected):
+    if isinstance(expected, (tuple, list)):
+        assert len(actual) == len(expected)
+        for a, b in zip(actual, expected):
+            assert_equal(a, b)
+    elif isinstance(expected, np.ndarray):
+        np.testing.assert_allclose(actual, expected)
+    elif isinstance(expected, type):
+        assert actual is expected
+    else:
+        assert actual == expected
+
+
+def assert_matches(function, make_args, pipeline):
+    assert_equal(run(pipeline(function), make_args()), run(function, make_args()))
+
+
+def unused_lookup(d, k):
+    x = d[k]
+    return 1
+
+
+def unused_division(a, b):
+    x = a // b
+    y = a % b
+    return 1
+
+
+def empty_dict():
+    return Dict.empty(types.int64, types.int64)
+
+
+@pytest.mark.parametrize(
+    "function, make_args",
+    [
+        (unused_lookup, lambda: (empty_dict(), 3)),
+        (unused_division, lambda: (1, 0)),
+        (unused_division, lambda: (7, 2)),
+    ],
+)
+def test_dce_keeps_operations_that_raise(function, make_args):
+    # only the serial pipeline: with parallel=True numba's own dead code
+    # removal drops such unused operations too
+    assert_matches(function, make_args, PIPELINES["serial"])
+
+
+def parfor_count(dispatcher):
+    metadata = dispatcher.overloads[dispatcher.signatures[0]].metadata
+    return len(metadata["parfor_diagnostics"].initial_parfors)
+
+
+def doubled_sum(a, n):
+    s = 0
+    for i in range(n):
+        s = s + a[i] * 2
+    return s
+
+
+def offset_sum(a, n):
+    s = 0
+    for i in range(n):
+        s = s + a[i] * 2 + 1
+    return s
+
+
+@pytest.mark.parametrize("function, parfors", [(doubled_sum, 1), (offset_sum, 0)])
+def test_only_supported_reductions_run_in_parallel(function, parfors):
+    # the parfor lowering rejects an accumulator combined twice per iteration
+    compiled = PIPELINES["parallel"](function)
+    a = np.arange(7)
+    assert compiled(a, 7) == function(a, 7)
+    assert parfor_count(compiled) == parfors
+
+
+def invariant_lookup(d, k, n):
+    s = 0
+    for i in range(n):
+        s = s + d[k]
+    return s
+
+
+def invariant_shape(a, n):
+    s = 0
+    for i in range(n):
+        s = s + a.shape[0] * 2 + a[i % a.shape[0]]
+    return s
+
+
+def typed_list():
+    return numba.typed.List([1, 2])
+
+
+@pytest.mark.parametrize(
+    "function, make_args",
+    [
+        (invariant_lookup, lambda: (empty_dict(), 3, 0)),
+        (invariant_lookup, lambda: (typed_list(), 5, 0)),
+        (invariant_lookup, lambda: ((1, 2), 5, 0)),
+        (invariant_lookup, lambda: (np.arange(3), 1, 4)),
+        (invariant_shape, lambda: (np.arange(4), 6)),
+        (invariant_shape, lambda: (np.arange(4), 0)),
+    ],
+)
+def test_licm_does_not_hoist_lookups_of_zero_trip_loops(function, make_args, pipeline):
+    assert_matches(function, make_args, pipeline)
+
+
+def mm(C, A, B, m, n, k):
+    for i in range(m):
+        for j in range(n):
+            for p in range(k):
+                C[i, j] += A[i, p] * B[p, j]
+    return C
+
+
+def mv(y, A, x, m, k):
+    for i in range(m):
+        for p in range(k):
+            y[i] += A[i, p] * x[p]
+    return y
+
+
+def square():
+    return np.arange(36.0).reshape(6, 6)
+
+
+@pytest.mark.parametrize(
+    "function, make_args",
+    [
+        (mm, lambda: (np.ones((6, 6)), square(), square(), 6, 6, 6)),
+        (mm, lambda: (np.ones((6, 6)), square(), square(), 4, 3, 5)),
+        (mm, lambda: (np.ones((6, 6)), square(), square(), -2, 6, 6)),
+        (mm, lambda: (np.ones((6, 6)), square(), square(), 6, 6, -1)),
+        (mv, lambda: (np.ones(6), square(), np.arange(6.0), 6, 6)),
+        (mv, lambda: (np.ones(6), square(), np.arange(6.0), 3, 4)),
+        (mv, lambda: (np.ones(6), square(), np.arange(6.0), 6, -1)),
+        (mv, lambda: (np.ones(6), square(), np.arange(6.0), -3, 6)),
+    ],
+)
+def test_gemm_and_gemv_bounds(function, make_args, pipeline):
+    # sub-bounds take a slice of the operands, and a negative bound is an
+    # empty loop rather than a slice from the end
+    assert_matches(function, make_args, pipeline)
+
+
+@pytest.mark.parametrize(
+    "function, make_args",
+    [
+        (mm, lambda: (square(), square(), square(), 6, 6, 6)),
+        (mm, lambda: (square(), np.ones((6, 6)), square(), 6, 6, 6)),
+        (mv, lambda: (np.arange(6.0), square(), np.arange(6.0), 6, 6)),
+    ],
+)
+def test_gemm_and_gemv_with_aliased_output(function, make_args, pipeline):
+    # the output is also an input, so each update must see the earlier ones
+    assert_matches(function, make_args, pipeline)
+
+
+def csr_accumulate(y, indptr, indices, data, x, n):
+    for i in range(n):
+        for p in range(indptr[i], indptr[i + 1]):
+            y[i] += data[p] * x[indices[p]]
+    return y
+
+
+def csr_matrix(dtype=np.float64):
+    indptr, indices, data = random_csr(40, 40, 0.2, skew=1.5, seed=1)
+    return indptr, indices, data.astype(dtype)
+
+
+def csr_args(n=40, dtype=np.float64, aliased=False):
+    indptr, indices, data = csr_matrix(dtype)
+    y = np.ones(40)
+    x = y if aliased else np.arange(40.0)
+    return y, indptr, indices, data, x, n
+
+
+@pytest.mark.parametrize(
+    "make_args",
+    [
+        lambda: csr_args(),
+        lambda: csr_args(n=17),
+        lambda: csr_args(n=0),
+        lambda: csr_args(aliased=True),
+        lambda: csr_args(dtype=np.float32),
+    ],
+)
+def test_csr_spmv(make_args, pipeline):
+    assert_matches(csr_accumulate, make_args, pipeline)
+
+
+@pytest.mark.parametrize(
+    "function, make_args",
+    [
+        (matmul, lambda: (square(), np.arange(30.0).reshape(6, 5))),
+        (dense_mv, lambda: (square(), np.arange(6.0))),
+        (csr_mv, lambda: csr_matrix() + (np.arange(40.0),)),
+        (coo_mv, lambda: random_coo(40, 30, 0.2, seed=2) + (np.arange(30.0), 40)),
+    ],
+)
+def test_sample_kernels(function, make_args, pipeline):
+    assert_matches(function, make_args, pipeline)
+
+
+def transpose(a):
+    out = np.empty((a.shape[1], a.shape[0]))
+    for i in range(a.shape[1]):
+        for j in range(a.shape[0]):
+            out[i, j] = a[j, i]
+    return out
+
+
+def column_sums(a):
+    out = np.zeros(a.shape[1])
+    for i in range(a.shape[0]):
+        for j in range(a.shape[1]):
+            out[j] += a[i, j]
+    return out
+
+
+class TiledBy3(MyCompiler):
+    tile_size = 3
+
+
+class TiledByLoop(MyCompiler):
+    tile_size = (2, 5)
+
+
+class Untiled(MyCompiler):
+    tile_size = None
+
+
+@pytest.mark.parametrize("compiler", [MyCompiler, TiledBy3, TiledByLoop, Untiled])
+@pytest.mark.parametrize("function", [transpose, column_sums])
+def test_loop_tiling(function, compiler):
+    # tile sizes that do not divide the loop bounds leave partial tiles
+    a = np.arange(35.0).reshape(7, 5)
+    np.testing.assert_allclose(njit(pipeline_class=compiler)(function)(a), function(a))
@@ -0,0 +1,240 @@
+import pytest
+
+from conftest import assert_same
+from ssa_loops import strength_reduction
+from ssa_passes import (
+    dead_code_elimination,
+    global_value_numbering,
+    optimize,
+    sparse_conditional_constant_propagation,
+)
+from ssa_types import simplify_arithmetic
+from ssa_unroll import unroll_loops
+
+
+def _strength_reduction(cfg):
+    optimize(cfg)
+    strength_reduction(cfg)
+    dead_code_elimination(cfg)
+
+
+TRANSFORMS = {
+    "none": None,
+    "sccp": sparse_conditional_constant_propagation,
+    "simplify_arithmetic": simplify_arithmetic,
+    "gvn": global_value_numbering,
+    "dce": dead_code_elimination,
+    "optimize": optimize,
+    "strength_reduction": _strength_reduction,
+    "unroll": unroll_loops,
+    "unroll_partially": lambda cfg: unroll_loops(cfg, budget=64, factor=3),
+}
+
+PROGRAMS = {
+    "counted_loops": (
+        """
+def f(n):
+    total = 0
+    for i in range(n):
+        for j in range(3):
+            total = total + i * 4 + j
+    k = 0
+    while k < n:
+        total = total - k * k
+        k = k + 2
+    return total, k
+""",
+        (10,),
+    ),
+    "constant_trips": (
+        """
+def f():
+    s = 0
+    for i in range(5):
+        s = s + i * 3
+    return s
+""",
+        (),
+    ),
+    "branches": (
+        """
+def f(a, b):
+    x = 0
+    if a > b:
+        x = a - b
+        if x > 3:
+            return x
+    else:
+        y = b * 2
+        x = y + 1
+    return x + a
+""",
+        (7, 2),
+    ),
+    "loop_target_reassigned": (
+        """
+def f(items):
+    out = []
+    for i in range(3):
+        out.append(i)
+        i = 10
+    for x in items:
+        out.append(x)
+    return out, i, x
+""",
+        ([4, 5],),
+    ),
+    "range_steps": (
+        """
+def f(a, b, c):
+    out = []
+    for i in range(5, 0, -1):
+        out.append(i)
+    for i in range(a, b, c):
+        out.append(i)
+    for i in range(b, a, -c):
+        out.append(i)
+    return out
+""",
+        (10, 1, -2),
+    ),
+    "early_return_in_loop": (
+        """
+def f(xs, target):
+    for i in range(len(xs)):
+        if xs[i] == target:
+            return i
+    return -1
+""",
+        ([3, 1, 4, 1, 5], 4),
+    ),
+    "type_gated_identities": (
+        """
+def f(x, s, l):
+    a = x - x
+    b = x * 0
+    c = s * 0
+    d = l * 1
+    e = s + ""
+    return a, b, c, d, e
+""",
+        (float("nan"), "ab", [1, 2]),
+    ),
+    "string_constants": (
+        """
+def f():
+    x = "1"
+    y = x * 0
+    z = x + x
+    return y, z
+""",
+        (),
+    ),
+    "quoted_strings": (
+        """
+def f(n):
+    s = 'say "hi"\\n'
+    for i in range(n):
+        s = s + "\\t\\\\" + 'q"'
+    return s, ["a\\nb", 'c"d']
+""",
+        (2,),
+    ),
+    "huge_constants": (
+        """
+def f():
+    return 2 ** 200, 1 << 70
+""",
+        (),
+    ),
+}
+
+# Miscompiles found in review, each checked against every transform.
+REGRESSIONS = {
+    # a copy of a list literal is the same list, not a new one
+    "aliasing": (
+        """
+def f():
+    x = [1, 2]
+    y = x
+    y[0] = 5
+    return x[0]
+""",
+        (),
+    ),
+    # a + b on lists builds a new list each time it is evaluated
+    "repeated_list_add": (
+        """
+def f(a, b):
+    x = a + b
+    y = a + b
+    x.append(1)
+    n = len(y)
+    y.append(2)
+    return y, n, len(y)
+""",
+        lambda: ([1], [2]),
+    ),
+    # + on strings (and lists, tuples) is not commutative
+    "commutativity": (
+        """
+def f(a, b):
+    return a + b, b + a
+""",
+        ("a", "b"),
+    ),
+    # unused operations that raise must still raise
+    "raising_get_element": (
+        """
+def f(x):
+    t = x[10]
+    return 0
+""",
+        ([1],),
+    ),
+    "raising_division": (
+        """
+def f(x):
+    t = 1 // x
+    u = 1 % x
+    return 0
+""",
+        (0,),
+    ),
+    # a loop's else clause runs after the loop ends
+    "loop_else": (
+        """
+def f(n, xs):
+    s = 0
+    for i in range(n):
+        s = s + i
+    else:
+        s = s * 10
+    while s > 100:
+        s = s - 7
+    else:
+        t = s
+    for x in xs:
+        s = s + x
+    else:
+        if s > t:
+            return s, t
+    return -s
+""",
+        (5, [1, 2]),
+    ),
+}
+
+
+@pytest.mark.parametrize("transform", sorted(TRANSFORMS))
+@pytest.mark.parametrize("program", sorted(PROGRAMS))
+def test_transform_preserves_result(program, transform, mode):
+    source, args = PROGRAMS[program]
+    assert_same(source, "f", args, mode, TRANSFORMS[transform])
+
+
+@pytest.mark.parametrize("transform", sorted(TRANSFORMS))
+@pytest.mark.parametrize("program", sorted(REGRESSIONS))
+def test_regression(program, transform, mode):
+    source, args = REGRESSIONS[program]
+    assert_same(source, "f", args, mode, TRANSFORMS[transform])
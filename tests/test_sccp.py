@@ -0,0 +1,59 @@
+from conftest import assert_same, count_ops, run_pass
+from ssa_passes import sparse_conditional_constant_propagation
+
+SOURCE = """
+def known_branch():
+    x = 3
+    if x > 2:
+        y = x * 2
+    else:
+        y = 0
+    return y
+
+def loop_constant(n):
+    k = 5
+    for i in range(n):
+        k = 5
+    return k
+
+def unknown(n):
+    k = 0
+    for i in range(n):
+        k = k + 1
+    return k
+
+def division_by_zero():
+    return 1 // 0
+"""
+
+
+def propagated(name, mode):
+    cfg, deleted = run_pass(SOURCE, name, mode, sparse_conditional_constant_propagation)
+    returns = [instr for block in cfg.blocks for instr in block.instructions if instr.op == "return"]
+    return cfg, deleted, returns
+
+
+def test_known_branch_is_folded(mode):
+    cfg, deleted, returns = propagated("known_branch", mode)
+    assert deleted
+    assert count_ops(cfg, "branch") == 0
+    assert [instr.args for instr in returns] == [[6]]
+
+
+def test_constant_through_loop_phi(mode):
+    _, _, returns = propagated("loop_constant", mode)
+    assert [instr.args for instr in returns] == [[5]]
+    assert_same(SOURCE, "loop_constant", (3,), mode, sparse_conditional_constant_propagation)
+
+
+def test_varying_value_is_kept(mode):
+    cfg, deleted, returns = propagated("unknown", mode)
+    assert not deleted
+    assert count_ops(cfg, "branch") == 1
+    assert_same(SOURCE, "unknown", (4,), mode, sparse_conditional_constant_propagation)
+
+
+def test_raising_operation_is_not_folded(mode):
+    cfg, _, _ = propagated("division_by_zero", mode)
+    assert count_ops(cfg, "floordiv") == 1
+    assert_same(SOURCE, "division_by_zero", (), mode, sparse_conditional_constant_propagation)
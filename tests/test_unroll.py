@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import assert_same, unit_cfg
+from project2 import MODULE_UNIT, ControlFlowGraph, build_units
+from ssa_codegen import compile_module
+from ssa_interp import Interpreter
+from ssa_loops import find_loops
+from ssa_unroll import unroll_loops
+
+SOURCE = """
+def fixed():
+    s = 0
+    for i in range(5):
+        s = s + i * 3
+    return s
+
+def counted(n):
+    s = 0
+    for i in range(n):
+        s = s + i
+    return s
+"""
+
+
+def unroll(source, name, mode, **options):
+    # (loops unrolled, loops left) in the unit name
+    cfg = unit_cfg(source, name, mode)
+    return unroll_loops(cfg, **options), len(find_loops(cfg))
+
+
+def test_constant_trip_loop_is_unrolled_fully(mode):
+    assert unroll(SOURCE, "fixed", mode) == (1, 0)
+    assert_same(SOURCE, "fixed", (), mode, unroll_loops)
+
+
+@pytest.mark.parametrize("n", [0, 1, 5, 11])
+def test_counted_loop_is_unrolled_partially(mode, n):
+    assert unroll(SOURCE, "counted", mode, factor=3) == (1, 2)  # main and remainder loop
+    assert_same(SOURCE, "counted", (n,), mode, lambda cfg: unroll_loops(cfg, factor=3))
+
+
+def test_module_unit_keeps_its_variables(mode):
+    source = """
+x = 0
+for i in range(0, 10):
+    x = x + i
+"""
+    units = build_units(source, mode)
+    cfg = ControlFlowGraph.from_blocks(units[MODULE_UNIT])
+    assert unroll_loops(cfg, module=True) == 1
+    units[MODULE_UNIT] = cfg.blocks
+    expected = {}
+    exec(source, expected)
+    for namespace in (Interpreter(units).run(), compile_module(units)):
+        assert (namespace["x"], namespace["i"]) == (expected["x"], expected["i"])
@@ -0,0 +1,110 @@
+import pytest
+
+from conftest import assert_same, transformed
+from ssa_passes import optimize
+from ssa_vectorize import vectorize_loops
+
+np = pytest.importorskip("numpy")
+
+SOURCE = """
+import numpy as np
+
+def saxpy(a, x, y, n):
+    for i in range(n):
+        y[i] = a * x[i] + y[i]
+    return y
+
+def dot(x, y, n):
+    s = 0.0
+    for i in range(n):
+        s = s + x[i] * y[i]
+    return s
+
+def shift(x, n):
+    for i in range(n - 1):
+        x[i + 1] = x[i]
+    return x
+
+def gather(x, idx, out):
+    for i in range(idx.shape[0]):
+        out[i] = x[idx[i]] * 2
+    return out
+
+def scatter_add(idx, w, out):
+    for i in range(idx.shape[0]):
+        out[idx[i]] += w[i]
+    return out
+
+def cubes(n):
+    s = 0
+    for i in range(n):
+        s = s + i * i * i
+    return s
+
+def total(x, n):
+    s = 0
+    for i in range(n):
+        s = s + x[i]
+    return s
+
+def counter_sum(n):
+    s = 0
+    for i in range(n):
+        s = s + i
+    return s
+"""
+
+# integer-valued floats, so summing in another order gives the same result
+ARGS = {
+    "saxpy": lambda: (2.0, np.arange(8.0), np.ones(8), 8),
+    "dot": lambda: (np.arange(8.0), np.arange(8.0), 8),
+    "shift": lambda: (np.arange(6.0), 6),
+    # the vectorized loop would read x after it is written
+    "shift_aliased": lambda: (np.arange(6.0), 6),
+    "gather": lambda: (np.arange(5.0), np.array([4, 0, 4, 1]), np.zeros(4)),
+    # repeated indices must accumulate, not overwrite
+    "scatter_add": lambda: (np.array([0, 2, 0, 0]), np.arange(1.0, 5.0), np.zeros(3)),
+    # Python ints: the sum of cubes overflows int64
+    "cubes": lambda: (200000,),
+    "counter_sum": lambda: (10,),
+    "total": lambda: (np.arange(8.0), 8),
+    # int8 elements: the loop's int8 sum wraps around (to 48) where np.sum
+    # widens, and its float sum does not wrap where np.dot does
+    "dot_int8": lambda: (np.full(300, 10, dtype=np.int8), np.full(300, 10, dtype=np.int8), 300),
+    "total_int8": lambda: (np.full(300, 100, dtype=np.int8), 300),
+}
+
+
+def _vectorize(cfg):
+    optimize(cfg)
+    vectorize_loops(cfg)
+
+
+@pytest.mark.filterwarnings("ignore:overflow encountered")
+@pytest.mark.parametrize("kernel", sorted(ARGS))
+def test_vectorized_kernel_matches_python(kernel, mode):
+    name = kernel.replace("_aliased", "").replace("_int8", "")
+    assert_same(SOURCE, name, ARGS[kernel], mode, _vectorize)
+
+
+def vectorized(kernel, mode):
+    # the number of loops vectorize_loops rewrites in kernel
+    counts = {}
+
+    def count(cfg):
+        optimize(cfg)
+        counts[cfg.blocks[0]] = vectorize_loops(cfg)
+
+    units = transformed(SOURCE, mode, count)
+    return counts[units[kernel][0]]
+
+
+@pytest.mark.parametrize("kernel", ["saxpy", "dot", "gather", "scatter_add", "total"])
+def test_element_wise_loops_are_vectorized(kernel, mode):
+    # guards the test above against silently comparing scalar loops
+    assert vectorized(kernel, mode) == 1
+
+
+@pytest.mark.parametrize("kernel", ["cubes", "counter_sum"])
+def test_counter_arithmetic_is_not_vectorized(kernel, mode):
+    assert vectorized(kernel, mode) == 0